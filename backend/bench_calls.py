@@ -0,0 +1,130 @@
+"""Micro-benchmark of view-call overhead: web3's ContractFunction path against raw eth_call.
+
+    python bench_calls.py --entries 500 --iterations 200
+
+Both paths get their responses from an in-process provider that replays
+canned results from a simulated chain, so the timings are the client-side
+cost of building, encoding, dispatching and decoding each call, without
+the network. Both paths are checked to return the same values first.
+"""
+from typing import Any, Callable, Dict, List, Tuple
+from pathlib import Path
+from dotenv import load_dotenv
+import time
+import statistics
+
+import typer
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+from web3.providers.base import BaseProvider
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from config.web3_config import get_contract
+from services.abi_codec import CONTRACT_CODECS, raise_for_error
+from simulated_chain import SimulatedChain
+
+app = typer.Typer(help="Benchmark view-call overhead of the web3 and raw eth_call paths")
+
+BENCH_CONTRACT_ADDRESS = '0x9B6Bb00Ec24800C9Ccf4F3A1063df037Eb22C845'
+BENCH_CHAIN_ID = 31337
+
+class CannedProvider(BaseProvider):
+    """Answers from a simulated chain, computing each distinct response only once"""
+
+    def __init__(self, chain: SimulatedChain):
+        super().__init__()
+        self.chain = chain
+        self._responses: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def make_request(self, method, params):
+        key = (method, repr(params))
+        response = self._responses.get(key)
+        if response is None:
+            response = self._responses[key] = self.chain.handle({'id': 0, 'method': method, 'params': list(params)})
+        # Fresh envelope per call, as a real provider would return
+        return {'jsonrpc': '2.0', 'id': 0, **{k: v for k, v in response.items() if k in ('result', 'error')}}
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+def build_chain(banks: int, entries: int) -> SimulatedChain:
+    """A chain whose first bank has `entries` transfers in its history"""
+    chain = SimulatedChain(BENCH_CONTRACT_ADDRESS, BENCH_CHAIN_ID, banks=banks)
+    bank_id = chain.bank_ids[0]
+    for i in range(entries):
+        other = chain.bank_ids[1 + i % (banks - 1)]
+        chain.history[bank_id].append([f"TX{i:08d}", bank_id, other, 1000 + i, 'Dollar', 1700000000 + i, True])
+    return chain
+
+def plain(value):
+    """Lists and tuples alike as nested tuples, for comparing results"""
+    if isinstance(value, (list, tuple)):
+        return tuple(plain(v) for v in value)
+    return value
+
+def measure(call: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    call()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'mean': statistics.fmean(timings) * 1e6,
+        'p50': timings[len(timings) // 2] * 1e6,
+        'p99': timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e6,
+    }
+
+@app.command()
+def bench(
+    entries: int = typer.Option(500, help="Transfers in the benchmarked bank's history"),
+    banks: int = typer.Option(20, help="Banks on the simulated chain"),
+    iterations: int = typer.Option(200, help="Timed calls per function and path"),
+):
+    """Time each view call through both paths and print per-call microseconds"""
+    chain = build_chain(banks, entries)
+    provider = CannedProvider(chain)
+    contract = get_contract(Web3(provider), BENCH_CONTRACT_ADDRESS)
+    bank_id = chain.bank_ids[0]
+
+    def web3_call(name: str, *args):
+        return lambda: getattr(contract.functions, name)(*args).call(block_identifier='latest')
+
+    def raw_call(name: str, *args):
+        codec = CONTRACT_CODECS[name]
+
+        def call():
+            response = provider.make_request('eth_call', [{'to': contract.address, 'data': codec.encode(*args)}, 'latest'])
+            raise_for_error(response)
+            return codec.decode(response['result'])
+        return call
+
+    cases: List[Tuple[str, tuple]] = [
+        ('bankIds', (0,)),
+        ('banks', (bank_id,)),
+        ('bankTransferHistory', (bank_id, 0)),
+        ('getBankTransferHistory', (bank_id,)),
+        ('getPendingRequests', ()),
+    ]
+    # Reverts must surface the same way, the trackers rely on it
+    for call in (web3_call('bankIds', banks), raw_call('bankIds', banks)):
+        try:
+            call()
+        except ContractLogicError:
+            continue
+        raise typer.BadParameter("bankIds past the end did not raise ContractLogicError")
+
+    typer.echo(f"{'function':<26}{'web3 us':>12}{'raw us':>12}{'speedup':>10}")
+    for name, args in cases:
+        expected, actual = web3_call(name, *args)(), raw_call(name, *args)()
+        if plain(expected) != plain(actual):
+            raise typer.BadParameter(f"{name}: the raw path returned {actual!r}, web3 returned {expected!r}")
+        slow = measure(web3_call(name, *args), iterations)
+        fast = measure(raw_call(name, *args), iterations)
+        typer.echo(f"{name:<26}{slow['p50']:>12.1f}{fast['p50']:>12.1f}{slow['p50'] / fast['p50']:>9.1f}x")
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,231 @@
+"""Offline maintenance commands for the Bank Manager backend.
+
+    python cli.py events --from-block 5000000 --output mongo
+    python cli.py history --output parquet --out-dir ./export
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from enum import Enum
+from pathlib import Path
+from dotenv import load_dotenv
+import os
+import json
+import importlib.util
+import logging
+
+import typer
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from config.web3_config import DEPLOYMENTS
+from services.rate_limiter import RpcRateLimiter, rpc_priority, BACKFILL, RATE_LIMIT, BURST
+from services.event_cache import DEPLOYMENT_BLOCK
+from services.reorg import CONFIRMATION_DEPTH
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="Backfill and export tools for the Bank Manager backend")
+
+class Output(str, Enum):
+    mongo = 'mongo'
+    parquet = 'parquet'
+    npz = 'npz'
+
+# Set in each worker process by _init_worker
+_service = None
+
+def _init_worker(deployment: int, rate: float, workers: int):
+    """Give each worker process its own connection pool and a share of the rate limit"""
+    global _service
+    from services.blockchain_service import BlockchainService
+    limiter = RpcRateLimiter(rate=rate / workers, burst=max(BURST / workers, 1.0))
+    _service = BlockchainService(**DEPLOYMENTS[deployment], limiter=limiter)
+    rpc_priority.set(BACKFILL)
+    logging.basicConfig(level=logging.WARNING)
+
+def _deployment_service(deployment: int):
+    """The parent process's own connection to the chosen deployment, for planning the run"""
+    from services.blockchain_service import BlockchainService
+    if not 0 <= deployment < len(DEPLOYMENTS):
+        raise typer.BadParameter(f"--deployment must be below {len(DEPLOYMENTS)}, the number of configured deployments")
+    return BlockchainService(**DEPLOYMENTS[deployment])
+
+def _fetch_events(from_block: int, to_block: int) -> Tuple[int, int, List[Dict[str, Any]]]:
+    from services.event_store import EVENT_NAMES
+    events = _service.get_events(EVENT_NAMES, from_block, to_block)
+    timestamps = {n: _service.get_block_header(n)['timestamp'] for n in {e['blockNumber'] for e in events}}
+    for event in events:
+        event['timestamp'] = timestamps[event['blockNumber']]
+    return from_block, to_block, events
+
+def _fetch_histories(bank_ids: List[str], block_number: int, block_hash: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    from services.block_pin import pinned_blocks
+    records = []
+    with pinned_blocks() as pin:
+        pin.pin(_service, block_number, block_hash)
+        for bank_id in bank_ids:
+            for transfer in _service.get_transfer_history(bank_id):
+                records.append({'bankId': bank_id, 'blockNumber': block_number, **transfer})
+    return bank_ids, records
+
+class Checkpoint:
+    """Completed work units of one run, kept in a JSON file so runs can resume"""
+
+    def __init__(self, path: Path, params: Dict[str, Any], resume: bool):
+        self.path = path
+        self.params = params
+        self.done: set = set()
+        if resume and path.exists():
+            state = json.loads(path.read_text())
+            if state.get('params') == params:
+                self.done = set(state['done'])
+            else:
+                typer.echo(f"Checkpoint {path} is for a different run, starting over")
+
+    def mark(self, key):
+        self.done.add(key)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({'params': self.params, 'done': sorted(self.done)}))
+        os.replace(tmp_path, self.path)
+
+class Writer:
+    """Writes batches of records to MongoDB or to one columnar file per batch"""
+
+    def __init__(self, output: Output, out_dir: Path, collection: str, key: List[str]):
+        self.output = output
+        self.out_dir = out_dir
+        self.key = key
+        if output == Output.mongo:
+            from pymongo import MongoClient
+            self.client = MongoClient(os.environ['MONGO_URL'])
+            self.collection = self.client[os.environ['DB_NAME']][collection]
+            self.collection.create_index([(field, 1) for field in key], unique=True)
+        else:
+            if output == Output.parquet and importlib.util.find_spec('pyarrow') is None:
+                raise typer.BadParameter("parquet output needs pyarrow installed; use --output npz")
+            out_dir.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name: str, records: List[Dict[str, Any]]):
+        if self.output == Output.mongo:
+            from pymongo import UpdateOne
+            if records:
+                self.collection.bulk_write([
+                    UpdateOne({field: record[field] for field in self.key}, {'$set': record}, upsert=True)
+                    for record in records
+                ], ordered=False)
+            return
+
+        import pandas as pd
+        frame = pd.DataFrame.from_records(records)
+        path = self.out_dir / f'{name}.{self.output.value}'
+        if self.output == Output.parquet:
+            frame.to_parquet(path, index=False)
+        else:
+            import numpy as np
+            columns = {}
+            for column in frame.columns:
+                values = frame[column].to_numpy()
+                # Fixed-width strings, so the file loads without pickle
+                columns[column] = values.astype(str) if values.dtype == object else values
+            np.savez_compressed(path, **columns)
+
+def _event_record(event: Dict[str, Any], output: Output) -> Dict[str, Any]:
+    if output == Output.mongo:
+        from services.event_store import to_document
+        return to_document(event, event.pop('timestamp'))
+    # Flat columns; args as JSON so every event type fits one table
+    return {**event, 'args': json.dumps(event['args'], default=str)}
+
+@app.command()
+def events(
+    from_block: int = typer.Option(DEPLOYMENT_BLOCK, help="First block to backfill"),
+    to_block: Optional[int] = typer.Option(None, help="Last block to backfill, the latest confirmed one by default"),
+    chunk_size: int = typer.Option(2000, help="Blocks per eth_getLogs request"),
+    workers: int = typer.Option(os.cpu_count() or 4, help="Worker processes"),
+    output: Output = typer.Option(Output.mongo, help="Where to write the events"),
+    out_dir: Path = typer.Option(Path('backfill'), help="Directory for file outputs and the checkpoint"),
+    deployment: int = typer.Option(0, help="Index into the configured deployments"),
+    rate: float = typer.Option(RATE_LIMIT, help="Requests per second shared by all workers"),
+    resume: bool = typer.Option(True, help="Skip chunks a previous run completed"),
+):
+    """Backfill every contract event over a block range"""
+    if to_block is None:
+        # Stay below reorg depth so nothing written here is rolled back later
+        to_block = _deployment_service(deployment).get_block_number() - CONFIRMATION_DEPTH
+    chunks = [(start, min(start + chunk_size - 1, to_block)) for start in range(from_block, to_block + 1, chunk_size)]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    params = {'command': 'events', 'deployment': deployment, 'fromBlock': from_block,
+              'toBlock': to_block, 'chunkSize': chunk_size, 'output': output.value}
+    checkpoint = Checkpoint(out_dir / 'events.checkpoint.json', params, resume)
+    writer = Writer(output, out_dir, 'contract_events', ['transactionHash', 'logIndex'])
+    todo = [chunk for chunk in chunks if chunk[0] not in checkpoint.done]
+    typer.echo(f"Blocks {from_block}-{to_block}: {len(todo)} of {len(chunks)} chunks to fetch with {workers} workers")
+
+    stored = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(deployment, rate, workers)) as pool, \
+            typer.progressbar(length=len(chunks), label="Fetching events") as progress:
+        progress.update(len(chunks) - len(todo))
+        futures = [pool.submit(_fetch_events, start, end) for start, end in todo]
+        for future in as_completed(futures):
+            start, end, chunk_events = future.result()
+            writer.write(f'events-{start:012d}-{end:012d}', [_event_record(e, output) for e in chunk_events])
+            checkpoint.mark(start)
+            stored += len(chunk_events)
+            progress.update(1)
+
+    if output == Output.mongo and deployment == 0:
+        # Let the server's event store carry on from where the backfill ended
+        state = writer.collection.database.event_store_state
+        doc = state.find_one({'_id': 'events'})
+        last_block = doc['lastBlock'] if doc else DEPLOYMENT_BLOCK - 1
+        if from_block <= last_block + 1 < to_block + 1:
+            state.update_one({'_id': 'events'}, {'$set': {'lastBlock': to_block}}, upsert=True)
+    typer.echo(f"Stored {stored} events")
+
+@app.command()
+def history(
+    block: Optional[int] = typer.Option(None, help="Block to read histories at, latest by default"),
+    batch_size: int = typer.Option(20, help="Banks per work unit"),
+    workers: int = typer.Option(os.cpu_count() or 4, help="Worker processes"),
+    output: Output = typer.Option(Output.mongo, help="Where to write the transfers"),
+    out_dir: Path = typer.Option(Path('backfill'), help="Directory for file outputs and the checkpoint"),
+    deployment: int = typer.Option(0, help="Index into the configured deployments"),
+    rate: float = typer.Option(RATE_LIMIT, help="Requests per second shared by all workers"),
+    resume: bool = typer.Option(True, help="Skip banks a previous run completed"),
+):
+    """Export every bank's transfer history as of one block"""
+    service = _deployment_service(deployment)
+    header = service.get_block_header('latest' if block is None else block)
+    block_hash = '0x' + header['hash'].removeprefix('0x')
+    from services.block_pin import pinned_blocks
+    with pinned_blocks() as pin:
+        # The banks registered as of that block, like the histories
+        pin.pin(service, header['number'], block_hash)
+        bank_ids = service.get_bank_ids()
+    batches = [bank_ids[i:i + batch_size] for i in range(0, len(bank_ids), batch_size)]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    params = {'command': 'history', 'deployment': deployment, 'block': header['number'],
+              'batchSize': batch_size, 'output': output.value}
+    checkpoint = Checkpoint(out_dir / 'history.checkpoint.json', params, resume)
+    writer = Writer(output, out_dir, 'bank_transfer_history', ['bankId', 'transferId'])
+    todo = [(i, batch) for i, batch in enumerate(batches) if batch[0] not in checkpoint.done]
+    typer.echo(f"Block {header['number']}: {len(todo)} of {len(batches)} bank batches to fetch with {workers} workers")
+
+    stored = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(deployment, rate, workers)) as pool, \
+            typer.progressbar(length=len(batches), label="Fetching histories") as progress:
+        progress.update(len(batches) - len(todo))
+        futures = {pool.submit(_fetch_histories, batch, header['number'], block_hash): i for i, batch in todo}
+        for future in as_completed(futures):
+            batch, records = future.result()
+            writer.write(f"history-{header['number']}-{futures[future]:06d}", records)
+            checkpoint.mark(batch[0])
+            stored += len(records)
+            progress.update(1)
+    typer.echo(f"Stored {stored} transfers")
+
+if __name__ == '__main__':
+    app()
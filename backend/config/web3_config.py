@@ -1,10 +1,45 @@
 import os
+import json
 from web3 import Web3
 
 # Contract Configuration
 CONTRACT_ADDRESS = '0x9B6Bb00Ec24800C9Ccf4F3A1063df037Eb22C845'
 RPC_URL = 'https://sepolia.infura.io/v3/1871d13fa53c4b9591f45af89704788b'
 SEPOLIA_CHAIN_ID = 11155111
+# Extra endpoints for the same chain, used for hedged reads
+RPC_FALLBACK_URLS = [url.strip() for url in os.environ.get('RPC_FALLBACK_URLS', '').split(',') if url.strip()]
+# WebSocket endpoint for head and log subscriptions; heads are polled without one
+WS_RPC_URL = os.environ.get('WS_RPC_URL') or None
+# Keep-alive connections per RPC endpoint
+RPC_POOL_SIZE = int(os.environ.get('RPC_POOL_SIZE', '20'))
+
+def load_deployments():
+    """Contract deployments to serve, the first being the primary one
+
+    DEPLOYMENTS is a JSON list of objects with name, rpcUrl, contractAddress,
+    chainId and optional fallbackUrls and wsUrl. Without it the single deployment
+    configured above is used.
+    """
+    raw = os.environ.get('DEPLOYMENTS')
+    if not raw:
+        return [{
+            'name': 'default',
+            'rpc_url': RPC_URL,
+            'contract_address': CONTRACT_ADDRESS,
+            'chain_id': SEPOLIA_CHAIN_ID,
+            'fallback_urls': RPC_FALLBACK_URLS,
+            'ws_url': WS_RPC_URL
+        }]
+    return [{
+        'name': item['name'],
+        'rpc_url': item['rpcUrl'],
+        'contract_address': item['contractAddress'],
+        'chain_id': int(item['chainId']),
+        'fallback_urls': item.get('fallbackUrls', []),
+        'ws_url': item.get('wsUrl')
+    } for item in json.loads(raw)]
+
+DEPLOYMENTS = load_deployments()
 
 # Contract ABI
 CONTRACT_ABI = [
@@ -754,14 +789,14 @@ CONTRACT_ABI = [
 ]
 
 # Web3 instance
-def get_web3():
+def get_web3(provider=None):
     """Get Web3 instance with RPC connection"""
-    return Web3(Web3.HTTPProvider(RPC_URL))
+    return Web3(provider or Web3.HTTPProvider(RPC_URL))
 
-def get_contract():
+def get_contract(w3=None, address=CONTRACT_ADDRESS):
     """Get contract instance for read operations"""
-    w3 = get_web3()
+    w3 = w3 or get_web3()
     return w3.eth.contract(
-        address=Web3.to_checksum_address(CONTRACT_ADDRESS),
+        address=Web3.to_checksum_address(address),
         abi=CONTRACT_ABI
     )
\ No newline at end of file
@@ -1,4 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Response, Depends, Header, Query
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse
+from starlette.routing import Match
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -6,13 +8,38 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal
 import uuid
-from datetime import datetime
+import json
+import asyncio
+from datetime import datetime, timezone
 from contextlib import asynccontextmanager
 
 # Import blockchain service
 from services.blockchain_service import blockchain_service
+from services.transfer_sync import transfer_sync
+from services.pending_transfers import pending_transfers
+from services.pending_requests import pending_requests
+from services.refresher import refresher
+from services.shared_cache import MongoSharedCache, LeaderElection
+from services.rate_limiter import rpc_limiter
+from services.hedging import RetryBudget, retry_budget
+from services.event_cache import event_cache
+from services.reorg import block_chain
+from services.snapshot import StateSnapshot
+from services.tx_submitter import create_submitter
+from services.event_store import EventStore
+from services.bank_search import bank_search
+from services.supply_history import SupplySampler
+from services.status_buffer import StatusWriteBuffer
+from services.profiler import profiler, ProfilerBusy
+from services.deployments import deployments
+from services.deadline import deadline, DeadlineExceeded, PartialResult, REQUEST_DEADLINE
+from services.circuit_breaker import CircuitOpen
+from services.block_pin import pinned_blocks
+from services.netting import cached_netting
+from services.admission import admission, Rejected, retry_after_header
+from services.block_watcher import block_watcher, chain_bus, next_messages, NEW_HEAD, REORG, CONTRACT_EVENT
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -22,11 +49,181 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Honour X-Forwarded-For only behind a trusted reverse proxy
+TRUST_PROXY = os.environ.get('TRUST_PROXY', '').lower() in ('1', 'true')
+# API keys that get their own rate-limit bucket, comma-separated
+API_KEYS = frozenset(key.strip() for key in os.environ.get('API_KEYS', '').split(',') if key.strip())
+
+# Hot datasets served stale-while-revalidate, per deployment where merged;
+# the primary deployment reads transfers from its event-maintained indexes
+def primary_or(service, indexed, fallback):
+    return indexed if service is blockchain_service else fallback
+
+refresher.register('pending_requests', pending_requests.get_pending_requests, interval=15)
+deployments.register('banks', lambda service: service.get_all_banks, interval=30)
+deployments.register('pending_transfers', lambda service: primary_or(
+    service, pending_transfers.get_all_pending_transfers, service.get_all_pending_transfers), interval=10)
+deployments.register('transfer_history', lambda service: primary_or(
+    service, transfer_sync.get_all_transfer_history, service.get_all_transfer_history), interval=30)
+
+# With several uvicorn workers, one elected leader talks to the chain and
+# the rest read its snapshots from MongoDB
+leader = None
+if os.environ.get('SHARED_CACHE', '').lower() == 'mongo':
+    leader = LeaderElection(db, 'indexer')
+    refresher.share(MongoSharedCache(db), leader)
+
+async def get_snapshot(name: str, response: Response):
+    """Get a dataset snapshot and report its age in the Age header"""
+    value, age = await refresher.get(name)
+    response.headers['Age'] = str(int(age))
+    return value
+
+async def get_merged(name: str, response: Response):
+    """Get a dataset from every deployment, reporting failed deployments and
+    missing or stale banks in X-Failed-Deployments, X-Missing-Banks and X-Stale-Banks"""
+    merged = await deployments.gather(name)
+    response.headers['Age'] = str(int(merged['age']))
+    if merged['failures']:
+        response.headers['X-Failed-Deployments'] = ','.join(merged['failures'])
+    if merged['missing']:
+        response.headers['X-Missing-Banks'] = ','.join(merged['missing'])
+    if merged['stale']:
+        response.headers['X-Stale-Banks'] = ','.join(merged['stale'])
+    if merged['blocks']:
+        response.headers['X-Block-Number'] = format_blocks(merged['blocks'])
+    return merged['records']
+
+def report_partial(result, response: Response):
+    """Name the banks a partial result lacks, or serves stale, in X-Missing-Banks and X-Stale-Banks"""
+    if isinstance(result, PartialResult):
+        if result.missing:
+            response.headers['X-Missing-Banks'] = ','.join(result.missing)
+        if result.stale:
+            response.headers['X-Stale-Banks'] = ','.join(result.stale)
+    return result
+
+async def bank_snapshot(name: str, bank_id: str, response: Response) -> List[Dict[str, Any]]:
+    """A bank's transfers in a shared transfer snapshot, reporting the bank if the load missed it"""
+    transfers = await get_snapshot(name, response)
+    missing, stale = refresher.completeness(name)
+    report_partial(PartialResult(missing=[bank_id] if bank_id in missing else [],
+                                 stale=[bank_id] if bank_id in stale else []), response)
+    return [transfer for transfer in transfers if bank_id in (transfer['fromBankId'], transfer['toBankId'])]
+
+def select_by_time(transfers: List[Dict[str, Any]], since: Optional[int], until: Optional[int],
+                   limit: Optional[int], order: str) -> List[Dict[str, Any]]:
+    """Transfers with since <= timestamp <= until, in time order, at most `limit` of them"""
+    selected = [
+        transfer for transfer in transfers
+        if (since is None or transfer['timestamp'] >= since) and (until is None or transfer['timestamp'] <= until)
+    ]
+    selected.sort(key=lambda transfer: transfer['timestamp'], reverse=order == 'desc')
+    return selected if limit is None else selected[:limit]
+
+def format_blocks(blocks: Dict[str, int]) -> str:
+    """The block a response was read at, or name=block per deployment if several"""
+    if list(blocks) == [blockchain_service.name]:
+        return str(blocks[blockchain_service.name])
+    return ','.join(f'{name}={number}' for name, number in blocks.items())
+
+# Caches and indexes persisted across restarts
+state_snapshot = StateSnapshot(block_chain, blockchain_service.contract_address, {
+    'refresher': refresher,
+    'transfers': transfer_sync,
+    'pending': pending_transfers,
+    'requests': pending_requests,
+    'events': event_cache,
+})
+
+# Server-side signing for admin actions, enabled by ADMIN_PRIVATE_KEY
+tx_submitter = create_submitter(blockchain_service)
+
+# Decoded events indexed in MongoDB
+event_store = EventStore(db, blockchain_service, block_chain)
+
+# Status checks are written in batches
+status_buffer = StatusWriteBuffer(db.status_checks)
+
+# Bank supply and balances over time
+supply_sampler = SupplySampler(db, blockchain_service, block_chain)
+
+# Snapshots each contract event makes out of date on the primary deployment
+EVENT_DATASETS = {
+    'BankRequested': ['pending_requests'],
+    'BankApproved': ['pending_requests', 'banks'],
+    'CoinsMinted': ['banks'],
+    'PendingBankTransfer': ['pending_transfers', 'transfer_history', 'banks'],
+    'BankTransferApproved': ['pending_transfers', 'transfer_history', 'banks'],
+    'BankTransferRejected': ['pending_transfers', 'transfer_history'],
+}
+
+async def invalidate_on_events():
+    """Refresh the snapshots a block's events touched, and all of them after a reorg"""
+    queue = chain_bus.subscribe(CONTRACT_EVENT, REORG)
+    try:
+        while True:
+            names = set()
+            for topic, message in await next_messages(queue, 60):
+                if topic == REORG:
+                    names.update(refresher.datasets)
+                else:
+                    names.update(EVENT_DATASETS.get(message['event'], ()))
+            for name in names:
+                refresher.invalidate(name)
+    finally:
+        chain_bus.unsubscribe(queue)
+
+def is_leader() -> bool:
+    """Whether this worker follows the head, runs the indexers and writes the snapshot file
+
+    Other workers relay heads, reorgs and events onto their bus from the
+    leader's event store. They serve per-bank transfers from the leader's
+    shared snapshots and events from its event store, so the trackers only
+    read the chain on the leader. What stays per worker is single direct
+    reads: /banks/ids, /banks/{id}, the contract owner and transaction
+    receipts.
+    """
+    return leader is None or leader.is_leader
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    await asyncio.to_thread(state_snapshot.load)
+    if leader is not None:
+        await leader.try_acquire()
+        leader.start()
+    refresher.start()
+    # Only the leader follows the chain; the others relay what it stores
+    watcher_task = asyncio.create_task(block_watcher.run_while(is_leader))
+    relay_task = asyncio.create_task(event_store.relay(chain_bus, enabled=lambda: not is_leader()))
+    invalidation_task = asyncio.create_task(invalidate_on_events())
+    status_buffer.start()
+    snapshot_task = asyncio.create_task(state_snapshot.run_periodically(enabled=is_leader))
+    event_store_task = asyncio.create_task(event_store.run(enabled=is_leader, bus=chain_bus))
+    supply_task = asyncio.create_task(supply_sampler.run(enabled=is_leader, bus=chain_bus))
+    if tx_submitter is not None:
+        tx_submitter.start()
     yield
     # Shutdown
+    snapshot_task.cancel()
+    event_store_task.cancel()
+    supply_task.cancel()
+    invalidation_task.cancel()
+    relay_task.cancel()
+    watcher_task.cancel()
+    await asyncio.gather(watcher_task, return_exceptions=True)
+    if tx_submitter is not None:
+        await tx_submitter.stop()
+    await refresher.stop()
+    await status_buffer.stop()
+    if is_leader():
+        try:
+            await asyncio.to_thread(state_snapshot.save)
+        except Exception as e:
+            logger.warning(f"Failed to save state snapshot: {e}")
+    if leader is not None:
+        await leader.stop()
     client.close()
 
 # Create the main app without a prefix
@@ -66,6 +263,10 @@ class Bank(BaseModel):
     availableSupply: int
     normalCurrencyBalance: int
     foreignCurrencyBalance: int
+    deployment: Optional[str] = None
+
+class BankSearchResult(Bank):
+    score: float
 
 class Transfer(BaseModel):
     transferId: str
@@ -75,6 +276,26 @@ class Transfer(BaseModel):
     currencyName: str
     timestamp: int
     approved: bool
+    deployment: Optional[str] = None
+
+class AdminAction(BaseModel):
+    function: str
+    args: List[Any] = []
+
+class TransactionBatch(BaseModel):
+    actions: List[AdminAction]
+
+class SubmittedTransaction(BaseModel):
+    id: str
+    function: str
+    args: List[Any]
+    nonce: Optional[int] = None
+    txHash: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+    blockNumber: Optional[int] = None
+    gasUsed: Optional[int] = None
+    submittedAt: str
 
 class OwnershipCheck(BaseModel):
     address: str
@@ -84,6 +305,28 @@ class OwnershipResponse(BaseModel):
     isOwner: bool
     contractOwner: str
 
+def error_status(error: Exception) -> int:
+    """HTTP status for a failed upstream call"""
+    if isinstance(error, DeadlineExceeded):
+        return 504
+    if isinstance(error, CircuitOpen):
+        return 503
+    return 500
+
+def is_admin(token: Optional[str]) -> bool:
+    admin_token = os.environ.get('ADMIN_API_TOKEN')
+    return bool(admin_token) and token == admin_token
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the configured ADMIN_API_TOKEN"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def get_submitter():
+    if tx_submitter is None:
+        raise HTTPException(status_code=503, detail="Transaction submission is not configured")
+    return tx_submitter
+
 # Basic routes
 @api_router.get("/")
 async def root():
@@ -93,12 +336,20 @@ async def root():
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await status_buffer.add([status_obj.dict()])
     return status_obj
 
+@api_router.post("/status/bulk", response_model=List[StatusCheck])
+async def create_status_checks(inputs: List[StatusCheckCreate]):
+    status_objs = [StatusCheck(**input.dict()) for input in inputs]
+    await status_buffer.add([status_obj.dict() for status_obj in status_objs])
+    return status_objs
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+async def get_status_checks(client_name: Optional[str] = None, limit: int = 1000):
+    query = {'client_name': client_name} if client_name else {}
+    limit = min(max(limit, 1), 1000)
+    status_checks = await db.status_checks.find(query, {'_id': 0}).sort('timestamp', -1).to_list(limit)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # Blockchain Routes
@@ -108,17 +359,17 @@ async def get_status_checks():
 async def get_contract_owner():
     """Get the contract owner address"""
     try:
-        owner = blockchain_service.get_contract_owner()
+        owner = await asyncio.to_thread(blockchain_service.get_contract_owner)
         return {"owner": owner}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 @api_router.post("/contract/check-ownership", response_model=OwnershipResponse)
 async def check_ownership(request: OwnershipCheck):
     """Check if an address is the contract owner"""
     try:
-        is_owner = blockchain_service.is_owner(request.address)
-        contract_owner = blockchain_service.get_contract_owner()
+        is_owner = await asyncio.to_thread(blockchain_service.is_owner, request.address)
+        contract_owner = await asyncio.to_thread(blockchain_service.get_contract_owner)
         
         return OwnershipResponse(
             address=request.address,
@@ -126,102 +377,266 @@ async def check_ownership(request: OwnershipCheck):
             contractOwner=contract_owner
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 # Bank requests
 @api_router.get("/banks/requests/pending", response_model=List[BankRequest])
-async def get_pending_requests():
+async def get_pending_requests(response: Response):
     """Get all pending bank requests"""
     try:
-        requests = blockchain_service.get_pending_requests()
+        requests = await get_snapshot('pending_requests', response)
         return [BankRequest(**request) for request in requests]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 # Banks
 @api_router.get("/banks", response_model=List[Bank])
-async def get_all_banks():
-    """Get all banks"""
+async def get_all_banks(response: Response):
+    """Get all banks across deployments"""
     try:
-        banks = blockchain_service.get_all_banks()
+        banks = await get_merged('banks', response)
         return [Bank(**bank) for bank in banks]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 @api_router.get("/banks/ids")
 async def get_bank_ids():
     """Get all bank IDs"""
     try:
-        bank_ids = blockchain_service.get_bank_ids()
+        bank_ids = await asyncio.to_thread(blockchain_service.get_bank_ids)
         return {"bankIds": bank_ids}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+@api_router.get("/banks/search", response_model=List[BankSearchResult])
+async def search_banks(q: str, limit: int = 10):
+    """Search banks by name, currency name, currency symbol or ID"""
+    try:
+        banks, _ = await refresher.get('banks')
+        missing, _ = refresher.completeness('banks')
+        version = refresher.datasets['banks'].fetched_at
+        results = await asyncio.to_thread(bank_search.search, q, banks, missing, version, min(max(limit, 1), 50))
+        return [BankSearchResult(score=score, **bank) for score, bank in results]
+    except Exception as e:
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 @api_router.get("/banks/{bank_id}", response_model=Bank)
-async def get_bank_details(bank_id: str):
+async def get_bank_details(bank_id: str, deployment: Optional[str] = None):
     """Get details for a specific bank"""
     try:
-        bank = blockchain_service.get_bank_details(bank_id)
-        return Bank(**bank)
+        service = deployments.get(deployment) if deployment else blockchain_service
+        bank = await asyncio.to_thread(service.get_bank_details, bank_id)
+        return Bank(deployment=service.name, **bank)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 # Transfers
 @api_router.get("/transfers/pending", response_model=List[Transfer])
-async def get_all_pending_transfers():
-    """Get all pending transfers"""
+async def get_all_pending_transfers(response: Response):
+    """Get all pending transfers across deployments"""
     try:
-        transfers = blockchain_service.get_all_pending_transfers()
+        transfers = await get_merged('pending_transfers', response)
         return [Transfer(**transfer) for transfer in transfers]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 @api_router.get("/transfers/history", response_model=List[Transfer])
-async def get_all_transfer_history():
-    """Get all transfer history"""
+async def get_all_transfer_history(response: Response):
+    """Get all transfer history across deployments"""
     try:
-        transfers = blockchain_service.get_all_transfer_history()
+        transfers = await get_merged('transfer_history', response)
         return [Transfer(**transfer) for transfer in transfers]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+@api_router.get("/transfers/netting")
+async def get_transfer_netting(response: Response):
+    """Net pending transfers per currency into a minimal set of settlements"""
+    try:
+        transfers, age = await refresher.get('pending_transfers')
+        response.headers['Age'] = str(int(age))
+        gas_per_approval = tx_submitter.cached_gas('approveBankToBankTransfer') if tx_submitter else None
+        return cached_netting(transfers, gas_per_approval)
+    except Exception as e:
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 @api_router.get("/banks/{bank_id}/transfers/pending", response_model=List[Transfer])
-async def get_bank_pending_transfers(bank_id: str):
+async def get_bank_pending_transfers(bank_id: str, response: Response):
     """Get pending transfers for a specific bank"""
     try:
-        transfers = blockchain_service.get_pending_transfers(bank_id)
+        if is_leader():
+            transfers = await asyncio.to_thread(pending_transfers.get_pending_transfers, bank_id)
+            report_partial(transfers, response)
+        else:
+            transfers = await bank_snapshot('pending_transfers', bank_id, response)
         return [Transfer(**transfer) for transfer in transfers]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 @api_router.get("/banks/{bank_id}/transfers/history", response_model=List[Transfer])
-async def get_bank_transfer_history(bank_id: str):
-    """Get transfer history for a specific bank"""
+async def get_bank_transfer_history(
+    bank_id: str,
+    response: Response,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    limit: Optional[int] = None,
+    order: Optional[str] = None
+):
+    """Get transfer history for a specific bank, optionally by time range (ms) in time order"""
     try:
-        transfers = blockchain_service.get_transfer_history(bank_id)
+        if not is_leader():
+            transfers = await bank_snapshot('transfer_history', bank_id, response)
+            if since is not None or until is not None or limit is not None or order is not None:
+                transfers = select_by_time(transfers, since, until, limit, order or 'asc')
+        elif since is None and until is None and limit is None and order is None:
+            transfers = await asyncio.to_thread(transfer_sync.get_transfer_history, bank_id)
+        else:
+            transfers = await asyncio.to_thread(
+                transfer_sync.query_transfer_history, bank_id, since, until, limit, order or 'asc')
+        report_partial(transfers, response)
         return [Transfer(**transfer) for transfer in transfers]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+@api_router.get("/banks/{bank_id}/supply/history")
+async def get_bank_supply_history(
+    bank_id: str,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    resolution: Optional[str] = None
+):
+    """Get a bank's supply and balances over a time range (ms), at raw, 1m, 1h or 1d resolution"""
+    try:
+        since_dt = datetime.fromtimestamp(since / 1000, tz=timezone.utc) if since is not None else None
+        until_dt = datetime.fromtimestamp(until / 1000, tz=timezone.utc) if until is not None else None
+        return await supply_sampler.query(bank_id, since_dt, until_dt, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 # Events
+@api_router.get("/events")
+async def query_events(
+    event: Optional[str] = None,
+    bank: Optional[str] = None,
+    transfer: Optional[str] = None,
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    order: Literal["asc", "desc"] = "asc"
+):
+    """Query indexed contract events by type, bank, transfer, block range and time range"""
+    try:
+        return await event_store.query(
+            event=event, bank_id=bank, transfer_id=transfer, from_block=from_block,
+            to_block=to_block, since=since, until=until, limit=limit, skip=skip, order=order
+        )
+    except Exception as e:
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+@api_router.get("/events/stream")
+async def stream_events():
+    """Server-sent events for new heads, reorgs and contract events as they happen"""
+    queue = chain_bus.subscribe(NEW_HEAD, REORG, CONTRACT_EVENT)
+
+    async def messages():
+        try:
+            while True:
+                batch = await next_messages(queue, 15)
+                if not batch:
+                    # Keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                for topic, message in batch:
+                    yield f"event: {topic}\ndata: {json.dumps(message, default=str)}\n\n"
+        finally:
+            chain_bus.unsubscribe(queue)
+
+    return StreamingResponse(messages(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @api_router.get("/events/{event_name}")
 async def get_recent_events(event_name: str, from_block: int = 0):
     """Get recent events from the contract"""
     try:
-        events = blockchain_service.get_recent_events(event_name, from_block)
+        if is_leader():
+            events = await asyncio.to_thread(event_cache.get_events, event_name, from_block)
+        else:
+            events = await event_store.events_since(event_name, from_block)
         return {"events": events}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+# Admin transactions
+@api_router.post("/admin/transactions/batch", response_model=List[SubmittedTransaction], dependencies=[Depends(require_admin)])
+async def submit_transaction_batch(batch: TransactionBatch):
+    """Sign and submit a batch of admin contract calls"""
+    submitter = get_submitter()
+    try:
+        actions = [action.dict() for action in batch.actions]
+        records = await asyncio.to_thread(submitter.submit_batch, actions)
+        return [SubmittedTransaction(**record) for record in records]
+    except Exception as e:
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+@api_router.get("/admin/transactions", response_model=List[SubmittedTransaction], dependencies=[Depends(require_admin)])
+async def list_submitted_transactions(limit: int = 100):
+    """List recently submitted admin transactions"""
+    return [SubmittedTransaction(**record) for record in get_submitter().list_records(limit)]
+
+@api_router.get("/admin/transactions/{record_id}", response_model=SubmittedTransaction, dependencies=[Depends(require_admin)])
+async def get_submitted_transaction(record_id: str):
+    """Get the status of a submitted admin transaction"""
+    record = get_submitter().get_record(record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return SubmittedTransaction(**record)
+
+# Profiling
+def render_profile(profile, format: str):
+    headers = {'X-Profile-Id': profile.id}
+    if format == 'collapsed':
+        return PlainTextResponse(profile.collapsed(), headers=headers)
+    if format == 'speedscope':
+        return Response(content=json.dumps(profile.speedscope()), media_type='application/json', headers=headers)
+    if format == 'summary':
+        return {**profile.summary(), 'stacks': dict(profile.stacks.most_common(50))}
+    raise HTTPException(status_code=400, detail=f"Unknown profile format {format}")
+
+@api_router.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(seconds: float = 10, format: str = "collapsed", memory: bool = False, include_idle: bool = False):
+    """Sample every thread of this worker for a number of seconds"""
+    try:
+        profile = profiler.start(memory=memory, include_idle=include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(min(max(seconds, 0.1), 60))
+    finally:
+        profile = await asyncio.to_thread(profiler.stop)
+    return render_profile(profile, format)
+
+@api_router.get("/admin/profile/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: str = "collapsed"):
+    """Get a recent profile, such as one taken with the X-Profile request header"""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return render_profile(profile, format)
 
 # Utility
 @api_router.get("/transaction/{tx_hash}")
 async def get_transaction_receipt(tx_hash: str):
     """Get transaction receipt"""
     try:
-        receipt = blockchain_service.get_transaction_receipt(tx_hash)
+        receipt = await asyncio.to_thread(blockchain_service.get_transaction_receipt, tx_hash)
         return receipt
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
 
 @api_router.get("/validate-address/{address}")
 async def validate_address(address: str):
@@ -230,17 +645,30 @@ async def validate_address(address: str):
         is_valid = blockchain_service.validate_address(address)
         return {"address": address, "isValid": is_valid}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+# Metrics
+@api_router.get("/metrics")
+async def get_metrics():
+    """Get upstream RPC usage, remaining budget and tail latency"""
+    return {
+        "rpc": rpc_limiter.stats(),
+        "hedging": blockchain_service.provider.stats(),
+        "admission": admission.stats(),
+        "head": block_watcher.stats()
+    }
 
 # Health check
 @api_router.get("/health")
 async def health_check():
     """Health check endpoint"""
     try:
-        blockchain_connected = blockchain_service.is_connected()
+        # A watcher seeing new heads is proof enough of a live connection
+        blockchain_connected = block_watcher.is_current() or await asyncio.to_thread(blockchain_service.is_connected)
         return {
             "status": "healthy",
             "blockchain_connected": blockchain_connected,
+            "head": block_watcher.head,
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -253,6 +681,92 @@ async def health_check():
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def limit_retries(request, call_next):
+    """Give each API request its own budget of upstream retries"""
+    retry_budget.set(RetryBudget())
+    return await call_next(request)
+
+@app.middleware("http")
+async def pin_block(request, call_next):
+    """Read every view call of a request at one block, reported in X-Block-Number"""
+    with pinned_blocks() as pin:
+        # A current watcher head saves resolving latest with a round-trip
+        head = block_watcher.current_head()
+        if head is not None:
+            pin.offer(blockchain_service, *head)
+        response = await call_next(request)
+    blocks = pin.numbers()
+    if blocks and 'x-block-number' not in response.headers:
+        response.headers['X-Block-Number'] = format_blocks(blocks)
+    return response
+
+@app.middleware("http")
+async def apply_deadline(request, call_next):
+    """Bound each API request by REQUEST_DEADLINE, or a shorter X-Request-Timeout in seconds"""
+    seconds = REQUEST_DEADLINE
+    try:
+        seconds = min(float(request.headers.get('x-request-timeout', seconds)), seconds)
+    except ValueError:
+        pass
+    with deadline(seconds):
+        return await call_next(request)
+
+@app.middleware("http")
+async def profile_request(request, call_next):
+    """Profile one admin request flagged with X-Profile (or X-Profile: memory)"""
+    flag = request.headers.get('x-profile')
+    if not flag or not is_admin(request.headers.get('x-admin-token')):
+        return await call_next(request)
+    try:
+        profiler.start(memory=flag == 'memory')
+    except ProfilerBusy:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        profile = await asyncio.to_thread(profiler.stop)
+    response.headers['X-Profile-Id'] = profile.id
+    return response
+
+def client_id(request) -> str:
+    """Configured API key if one is sent, else the caller's address"""
+    # Unknown keys are ignored, or rotating them would dodge the limits
+    api_key = request.headers.get('x-api-key')
+    if api_key in API_KEYS:
+        return f'key:{api_key}'
+    if TRUST_PROXY:
+        forwarded = request.headers.get('x-forwarded-for')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+def route_template(request) -> str:
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return request.url.path
+
+@app.middleware("http")
+async def admit_request(request, call_next):
+    """Apply per-client rate limits and per-route concurrency caps"""
+    if request.method == 'OPTIONS' or is_admin(request.headers.get('x-admin-token')):
+        return await call_next(request)
+    try:
+        gate = await admission.admit(client_id(request), route_template(request))
+    except Rejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e)},
+            headers={"Retry-After": retry_after_header(e.retry_after)}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        if gate is not None:
+            gate.leave()
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
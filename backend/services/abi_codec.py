@@ -0,0 +1,76 @@
+from typing import Any, Callable, Dict, List, Optional
+from eth_abi.registry import registry
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_utils import to_checksum_address
+from eth_utils.abi import function_abi_to_4byte_selector, get_abi_input_types, get_abi_output_types
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError, Web3RPCError
+
+from config.web3_config import CONTRACT_ABI
+
+def _normalizer(output: Dict[str, Any]) -> Optional[Callable[[Any], Any]]:
+    """Checksum every address in a decoded output, as web3 does, or None if it has none"""
+    abi_type = output['type']
+    if abi_type.endswith('[]'):
+        item = _normalizer({**output, 'type': abi_type[:-2]})
+        return None if item is None else (lambda values: tuple(item(v) for v in values))
+    if abi_type == 'tuple':
+        fields = [_normalizer(component) for component in output['components']]
+        if not any(fields):
+            return None
+        return lambda values: tuple(f(v) if f else v for f, v in zip(fields, values))
+    if abi_type == 'address':
+        return to_checksum_address
+    return None
+
+class FunctionCodec:
+    """Selector, argument encoder and result decoder of one contract function, built once.
+
+    Results decode the way `ContractFunction.call()` returns them: the value
+    itself for a single output, a tuple otherwise, with addresses checksummed.
+    """
+
+    def __init__(self, abi: Dict[str, Any]):
+        self.name = abi['name']
+        self.selector = '0x' + function_abi_to_4byte_selector(abi).hex()
+        self._encoder = registry.get_tuple_encoder(*get_abi_input_types(abi))
+        # Lenient like the Solidity decoder, so padding quirks do not fail a read
+        self._decoder = registry.get_tuple_decoder(*get_abi_output_types(abi), strict=False)
+        self._normalizers = [_normalizer(output) for output in abi['outputs']]
+        self._normalize = any(self._normalizers)
+        self._single = len(abi['outputs']) == 1
+
+    def encode(self, *args) -> str:
+        """Calldata for a call with `args`"""
+        return self.selector + self._encoder(args).hex()
+
+    def decode(self, result: str):
+        """Python values of a hex-encoded call result"""
+        data = bytes.fromhex(result[2:])
+        if not data:
+            # A call to an address without code returns nothing
+            raise BadFunctionCallOutput(f"Empty result from {self.name}; is the contract deployed?")
+        values = self._decoder(ContextFramesBytesIO(data))
+        if self._normalize:
+            values = tuple(f(v) if f else v for f, v in zip(self._normalizers, values))
+        return values[0] if self._single else values
+
+def raise_for_error(response: Dict[str, Any]):
+    """Raise what web3 would for an error in a raw eth_call response"""
+    error = response.get('error')
+    if error is None:
+        return
+    if isinstance(error, str):
+        raise Web3RPCError(error, rpc_response=response)
+    message = error.get('message', '')
+    if error.get('code') == 3 or 'revert' in message.lower():
+        raise ContractLogicError(message, data=error.get('data'))
+    raise Web3RPCError(str(error), rpc_response=response)
+
+def build_codecs(abi: List[Dict[str, Any]] = CONTRACT_ABI) -> Dict[str, FunctionCodec]:
+    """Codecs for every view function of a contract ABI, by name"""
+    return {
+        item['name']: FunctionCodec(item)
+        for item in abi if item['type'] == 'function' and item.get('stateMutability') in ('view', 'pure')
+    }
+
+CONTRACT_CODECS = build_codecs()
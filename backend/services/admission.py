@@ -0,0 +1,162 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import os
+import math
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLIENT_RATE = float(os.environ.get('ADMISSION_CLIENT_RATE', '20'))
+CLIENT_BURST = float(os.environ.get('ADMISSION_CLIENT_BURST', '60'))
+# How long a request may wait for a busy route before it is shed
+QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2'))
+MAX_CLIENTS = 10000
+
+# Route template: (token cost, concurrent requests, queued requests)
+ROUTE_POLICIES: Dict[str, Tuple[float, Optional[int], int]] = {
+    '/api/transfers/history': (10, 4, 8),
+    '/api/transfers/pending': (5, 4, 8),
+    '/api/transfers/netting': (5, 4, 8),
+    '/api/banks': (5, 8, 16),
+    '/api/banks/search': (1, None, 0),
+    '/api/banks/{bank_id}/transfers/history': (3, 8, 16),
+    '/api/banks/{bank_id}/transfers/pending': (3, 8, 16),
+    '/api/banks/{bank_id}/supply/history': (3, 8, 16),
+    '/api/events': (5, 8, 16),
+    '/api/events/{event_name}': (20, 2, 4),
+    '/api/admin/profile': (1, 1, 0),
+}
+DEFAULT_POLICY = (1, None, 0)
+
+class Rejected(Exception):
+    """Raised when a request is refused; `retry_after` is in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self, cost: float) -> float:
+        """Spend `cost` tokens, or return the seconds until they are available"""
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost: float):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+class RouteGate:
+    """Caps a route's concurrent requests and how many may queue for a slot"""
+
+    def __init__(self, limit: int, queue: int):
+        self.limit = limit
+        self.queue = queue
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def enter(self):
+        if self.active >= self.limit:
+            if self.waiting >= self.queue:
+                raise Rejected("Too many concurrent requests for this route", 1.0)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise Rejected("Timed out waiting for a free slot on this route", 1.0)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def leave(self):
+        self.active -= 1
+        self._semaphore.release()
+
+class AdmissionController:
+    """Inbound admission control for the API.
+
+    Each client draws route-specific costs from its own token bucket, so a
+    tight loop on an expensive endpoint runs dry long before it dents the
+    upstream RPC quota. Expensive routes also cap how many requests run at
+    once; a few more may wait briefly for a slot and the rest are shed.
+    Rejections carry a Retry-After hint.
+    """
+
+    def __init__(self, rate: float = CLIENT_RATE, burst: float = CLIENT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._gates: Dict[str, RouteGate] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, route: str, outcome: str):
+        counters = self._counters.setdefault(route, {'admitted': 0, 'throttled': 0, 'shed': 0})
+        counters[outcome] += 1
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    async def admit(self, client: str, route: str) -> Optional[RouteGate]:
+        """Admit a request or raise Rejected; the returned gate must be left afterwards"""
+        cost, limit, queue = ROUTE_POLICIES.get(route, DEFAULT_POLICY)
+        bucket = self._bucket(client)
+        wait = bucket.take(cost)
+        if wait > 0:
+            self._count(route, 'throttled')
+            raise Rejected("Rate limit exceeded", wait)
+
+        gate = None
+        if limit is not None:
+            gate = self._gates.get(route)
+            if gate is None:
+                gate = self._gates[route] = RouteGate(limit, queue)
+            try:
+                await gate.enter()
+            except Rejected:
+                # Shed requests cost the upstream nothing, so neither should they cost the client
+                bucket.refund(cost)
+                self._count(route, 'shed')
+                raise
+        self._count(route, 'admitted')
+        return gate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'clients': len(self._buckets),
+            'routes': {
+                route: {
+                    **counters,
+                    'active': self._gates[route].active if route in self._gates else None,
+                    'waiting': self._gates[route].waiting if route in self._gates else None,
+                }
+                for route, counters in self._counters.items()
+            }
+        }
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+# Singleton instance
+admission = AdmissionController()
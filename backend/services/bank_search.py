@@ -0,0 +1,190 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from bisect import bisect_left, insort
+import re
+import heapq
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of a match in each searchable field
+FIELD_WEIGHTS = {
+    'currencySymbol': 4.0,
+    'bankName': 3.0,
+    'uniqueId': 2.5,
+    'currencyName': 2.0,
+}
+EXACT_BONUS = 10.0
+TRIGRAM_WEIGHT = 1.0
+# Index entries scanned per query word, so short or common prefixes stay cheap
+MAX_PREFIX_MATCHES = 256
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def normalize(text: str) -> str:
+    return ' '.join(TOKEN_RE.findall(str(text).lower()))
+
+def trigrams(text: str) -> Set[str]:
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def prefix_score(word: str, token: str, field: str) -> float:
+    # Complete-word matches outrank partial ones
+    return FIELD_WEIGHTS[field] * (1 + len(word) / len(token))
+
+class BankSearchIndex:
+    """In-memory autocomplete index over bank names, currencies and IDs.
+
+    Every word of every searchable field goes into a sorted token list for
+    prefix lookups by binary search, and every field into trigram postings
+    for typo-tolerant matches when prefixes alone find too few. Every query
+    word has to match a bank for it to rank. The most selective word picks
+    the candidates and the others only filter and rescore them, so broad
+    prefixes never walk the whole index.
+
+    The index follows the `banks` snapshot rather than reading the chain.
+    Each new snapshot retokenizes only the banks whose searchable fields
+    changed and swaps in the fresh records of the rest, so results carry
+    current supplies and balances. A bank a partial load could not read
+    keeps its last record until a later snapshot has it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._banks: Dict[str, Dict[str, Any]] = {}
+        self._tokens: List[Tuple[str, str, str]] = []
+        self._bank_tokens: Dict[str, List[Tuple[str, str]]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._version: Optional[float] = None
+
+    def add(self, bank: Dict[str, Any]):
+        """Index a bank, replacing any earlier version of it"""
+        with self._lock:
+            bank_id = bank['uniqueId']
+            if bank_id in self._banks:
+                self._remove(bank_id)
+            self._banks[bank_id] = bank
+            bank_tokens = self._bank_tokens[bank_id] = []
+            for field in FIELD_WEIGHTS:
+                value = normalize(bank.get(field, ''))
+                for token in value.split():
+                    insort(self._tokens, (token, field, bank_id))
+                    bank_tokens.append((token, field))
+                for gram in trigrams(value):
+                    self._trigrams.setdefault(gram, set()).add(bank_id)
+
+    def _remove(self, bank_id: str):
+        bank = self._banks.pop(bank_id)
+        del self._bank_tokens[bank_id]
+        for field in FIELD_WEIGHTS:
+            value = normalize(bank.get(field, ''))
+            for token in value.split():
+                i = bisect_left(self._tokens, (token, field, bank_id))
+                if i < len(self._tokens) and self._tokens[i] == (token, field, bank_id):
+                    del self._tokens[i]
+            for gram in trigrams(value):
+                postings = self._trigrams.get(gram)
+                if postings is not None:
+                    postings.discard(bank_id)
+
+    def update(self, banks: Iterable[Dict[str, Any]], missing: Iterable[str] = (), version: Optional[float] = None):
+        """Bring the index in line with a banks snapshot, unless snapshot `version` is already applied"""
+        with self._lock:
+            if version is not None and version == self._version:
+                return
+            seen = set()
+            for bank in banks:
+                bank_id = bank['uniqueId']
+                seen.add(bank_id)
+                indexed = self._banks.get(bank_id)
+                if indexed is not None and all(indexed.get(field) == bank.get(field) for field in FIELD_WEIGHTS):
+                    self._banks[bank_id] = bank
+                else:
+                    self.add(bank)
+            kept = seen.union(missing)
+            for bank_id in [bank_id for bank_id in self._banks if bank_id not in kept]:
+                # Gone from the registry, e.g. an approval a reorg reverted
+                self._remove(bank_id)
+            self._version = version
+
+    def search(self, query: str, banks: Iterable[Dict[str, Any]], missing: Iterable[str] = (),
+               version: Optional[float] = None, limit: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top `limit` banks for `query` as (score, bank), best first, after applying a banks snapshot"""
+        with self._lock:
+            self.update(banks, missing, version)
+            return self.rank(query, limit)
+
+    def rank(self, query: str, limit: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
+        """Score indexed banks against `query` without touching the chain"""
+        with self._lock:
+            query = normalize(query)
+            if not query:
+                return []
+            scores: Dict[str, float] = {}
+
+            # Prefix matches of every word, starting from the one with the fewest
+            words = sorted(set(query.split()), key=self._prefix_count)
+            self._scan_prefix(words[0], scores)
+            for word in words[1:]:
+                for bank_id in list(scores):
+                    word_score = sum(prefix_score(word, token, field)
+                                     for token, field in self._bank_tokens[bank_id] if token.startswith(word))
+                    if word_score:
+                        scores[bank_id] += word_score
+                    else:
+                        del scores[bank_id]
+
+            # Fall back to banks where every word matches by prefix or, for
+            # typos, by shared trigrams, skipping grams so common they would
+            # touch most of the index
+            if len(scores) < limit:
+                max_postings = max(len(self._banks) // 4, 50)
+                fuzzy: Optional[Dict[str, float]] = None
+                for word in words:
+                    matches = self._word_matches(word, max_postings)
+                    fuzzy = matches if fuzzy is None else {
+                        bank_id: score + matches[bank_id] for bank_id, score in fuzzy.items() if bank_id in matches
+                    }
+                for bank_id, score in fuzzy.items():
+                    scores.setdefault(bank_id, score)
+
+            for bank_id in scores:
+                for token, field in self._bank_tokens[bank_id]:
+                    if token == query and field in ('currencySymbol', 'uniqueId'):
+                        scores[bank_id] += EXACT_BONUS
+                        break
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(round(score, 3), self._banks[bank_id]) for bank_id, score in best]
+
+    def _prefix_count(self, word: str) -> int:
+        return bisect_left(self._tokens, (word + '\uffff',)) - bisect_left(self._tokens, (word,))
+
+    def _word_matches(self, word: str, max_postings: int) -> Dict[str, float]:
+        """Banks one query word matches by prefix or, failing that, by shared trigrams"""
+        matches: Dict[str, float] = {}
+        self._scan_prefix(word, matches)
+        word_grams = trigrams(word)
+        shared: Dict[str, int] = {}
+        for gram in word_grams:
+            postings = self._trigrams.get(gram, ())
+            if len(postings) > max_postings:
+                continue
+            for bank_id in postings:
+                shared[bank_id] = shared.get(bank_id, 0) + 1
+        for bank_id, count in shared.items():
+            similarity = count / len(word_grams)
+            if similarity >= 0.3 and bank_id not in matches:
+                matches[bank_id] = TRIGRAM_WEIGHT * similarity * 4
+        return matches
+
+    def _scan_prefix(self, word: str, scores: Dict[str, float]):
+        start = bisect_left(self._tokens, (word,))
+        end = min(start + MAX_PREFIX_MATCHES, len(self._tokens))
+        for token, field, bank_id in self._tokens[start:end]:
+            if not token.startswith(word):
+                break
+            scores[bank_id] = scores.get(bank_id, 0.0) + prefix_score(word, token, field)
+
+# Singleton instance
+bank_search = BankSearchIndex()
@@ -0,0 +1,108 @@
+from typing import Dict, Iterator, Optional, Set, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import threading
+
+PINNED_CACHE_SIZE = int(os.environ.get('PINNED_CACHE_SIZE', '20000'))
+
+class BlockPin:
+    """The block each deployment's view calls are pinned to for one request.
+
+    A deployment's block is resolved on its first view call, from a known
+    head when one was offered or else from `latest`, and reused for every
+    later one, so a fan-out sees a single consistent state. An offered head
+    may have been reorged out since, so until a call succeeds at it, it can
+    be withdrawn in favour of `latest`.
+    """
+
+    def __init__(self):
+        self._blocks: Dict[str, Tuple[int, str]] = {}
+        self._known: Dict[str, Tuple[int, str]] = {}
+        self._unconfirmed: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def resolve(self, service) -> Tuple[int, str]:
+        """Number and hash of the block pinned for `service`"""
+        with self._lock:
+            block = self._blocks.get(service.name)
+            if block is None:
+                block = self._known.pop(service.name, None)
+                if block is None:
+                    header = service.get_block_header('latest')
+                    block = (header['number'], '0x' + header['hash'].removeprefix('0x'))
+                else:
+                    self._unconfirmed.add(service.name)
+                self._blocks[service.name] = block
+            return block
+
+    def confirm(self, service):
+        """Record that a call succeeded at `service`'s block"""
+        if service.name in self._unconfirmed:
+            with self._lock:
+                self._unconfirmed.discard(service.name)
+
+    def withdraw(self, service) -> bool:
+        """Drop an offered block no call has succeeded at, so `service` resolves latest instead"""
+        with self._lock:
+            if service.name not in self._unconfirmed:
+                return False
+            self._unconfirmed.discard(service.name)
+            del self._blocks[service.name]
+            return True
+
+    def offer(self, service, number: int, block_hash: str):
+        """Resolve `service` to this block instead of latest, if it makes a view call"""
+        with self._lock:
+            self._known[service.name] = (number, '0x' + block_hash.removeprefix('0x'))
+
+    def pin(self, service, number: int, block_hash: str):
+        """Pin `service` to a known block instead of resolving latest"""
+        with self._lock:
+            self._blocks[service.name] = (number, '0x' + block_hash.removeprefix('0x'))
+
+    def numbers(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: number for name, (number, _) in self._blocks.items()}
+
+block_pin: ContextVar[Optional[BlockPin]] = ContextVar('block_pin', default=None)
+
+@contextmanager
+def pinned_blocks() -> Iterator[BlockPin]:
+    """Pin view calls in the block to one block per deployment, unless already pinned"""
+    pin = block_pin.get()
+    if pin is not None:
+        yield pin
+        return
+    pin = BlockPin()
+    token = block_pin.set(pin)
+    try:
+        yield pin
+    finally:
+        block_pin.reset(token)
+
+class PinnedCallCache:
+    """LRU of view-call results keyed by block hash, valid for good"""
+
+    def __init__(self, max_size: int = PINNED_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[tuple, object]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: tuple, value):
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,247 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import time
+import asyncio
+import logging
+
+from services.blockchain_service import blockchain_service, BlockchainService
+from services.reorg import block_chain, BlockHashChain
+from services.rate_limiter import rpc_priority, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+HEAD_POLL_INTERVAL = float(os.environ.get('HEAD_POLL_INTERVAL', '2'))
+# Without a new head for this long the watcher is considered behind, and
+# components that read the head poll the node themselves again
+HEAD_STALE_AFTER = float(os.environ.get('HEAD_STALE_AFTER', '30'))
+RECONNECT_BACKOFF_CAP = 60.0
+# Messages a subscriber may fall behind by before the oldest are dropped
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# Bus topics
+NEW_HEAD = 'head'
+REORG = 'reorg'
+CONTRACT_EVENT = 'event'
+
+class EventBus:
+    """In-process publish/subscribe for chain updates.
+
+    Each subscriber gets its own queue of (topic, message) pairs. Publishing
+    never blocks: a subscriber that falls `SUBSCRIBER_QUEUE_SIZE` messages
+    behind loses its oldest ones. Only use it from the event loop.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, *topics: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        for topic in topics:
+            self._subscribers.setdefault(topic, []).append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        for queues in self._subscribers.values():
+            if queue in queues:
+                queues.remove(queue)
+
+    def publish(self, topic: str, message: Any):
+        self.published += 1
+        for queue in self._subscribers.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((topic, message))
+
+    def subscribers(self) -> int:
+        return len({id(queue) for queues in self._subscribers.values() for queue in queues})
+
+async def next_messages(queue: Optional[asyncio.Queue], timeout: float) -> List[Tuple[str, Any]]:
+    """Wait up to `timeout` seconds for a message, then take every one queued"""
+    if queue is None:
+        await asyncio.sleep(timeout)
+        return []
+    try:
+        messages = [await asyncio.wait_for(queue.get(), timeout)]
+    except asyncio.TimeoutError:
+        return []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+class BlockWatcher:
+    """Follows the chain head and publishes it, with contract events, on a bus.
+
+    With a WebSocket endpoint configured, `newHeads` and the contract's logs
+    arrive by subscription. Otherwise, or while the subscription is down,
+    `eth_blockNumber` is polled and headers and logs are only fetched once
+    it moves. Every new head is linked into the hash chain, so reorgs are
+    detected once here instead of by every component, and the chain is told
+    to trust its head for `HEAD_STALE_AFTER` seconds.
+    """
+
+    def __init__(self, service: BlockchainService, chain: BlockHashChain, bus: EventBus,
+                 ws_url: Optional[str] = None, poll_interval: float = HEAD_POLL_INTERVAL):
+        self.service = service
+        self.chain = chain
+        self.bus = bus
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.mode: Optional[str] = None
+        self.head: Optional[int] = None
+        self.head_seen_at: Optional[float] = None
+        # Last block whose logs were published while polling
+        self._log_block: Optional[int] = None
+        self._fork: Optional[int] = None
+        self._backoff = 1.0
+        self._task: Optional[asyncio.Task] = None
+        chain.on_reorg(self._on_reorg)
+
+    def _on_reorg(self, fork_block: int):
+        # Runs in the thread that advanced the chain; published from the loop
+        if self._fork is None or fork_block < self._fork:
+            self._fork = fork_block
+
+    def is_current(self) -> bool:
+        """Whether a head was seen within `HEAD_STALE_AFTER` seconds"""
+        return self.head_seen_at is not None and time.monotonic() - self.head_seen_at < HEAD_STALE_AFTER
+
+    def current_head(self) -> Optional[Tuple[int, str]]:
+        """Number and hash of the head while it is current, else None"""
+        if self.head is None or not self.is_current():
+            return None
+        block_hash = self.chain.block_hash(self.head)
+        return None if block_hash is None else (self.head, block_hash)
+
+    async def _on_head(self):
+        head = await asyncio.to_thread(self.chain.advance, 0)
+        self.chain.follow(HEAD_STALE_AFTER)
+        self.head_seen_at = time.monotonic()
+
+        fork, self._fork = self._fork, None
+        if fork is not None:
+            if self._log_block is not None and fork <= self._log_block:
+                self._log_block = fork - 1
+            self.bus.publish(REORG, {'forkBlock': fork, 'head': head})
+        if head != self.head or fork is not None:
+            self.head = head
+            self.bus.publish(NEW_HEAD, {
+                'number': head,
+                'hash': self.chain.block_hash(head),
+                'safeBlock': self.chain.safe_block
+            })
+
+    async def _poll(self):
+        self.mode = 'polling'
+        while True:
+            try:
+                number = await asyncio.to_thread(self.service.get_block_number)
+                if number != self.head or not self.is_current():
+                    await self._on_head()
+                    await self._publish_logs(self.head)
+                else:
+                    # An unchanged head is still a live one
+                    self.chain.follow(HEAD_STALE_AFTER)
+                    self.head_seen_at = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Head poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _publish_logs(self, head: int):
+        if self._log_block is None:
+            # Start at the head; history is the event store's job
+            self._log_block = head
+            return
+        if head <= self._log_block:
+            return
+        events = await asyncio.to_thread(
+            self.service.get_events, list(self.service.event_topics), self._log_block + 1, head)
+        for event in events:
+            self.bus.publish(CONTRACT_EVENT, event)
+        self._log_block = head
+
+    async def _subscribe(self):
+        from web3 import AsyncWeb3, WebSocketProvider
+        async with AsyncWeb3(WebSocketProvider(self.ws_url)) as w3:
+            heads = await w3.eth.subscribe('newHeads')
+            logs = await w3.eth.subscribe('logs', {'address': self.service.contract.address})
+            self.mode = 'websocket'
+            self._backoff = 1.0
+            await self._on_head()
+            async for message in w3.socket.process_subscriptions():
+                if message['subscription'] == heads:
+                    await self._on_head()
+                    # Polling picks up from here if the subscription drops
+                    self._log_block = self.head
+                elif message['subscription'] == logs:
+                    log = message['result']
+                    if log.get('removed'):
+                        # Removed logs are covered by the reorg message
+                        continue
+                    event = self.service.decode_log(log)
+                    if event is not None:
+                        self.bus.publish(CONTRACT_EVENT, event)
+        raise ConnectionError("Subscription stream ended")
+
+    async def run(self):
+        """Follow the head until cancelled"""
+        rpc_priority.set(BACKGROUND)
+        if not self.ws_url:
+            await self._poll()
+            return
+        while True:
+            try:
+                await self._subscribe()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Head subscription failed, polling for {self._backoff:.0f}s: {e}")
+            try:
+                await asyncio.wait_for(self._poll(), self._backoff)
+            except asyncio.TimeoutError:
+                pass
+            self._backoff = min(self._backoff * 2, RECONNECT_BACKOFF_CAP)
+
+    def start(self):
+        """Start following the head on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Whoever follows next starts from its own head
+        self.mode = None
+        self.head_seen_at = None
+        self._log_block = None
+
+    async def run_while(self, enabled: Callable[[], bool], interval: float = HEAD_POLL_INTERVAL):
+        """Follow the head only while `enabled()` holds, checked every `interval` seconds"""
+        try:
+            while True:
+                if enabled():
+                    self.start()
+                elif self._task is not None:
+                    await self.stop()
+                await asyncio.sleep(interval)
+        finally:
+            await self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'head': self.head,
+            'headAge': None if self.head_seen_at is None else round(time.monotonic() - self.head_seen_at, 3),
+            'subscribers': self.bus.subscribers(),
+            'published': self.bus.published,
+            'dropped': self.bus.dropped
+        }
+
+# Singleton instances
+chain_bus = EventBus()
+block_watcher = BlockWatcher(blockchain_service, block_chain, chain_bus, ws_url=blockchain_service.ws_url)
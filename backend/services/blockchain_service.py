@@ -1,16 +1,128 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
 from web3 import Web3
-from web3.exceptions import TransactionNotFound
+from web3.exceptions import TransactionNotFound, ContractLogicError
+from eth_utils import event_abi_to_log_topic
+import requests
+import os
 import logging
 
-from config.web3_config import get_web3, get_contract, CONTRACT_ADDRESS
+from config.web3_config import get_web3, get_contract, CONTRACT_ABI, DEPLOYMENTS, RPC_POOL_SIZE
+from services.rate_limiter import RateLimitedHTTPProvider, RpcRateLimiter, rpc_limiter
+from services.hedging import HedgedProvider
+from services.deadline import PartialResult, fan_out
+from services.block_pin import PinnedCallCache, block_pin, pinned_blocks
+from services.abi_codec import CONTRACT_CODECS, raise_for_error
 
 logger = logging.getLogger(__name__)
 
+# Send view calls as raw eth_call payloads through precompiled codecs
+RAW_CALLS = os.environ.get('RPC_RAW_CALLS', '1') == '1'
+
+def format_transfer(transfer) -> Dict[str, Any]:
+    """Convert a raw BankTransfer struct into the API record layout"""
+    return {
+        'transferId': transfer[0],
+        'fromBankId': transfer[1],
+        'toBankId': transfer[2],
+        'amount': int(transfer[3]),
+        'currencyName': transfer[4],
+        'timestamp': int(transfer[5]) * 1000,  # Convert to milliseconds
+        'approved': transfer[6]
+    }
+
+def format_request(request) -> Dict[str, Any]:
+    """Convert a raw BankRequest struct into the API record layout"""
+    return {
+        'bankName': request[0],
+        'currencyName': request[1],
+        'currencySymbol': request[2],
+        'currencyValue': float(request[3]),
+        'submittedBy': request[4],
+        'approved': request[5],
+        'generatedId': request[6]
+    }
+
+def format_event(event) -> Dict[str, Any]:
+    """Convert a decoded log into the API event layout"""
+    return {
+        'event': event['event'],
+        'blockNumber': event['blockNumber'],
+        'blockHash': event['blockHash'].hex(),
+        'transactionHash': event['transactionHash'].hex(),
+        'logIndex': event['logIndex'],
+        'args': dict(event['args'])
+    }
+
+def pooled_session(pool_size: int = RPC_POOL_SIZE) -> requests.Session:
+    """HTTP session keeping up to `pool_size` connections alive for one endpoint"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 class BlockchainService:
-    def __init__(self):
-        self.w3 = get_web3()
-        self.contract = get_contract()
+    def __init__(self, name: str, rpc_url: str, contract_address: str, chain_id: int,
+                 fallback_urls: List[str] = (), ws_url: Optional[str] = None,
+                 limiter: Optional[RpcRateLimiter] = None):
+        self.name = name
+        self.ws_url = ws_url
+        self.chain_id = chain_id
+        self.contract_address = contract_address
+        # Fallback endpoints have quotas of their own
+        endpoints = [RateLimitedHTTPProvider(rpc_url, limiter or RpcRateLimiter(), session=pooled_session())] + [
+            RateLimitedHTTPProvider(url, RpcRateLimiter(), session=pooled_session()) for url in fallback_urls
+        ]
+        self.provider = HedgedProvider(endpoints, name=name)
+        self.w3 = get_web3(self.provider)
+        self.contract = get_contract(self.w3, contract_address)
+        self.event_topics = {
+            item['name']: event_abi_to_log_topic(item)
+            for item in CONTRACT_ABI if item['type'] == 'event'
+        }
+        self._names_by_topic = {topic: name for name, topic in self.event_topics.items()}
+        # Last good per-bank reads, served as stale when a fan-out call fails
+        self._last_banks: Dict[str, Dict[str, Any]] = {}
+        self._last_pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._last_history: Dict[str, List[Dict[str, Any]]] = {}
+        self._pinned_cache = PinnedCallCache()
+
+    def _call(self, function_name: str, *args):
+        """Run a view call, pinned to the request's block when one is pinned"""
+        pin = block_pin.get()
+        if pin is None:
+            return self._view_call(function_name, args, 'latest')
+
+        _, block_hash = pin.resolve(self)
+        # State at a given block hash never changes, so its results are kept for good
+        key = (function_name, args, block_hash)
+        hit, value = self._pinned_cache.get(key)
+        if not hit:
+            try:
+                value = self._view_call(function_name, args, block_hash)
+            except ContractLogicError:
+                raise
+            except Exception:
+                # The watcher's head may have been replaced since it was offered
+                if not pin.withdraw(self):
+                    raise
+                return self._call(function_name, *args)
+            self._pinned_cache.set(key, value)
+        pin.confirm(self)
+        return value
+
+    def _view_call(self, function_name: str, args: tuple, block_identifier: str):
+        """Run a view call at `block_identifier` and decode its result"""
+        codec = CONTRACT_CODECS.get(function_name) if RAW_CALLS else None
+        if codec is None:
+            return getattr(self.contract.functions, function_name)(*args).call(block_identifier=block_identifier)
+        # Skips building a ContractFunction and web3's middleware and generic decoding
+        response = self.provider.make_request('eth_call', [
+            {'to': self.contract.address, 'data': codec.encode(*args)}, block_identifier
+        ])
+        raise_for_error(response)
+        return codec.decode(response['result'])
     
     def is_connected(self) -> bool:
         """Check if connected to blockchain"""
@@ -23,7 +135,7 @@ class BlockchainService:
     def get_contract_owner(self) -> str:
         """Get the contract owner address"""
         try:
-            return self.contract.functions.owner().call()
+            return self._call('owner')
         except Exception as e:
             logger.error(f"Failed to get contract owner: {e}")
             raise
@@ -42,41 +154,34 @@ class BlockchainService:
     def get_pending_requests(self) -> List[Dict[str, Any]]:
         """Get all pending bank requests"""
         try:
-            requests = self.contract.functions.getPendingRequests().call()
+            requests = self._call('getPendingRequests')
             
-            formatted_requests = []
-            for request in requests:
-                formatted_requests.append({
-                    'bankName': request[0],
-                    'currencyName': request[1],
-                    'currencySymbol': request[2],
-                    'currencyValue': float(request[3]),
-                    'submittedBy': request[4],
-                    'approved': request[5],
-                    'generatedId': request[6]
-                })
-            
-            return formatted_requests
+            return [format_request(request) for request in requests]
         except Exception as e:
             logger.error(f"Failed to get pending requests: {e}")
             raise
     
-    def get_bank_ids(self) -> List[str]:
-        """Get all bank IDs"""
+    def get_pending_request_entry(self, index: int) -> Dict[str, Any]:
+        """Get a single bank request by index"""
+        request = self._call('pendingRequests', index)
+        return format_request(request)
+    
+    def get_bank_ids(self, start: int = 0) -> List[str]:
+        """Get all bank IDs, optionally skipping the first `start` entries"""
         try:
             bank_ids = []
-            index = 0
+            index = start
             
             while True:
                 try:
-                    bank_id = self.contract.functions.bankIds(index).call()
+                    bank_id = self._call('bankIds', index)
                     if bank_id:
                         bank_ids.append(bank_id)
                         index += 1
                     else:
                         break
-                except:
-                    # No more bank IDs
+                except ContractLogicError:
+                    # Reading past the end of the array reverts
                     break
             
             return bank_ids
@@ -87,7 +192,7 @@ class BlockchainService:
     def get_bank_details(self, bank_id: str) -> Dict[str, Any]:
         """Get details for a specific bank"""
         try:
-            bank = self.contract.functions.banks(bank_id).call()
+            bank = self._call('banks', bank_id)
             
             return {
                 'uniqueId': bank[0],
@@ -106,21 +211,13 @@ class BlockchainService:
             logger.error(f"Failed to get bank details for {bank_id}: {e}")
             raise
     
-    def get_all_banks(self) -> List[Dict[str, Any]]:
-        """Get details for all banks"""
+    def get_all_banks(self) -> PartialResult:
+        """Get details for all banks at one block, within the request deadline"""
         try:
-            bank_ids = self.get_bank_ids()
-            banks = []
-            
-            for bank_id in bank_ids:
-                try:
-                    bank_details = self.get_bank_details(bank_id)
-                    banks.append(bank_details)
-                except Exception as e:
-                    logger.warning(f"Failed to get details for bank {bank_id}: {e}")
-                    continue
-            
-            return banks
+            with pinned_blocks() as pin:
+                bank_ids = self.get_bank_ids()
+                banks, missing, stale = fan_out(bank_ids, self.get_bank_details, self._last_banks)
+            return PartialResult(banks.values(), missing, stale, pin.numbers().get(self.name))
         except Exception as e:
             logger.error(f"Failed to get all banks: {e}")
             raise
@@ -128,21 +225,9 @@ class BlockchainService:
     def get_pending_transfers(self, bank_id: str) -> List[Dict[str, Any]]:
         """Get pending transfers for a specific bank"""
         try:
-            transfers = self.contract.functions.viewPendingTransactions(bank_id).call()
-            
-            formatted_transfers = []
-            for transfer in transfers:
-                formatted_transfers.append({
-                    'transferId': transfer[0],
-                    'fromBankId': transfer[1],
-                    'toBankId': transfer[2],
-                    'amount': int(transfer[3]),
-                    'currencyName': transfer[4],
-                    'timestamp': int(transfer[5]) * 1000,  # Convert to milliseconds
-                    'approved': transfer[6]
-                })
+            transfers = self._call('viewPendingTransactions', bank_id)
             
-            return formatted_transfers
+            return [format_transfer(transfer) for transfer in transfers]
         except Exception as e:
             logger.error(f"Failed to get pending transfers for {bank_id}: {e}")
             raise
@@ -150,64 +235,56 @@ class BlockchainService:
     def get_transfer_history(self, bank_id: str) -> List[Dict[str, Any]]:
         """Get transfer history for a specific bank"""
         try:
-            transfers = self.contract.functions.getBankTransferHistory(bank_id).call()
+            transfers = self._call('getBankTransferHistory', bank_id)
             
-            formatted_transfers = []
-            for transfer in transfers:
-                formatted_transfers.append({
-                    'transferId': transfer[0],
-                    'fromBankId': transfer[1],
-                    'toBankId': transfer[2],
-                    'amount': int(transfer[3]),
-                    'currencyName': transfer[4],
-                    'timestamp': int(transfer[5]) * 1000,  # Convert to milliseconds
-                    'approved': transfer[6]
-                })
-            
-            return formatted_transfers
+            return [format_transfer(transfer) for transfer in transfers]
         except Exception as e:
             logger.error(f"Failed to get transfer history for {bank_id}: {e}")
             raise
     
-    def get_all_pending_transfers(self) -> List[Dict[str, Any]]:
-        """Get all pending transfers across all banks"""
+    def get_transfer_history_entry(self, bank_id: str, index: int) -> Dict[str, Any]:
+        """Get a single entry of a bank's transfer history by index"""
+        transfer = self._call('bankTransferHistory', bank_id, index)
+        return format_transfer(transfer)
+    
+    def get_pending_transfer_entry(self, bank_id: str, index: int) -> Dict[str, Any]:
+        """Get a single entry of a bank's pending transfers by index"""
+        transfer = self._call('pendingBankTransfers', bank_id, index)
+        return format_transfer(transfer)
+    
+    def get_all_pending_transfers(self) -> PartialResult:
+        """Get all pending transfers across all banks at one block, within the request deadline"""
         try:
-            bank_ids = self.get_bank_ids()
-            all_transfers = []
+            with pinned_blocks() as pin:
+                bank_ids = self.get_bank_ids()
+                by_bank, missing, stale = fan_out(bank_ids, self.get_pending_transfers, self._last_pending)
+            all_transfers = PartialResult(missing=missing, stale=stale, block=pin.numbers().get(self.name))
             
-            for bank_id in bank_ids:
-                try:
-                    transfers = self.get_pending_transfers(bank_id)
-                    # Filter to only include truly pending transfers (not approved)
-                    pending_only = [t for t in transfers if not t['approved']]
-                    all_transfers.extend(pending_only)
-                except Exception as e:
-                    logger.warning(f"Failed to get pending transfers for {bank_id}: {e}")
-                    continue
+            for transfers in by_bank.values():
+                # Filter to only include truly pending transfers (not approved)
+                pending_only = [t for t in transfers if not t['approved']]
+                all_transfers.extend(pending_only)
             
             return all_transfers
         except Exception as e:
             logger.error(f"Failed to get all pending transfers: {e}")
             raise
     
-    def get_all_transfer_history(self) -> List[Dict[str, Any]]:
-        """Get all transfer history across all banks"""
+    def get_all_transfer_history(self) -> PartialResult:
+        """Get all transfer history across all banks at one block, within the request deadline"""
         try:
-            bank_ids = self.get_bank_ids()
-            all_transfers = []
+            with pinned_blocks() as pin:
+                bank_ids = self.get_bank_ids()
+                by_bank, missing, stale = fan_out(bank_ids, self.get_transfer_history, self._last_history)
+            all_transfers = PartialResult(missing=missing, stale=stale, block=pin.numbers().get(self.name))
             transfer_ids = set()  # To avoid duplicates
             
-            for bank_id in bank_ids:
-                try:
-                    transfers = self.get_transfer_history(bank_id)
-                    for transfer in transfers:
-                        # Only include approved transfers in history and avoid duplicates
-                        if transfer['approved'] and transfer['transferId'] not in transfer_ids:
-                            transfer_ids.add(transfer['transferId'])
-                            all_transfers.append(transfer)
-                except Exception as e:
-                    logger.warning(f"Failed to get transfer history for {bank_id}: {e}")
-                    continue
+            for transfers in by_bank.values():
+                for transfer in transfers:
+                    # Only include approved transfers in history and avoid duplicates
+                    if transfer['approved'] and transfer['transferId'] not in transfer_ids:
+                        transfer_ids.add(transfer['transferId'])
+                        all_transfers.append(transfer)
             
             return all_transfers
         except Exception as e:
@@ -216,32 +293,39 @@ class BlockchainService:
     
     # EVENT HANDLING
     
-    def get_recent_events(self, event_name: str, from_block: int = 0) -> List[Dict[str, Any]]:
-        """Get recent events from the contract"""
+    def get_events(self, event_names: List[str], from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        """Get several event types over a block range with a single eth_getLogs call"""
         try:
-            event_filter = getattr(self.contract.events, event_name).create_filter(
-                fromBlock=from_block,
-                toBlock='latest'
-            )
-            
-            events = event_filter.get_all_entries()
+            logs = self.w3.eth.get_logs({
+                'address': self.contract.address,
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'topics': [[Web3.to_hex(self.event_topics[name]) for name in event_names]]
+            })
             
-            formatted_events = []
-            for event in events:
-                formatted_events.append({
-                    'event': event_name,
-                    'blockNumber': event['blockNumber'],
-                    'transactionHash': event['transactionHash'].hex(),
-                    'args': dict(event['args'])
-                })
-            
-            return formatted_events
+            return [self.decode_log(log) for log in logs]
         except Exception as e:
-            logger.error(f"Failed to get {event_name} events: {e}")
+            logger.error(f"Failed to get {', '.join(event_names)} events: {e}")
             raise
     
+    def decode_log(self, log) -> Optional[Dict[str, Any]]:
+        """Decode a raw contract log, or None if it is not one of the contract's events"""
+        event_name = self._names_by_topic.get(bytes(log['topics'][0])) if log['topics'] else None
+        if event_name is None:
+            return None
+        event = getattr(self.contract.events, event_name)().process_log(log)
+        return format_event(event)
+    
     # UTILITY METHODS
     
+    def get_block_number(self) -> int:
+        """Get the latest block number"""
+        try:
+            return self.w3.eth.block_number
+        except Exception as e:
+            logger.error(f"Failed to get block number: {e}")
+            raise
+    
     def get_transaction_receipt(self, tx_hash: str) -> Dict[str, Any]:
         """Get transaction receipt"""
         try:
@@ -259,6 +343,20 @@ class BlockchainService:
             logger.error(f"Failed to get transaction receipt for {tx_hash}: {e}")
             raise
     
+    def get_block_header(self, block_identifier='latest') -> Dict[str, Any]:
+        """Get the number, hash, parent hash and timestamp of a block"""
+        try:
+            block = self.w3.eth.get_block(block_identifier)
+            return {
+                'number': block['number'],
+                'hash': block['hash'].hex(),
+                'parentHash': block['parentHash'].hex(),
+                'timestamp': block['timestamp']
+            }
+        except Exception as e:
+            logger.error(f"Failed to get block {block_identifier}: {e}")
+            raise
+    
     def validate_address(self, address: str) -> bool:
         """Validate Ethereum address"""
         try:
@@ -266,5 +364,5 @@ class BlockchainService:
         except Exception:
             return False
 
-# Singleton instance
-blockchain_service = BlockchainService()
\ No newline at end of file
+# Singleton instance for the primary deployment
+blockchain_service = BlockchainService(**DEPLOYMENTS[0], limiter=rpc_limiter)
\ No newline at end of file
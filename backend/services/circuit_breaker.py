@@ -0,0 +1,98 @@
+from typing import Any, Deque, Dict, Tuple
+from collections import deque
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = float(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '0.5'))
+WINDOW_SECONDS = float(os.environ.get('CIRCUIT_WINDOW', '30'))
+MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', '10'))
+COOLDOWN_SECONDS = float(os.environ.get('CIRCUIT_COOLDOWN', '15'))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream that is failing too often"""
+
+class CircuitBreaker:
+    """Fails calls fast while an upstream's recent error rate is too high.
+
+    Outcomes from the last `window` seconds are kept; once at least
+    `min_calls` were seen and the failure share reaches `threshold`, the
+    circuit opens and calls are refused for `cooldown` seconds. After that a
+    single probe call is let through, closing the circuit on success and
+    reopening it on failure.
+    """
+
+    def __init__(self, name: str, threshold: float = FAILURE_THRESHOLD, window: float = WINDOW_SECONDS,
+                 min_calls: int = MIN_CALLS, cooldown: float = COOLDOWN_SECONDS):
+        self.name = name
+        self.threshold = threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go ahead"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpen(f"Circuit for {self.name} is open")
+
+    def record(self, success: bool):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if success:
+                    logger.info(f"Circuit for {self.name} closed")
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                else:
+                    self._open(now)
+                return
+            if self.state == OPEN:
+                return
+
+            self._outcomes.append((now, success))
+            self._failures += not success
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                _, ok = self._outcomes.popleft()
+                self._failures -= not ok
+            if len(self._outcomes) >= self.min_calls and self._failures / len(self._outcomes) >= self.threshold:
+                self._open(now)
+
+    def abandon(self):
+        """Forget an allowed call that ended without an outcome"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def _open(self, now: float):
+        logger.warning(f"Circuit for {self.name} opened after {self._failures}/{len(self._outcomes)} failures")
+        self.state = OPEN
+        self._opened_at = now
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': len(self._outcomes),
+                'failures': self._failures,
+            }
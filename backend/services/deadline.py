@@ -0,0 +1,85 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', '10'))
+# Budget for fan-out loads that run outside any request
+FANOUT_DEADLINE = float(os.environ.get('FANOUT_DEADLINE', '30'))
+# Smallest slice a sub-call gets, so a nearly spent budget still tries
+MIN_CALL_BUDGET = 0.05
+
+class DeadlineExceeded(Exception):
+    """Raised when a call would run past the deadline of its request"""
+
+# Monotonic time by which the current request must finish
+request_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one"""
+    deadline_at = request_deadline.get()
+    return None if deadline_at is None else deadline_at - time.monotonic()
+
+def check_deadline():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+@contextmanager
+def deadline(seconds: float):
+    """Run the block with at most `seconds` left, never extending an outer deadline"""
+    deadline_at = time.monotonic() + seconds
+    outer = request_deadline.get()
+    token = request_deadline.set(deadline_at if outer is None else min(outer, deadline_at))
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+class PartialResult(list):
+    """A fan-out result that may lack some keys or carry stale values for them,
+    read at `block` when the fan-out was pinned to one"""
+
+    def __init__(self, items: Iterable[Any] = (), missing: List[str] = (), stale: List[str] = (),
+                 block: Optional[int] = None):
+        super().__init__(items)
+        self.missing = list(missing)
+        self.stale = list(stale)
+        self.block = block
+
+def fan_out(keys: List[Hashable], fetch: Callable[[Any], Any],
+            fallback: Optional[Dict[Hashable, Any]] = None) -> Tuple[Dict[Hashable, Any], List[Any], List[Any]]:
+    """Fetch every key in turn within the current deadline
+
+    Whatever budget is left is split evenly across the keys still to go, so
+    one slow call cannot use up the others' time. A key that fails or runs
+    out of time takes its last good value from `fallback` and is reported
+    stale, or is reported missing if there is none. Returns the values by
+    key, the missing keys and the stale keys; `fallback` is updated with
+    every fresh value.
+    """
+    fallback = {} if fallback is None else fallback
+    values: Dict[Hashable, Any] = {}
+    missing, stale = [], []
+
+    with deadline(FANOUT_DEADLINE):
+        for i, key in enumerate(keys):
+            left = remaining()
+            try:
+                if left <= 0:
+                    raise DeadlineExceeded("Request deadline exceeded")
+                with deadline(max(left / (len(keys) - i), MIN_CALL_BUDGET)):
+                    values[key] = fallback[key] = fetch(key)
+                continue
+            except Exception as e:
+                logger.warning(f"Failed to fetch {key}: {e}")
+            if key in fallback:
+                values[key] = fallback[key]
+                stale.append(key)
+            else:
+                missing.append(key)
+    return values, missing, stale
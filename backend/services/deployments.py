@@ -0,0 +1,83 @@
+from typing import Any, Callable, Dict, List
+import asyncio
+import logging
+
+from config.web3_config import DEPLOYMENTS
+from services.blockchain_service import blockchain_service, BlockchainService
+from services.refresher import refresher, SnapshotRefresher
+
+logger = logging.getLogger(__name__)
+
+class DeploymentSet:
+    """Every configured BankRequests deployment, queried side by side.
+
+    The primary deployment is the shared `blockchain_service` behind the
+    indexed trackers; each other one gets its own pooled provider and rate
+    limiter. A dataset registered for all of them is cached per deployment
+    under `<dataset>@<deployment>` (the primary keeps the bare name), and
+    merged reads fetch every deployment concurrently, so they take as long
+    as the slowest one.
+    """
+
+    def __init__(self, primary: BlockchainService, configs: List[Dict[str, Any]], refresher: SnapshotRefresher):
+        self.primary = primary
+        self.services: Dict[str, BlockchainService] = {primary.name: primary}
+        for config in configs[1:]:
+            self.services[config['name']] = BlockchainService(**config)
+        self.refresher = refresher
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.services)
+
+    def get(self, name: str) -> BlockchainService:
+        service = self.services.get(name)
+        if service is None:
+            raise KeyError(f"Unknown deployment {name}")
+        return service
+
+    def dataset(self, base: str, name: str) -> str:
+        return base if name == self.primary.name else f'{base}@{name}'
+
+    def register(self, base: str, loader: Callable[[BlockchainService], Callable[[], Any]], **kwargs):
+        """Register a refresher dataset per deployment, `loader(service)` giving its loader"""
+        for name, service in self.services.items():
+            self.refresher.register(self.dataset(base, name), loader(service), **kwargs)
+
+    async def gather(self, base: str) -> Dict[str, Any]:
+        """Merged records of a dataset, labelled by deployment
+
+        Returns the records, the error of each deployment that failed, the
+        banks missing from or stale in a partial load (as bank@deployment
+        outside the primary), the block each deployment's snapshot was read
+        at, and the age of the oldest snapshot used.
+        """
+        names = self.names
+        results = await asyncio.gather(
+            *(self.refresher.get(self.dataset(base, name)) for name in names),
+            return_exceptions=True
+        )
+        records, failures, missing, stale, blocks, age = [], {}, [], [], {}, 0.0
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Deployment {name} failed to serve {base}: {result}")
+                failures[name] = str(result)
+                continue
+            value, value_age = result
+            age = max(age, value_age)
+            records.extend({**record, 'deployment': name} for record in value)
+            dataset_missing, dataset_stale = self.refresher.completeness(self.dataset(base, name))
+            missing.extend(self.dataset(bank_id, name) for bank_id in dataset_missing)
+            stale.extend(self.dataset(bank_id, name) for bank_id in dataset_stale)
+            block = self.refresher.datasets[self.dataset(base, name)].block
+            if block is not None:
+                blocks[name] = block
+        if failures and len(failures) == len(names):
+            raise RuntimeError(f"All deployments failed: {failures}")
+        return {
+            'records': records, 'failures': failures, 'missing': missing,
+            'stale': stale, 'blocks': blocks, 'age': age
+        }
+
+# Singleton instance
+deployments = DeploymentSet(blockchain_service, DEPLOYMENTS, refresher)
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional, Tuple
+from bisect import bisect_left
+import os
+import threading
+import logging
+
+from services.blockchain_service import blockchain_service, BlockchainService
+from services.reorg import block_chain, BlockHashChain
+
+logger = logging.getLogger(__name__)
+
+# Nothing to scan before the contract existed
+DEPLOYMENT_BLOCK = int(os.environ.get('CONTRACT_DEPLOYMENT_BLOCK', '0'))
+# Blocks per eth_getLogs call; hosted endpoints reject much larger ranges
+CHUNK_SIZE = int(os.environ.get('EVENT_CACHE_CHUNK_SIZE', '5000'))
+
+class EventCache:
+    """Reorg-aware cache of decoded contract events.
+
+    Events at or below the chain's safe block are final and kept forever as
+    one contiguous range per event type, extended as the boundary moves up
+    in windows of CHUNK_SIZE blocks.
+    Events above it are provisional: refetched when the head moves and
+    dropped as soon as a reorg is detected.
+    """
+
+    def __init__(self, service: BlockchainService, chain: BlockHashChain):
+        self.service = service
+        self.chain = chain
+        self._lock = threading.RLock()
+        self._final: Dict[str, List[Dict[str, Any]]] = {}
+        self._final_blocks: Dict[str, List[int]] = {}
+        self._final_to: Dict[str, int] = {}
+        self._provisional: Dict[str, Tuple[int, int, List[Dict[str, Any]]]] = {}
+        self._rollback_to: Optional[int] = None
+        chain.on_reorg(self._on_reorg)
+
+    def _on_reorg(self, fork_block: int):
+        # Applied under our own lock on the next read
+        if self._rollback_to is None or fork_block < self._rollback_to:
+            self._rollback_to = fork_block
+
+    def _apply_rollback(self):
+        fork_block, self._rollback_to = self._rollback_to, None
+        if fork_block is None:
+            return
+
+        self._provisional.clear()
+        for event_name, covered in self._final_to.items():
+            if fork_block <= covered:
+                logger.error(f"Reorg at {fork_block} reached final {event_name} events, truncating")
+                keep = bisect_left(self._final_blocks[event_name], fork_block)
+                del self._final[event_name][keep:]
+                del self._final_blocks[event_name][keep:]
+                self._final_to[event_name] = fork_block - 1
+
+    def get_events(self, event_name: str, from_block: int = 0) -> List[Dict[str, Any]]:
+        """Get events of one type from `from_block` up to the head"""
+        with self._lock:
+            head = self.chain.advance()
+            self._apply_rollback()
+            safe = min(self.chain.safe_block, head)
+
+            final = self._final.setdefault(event_name, [])
+            final_blocks = self._final_blocks.setdefault(event_name, [])
+            covered = self._final_to.get(event_name, DEPLOYMENT_BLOCK - 1)
+            while safe > covered:
+                to_block = min(covered + CHUNK_SIZE, safe)
+                new_events = self.service.get_events([event_name], covered + 1, to_block)
+                final.extend(new_events)
+                final_blocks.extend(event['blockNumber'] for event in new_events)
+                # Advance per window so a failure keeps the windows already read
+                self._final_to[event_name] = covered = to_block
+
+            cached = self._provisional.get(event_name)
+            if cached is None or cached[:2] != (head, covered):
+                events = self.service.get_events([event_name], covered + 1, head) if head > covered else []
+                cached = (head, covered, events)
+                self._provisional[event_name] = cached
+            provisional = cached[2]
+
+            start = bisect_left(final_blocks, from_block)
+            return final[start:] + [event for event in provisional if event['blockNumber'] >= from_block]
+
+    def export_state(self) -> Dict[str, Any]:
+        """Final events only; provisional ones are cheap to refetch"""
+        with self._lock:
+            return {
+                'final': {name: list(events) for name, events in self._final.items()},
+                'finalTo': dict(self._final_to)
+            }
+
+    def restore_state(self, state: Dict[str, Any]):
+        with self._lock:
+            self._final = state['final']
+            self._final_blocks = {
+                name: [event['blockNumber'] for event in events] for name, events in self._final.items()
+            }
+            self._final_to = state['finalTo']
+            self._provisional.clear()
+
+# Singleton instance
+event_cache = EventCache(blockchain_service, block_chain)
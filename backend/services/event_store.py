@@ -0,0 +1,234 @@
+from typing import Any, Callable, Dict, List, Literal, Optional
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+import os
+import asyncio
+import logging
+
+from config.web3_config import CONTRACT_ABI
+from services.blockchain_service import BlockchainService
+from services.reorg import BlockHashChain
+from services.event_cache import DEPLOYMENT_BLOCK
+from services.rate_limiter import rpc_priority, BACKGROUND
+from services.block_watcher import EventBus, NEW_HEAD, REORG, CONTRACT_EVENT, next_messages, HEAD_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.environ.get('EVENT_STORE_POLL_INTERVAL', '15'))
+# Blocks per eth_getLogs request while catching up
+CHUNK_SIZE = int(os.environ.get('EVENT_STORE_CHUNK_SIZE', '5000'))
+MAX_PAGE_SIZE = 1000
+
+EVENT_NAMES = [item['name'] for item in CONTRACT_ABI if item['type'] == 'event']
+# uint256 arguments overflow BSON integers, so they are stored as decimal strings
+UINT_ARGS = {
+    item['name']: {arg['name'] for arg in item['inputs'] if arg['type'].startswith('uint')}
+    for item in CONTRACT_ABI if item['type'] == 'event'
+}
+
+def to_document(event: Dict[str, Any], timestamp: int) -> Dict[str, Any]:
+    uint_args = UINT_ARGS.get(event['event'], ())
+    return {
+        **event,
+        'args': {k: str(v) if k in uint_args else v for k, v in event['args'].items()},
+        'timestamp': datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    }
+
+def from_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    uint_args = UINT_ARGS.get(doc['event'], ())
+    doc['args'] = {k: int(v) if k in uint_args else v for k, v in doc['args'].items()}
+    doc['timestamp'] = int(doc['timestamp'].replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return doc
+
+class EventStore:
+    """Decoded contract events persisted to MongoDB for indexed queries.
+
+    A background task ingests every contract event from the last checkpoint
+    to the head in chunks, stamped with its block time. A reorg deletes the
+    events from the fork block up and rewinds the checkpoint. Queries by
+    event type, bank, transfer, block range and time range are served from
+    the collection's indexes instead of scanning the chain.
+
+    Workers that do not follow the chain themselves can relay what another
+    worker stores onto their own bus, so their subscribers still see heads,
+    reorgs and events without touching the node.
+    """
+
+    def __init__(self, db, service: BlockchainService, chain: BlockHashChain):
+        self.events = db.contract_events
+        self.state = db.event_store_state
+        self.service = service
+        self.chain = chain
+        self._rollback_to: Optional[int] = None
+        chain.on_reorg(self._on_reorg)
+
+    def _on_reorg(self, fork_block: int):
+        # Applied on the next sync
+        if self._rollback_to is None or fork_block < self._rollback_to:
+            self._rollback_to = fork_block
+
+    async def ensure_indexes(self):
+        await self.events.create_index([('transactionHash', ASCENDING), ('logIndex', ASCENDING)], unique=True)
+        await self.events.create_index([('event', ASCENDING), ('blockNumber', ASCENDING)])
+        await self.events.create_index([('blockNumber', ASCENDING), ('logIndex', ASCENDING)])
+        await self.events.create_index('timestamp')
+        for arg in ('bankId', 'transferId', 'fromBankId', 'toBankId', 'uniqueId'):
+            await self.events.create_index(f'args.{arg}')
+
+    async def _checkpoint(self) -> int:
+        doc = await self.state.find_one({'_id': 'events'})
+        return doc['lastBlock'] if doc else DEPLOYMENT_BLOCK - 1
+
+    async def _set_checkpoint(self, block_number: int):
+        await self.state.update_one({'_id': 'events'}, {'$set': {
+            'lastBlock': block_number,
+            'hash': self.chain.block_hash(block_number),
+            'safeBlock': self.chain.safe_block
+        }}, upsert=True)
+
+    async def sync(self) -> int:
+        """Ingest events up to the head, returning how many were stored"""
+        head = await asyncio.to_thread(self.chain.advance)
+
+        fork_block, self._rollback_to = self._rollback_to, None
+        if fork_block is not None:
+            await self.events.delete_many({'blockNumber': {'$gte': fork_block}})
+            if fork_block <= await self._checkpoint():
+                await self._set_checkpoint(fork_block - 1)
+                # Counted so relays notice even once the checkpoint is past the fork again
+                await self.state.update_one({'_id': 'events'}, {
+                    '$set': {'forkBlock': fork_block}, '$inc': {'reorgs': 1}
+                })
+
+        stored = 0
+        last_block = await self._checkpoint()
+        while last_block < head:
+            to_block = min(last_block + CHUNK_SIZE, head)
+            events = await asyncio.to_thread(self.service.get_events, EVENT_NAMES, last_block + 1, to_block)
+            if events:
+                timestamps = await asyncio.to_thread(self._block_timestamps, {e['blockNumber'] for e in events})
+                await self.events.bulk_write([
+                    UpdateOne(
+                        {'transactionHash': e['transactionHash'], 'logIndex': e['logIndex']},
+                        {'$set': to_document(e, timestamps[e['blockNumber']])},
+                        upsert=True
+                    )
+                    for e in events
+                ], ordered=False)
+                stored += len(events)
+            await self._set_checkpoint(to_block)
+            last_block = to_block
+        return stored
+
+    def _block_timestamps(self, block_numbers) -> Dict[int, int]:
+        return {n: self.service.get_block_header(n)['timestamp'] for n in block_numbers}
+
+    async def run(self, enabled: Callable[[], bool] = lambda: True, interval: float = POLL_INTERVAL,
+                  bus: Optional[EventBus] = None):
+        """Keep ingesting while `enabled()` holds"""
+        rpc_priority.set(BACKGROUND)
+        await self.ensure_indexes()
+        # Woken by each new head, with `interval` as the fallback when none arrive
+        queue = bus.subscribe(NEW_HEAD) if bus is not None else None
+        try:
+            while True:
+                if enabled():
+                    try:
+                        await self.sync()
+                    except Exception as e:
+                        logger.warning(f"Event store sync failed: {e}")
+                await next_messages(queue, interval)
+        finally:
+            if queue is not None:
+                bus.unsubscribe(queue)
+
+    async def relay(self, bus: EventBus, enabled: Callable[[], bool] = lambda: True,
+                    interval: float = HEAD_POLL_INTERVAL):
+        """Publish the events another worker stores on `bus` while `enabled()` holds
+
+        Each new checkpoint is published as a head, after the events stored
+        up to it, and each rollback as a reorg followed by the events stored
+        again since its fork block.
+        """
+        last_block = reorgs = None
+        while True:
+            if not enabled():
+                last_block = reorgs = None
+            else:
+                try:
+                    state = await self.state.find_one({'_id': 'events'})
+                    if state is not None:
+                        if last_block is not None:
+                            if state.get('reorgs', 0) != reorgs:
+                                bus.publish(REORG, {'forkBlock': state['forkBlock'], 'head': state['lastBlock']})
+                                last_block = min(last_block, state['forkBlock'] - 1)
+                            if state['lastBlock'] > last_block:
+                                for event in await self._stored_events(
+                                        {'blockNumber': {'$gt': last_block, '$lte': state['lastBlock']}}):
+                                    bus.publish(CONTRACT_EVENT, event)
+                            if state['lastBlock'] != last_block:
+                                bus.publish(NEW_HEAD, {
+                                    'number': state['lastBlock'], 'hash': state.get('hash'),
+                                    'safeBlock': state.get('safeBlock')
+                                })
+                        last_block, reorgs = state['lastBlock'], state.get('reorgs', 0)
+                except Exception as e:
+                    logger.warning(f"Event relay failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def _stored_events(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Stored events in chain order, laid out as the event cache returns them"""
+        cursor = self.events.find(query, {'_id': 0}).sort([('blockNumber', ASCENDING), ('logIndex', ASCENDING)])
+        events = [from_document(doc) for doc in await cursor.to_list(None)]
+        for stored in events:
+            del stored['timestamp']
+        return events
+
+    async def events_since(self, event: str, from_block: int = 0) -> List[Dict[str, Any]]:
+        """Every stored event of one type from `from_block` on, laid out as the event cache returns them"""
+        return await self._stored_events({'event': event, 'blockNumber': {'$gte': from_block}})
+
+    async def query(self, event: Optional[str] = None, bank_id: Optional[str] = None,
+                    transfer_id: Optional[str] = None, from_block: Optional[int] = None,
+                    to_block: Optional[int] = None, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, limit: int = 100, skip: int = 0,
+                    order: Literal['asc', 'desc'] = 'asc') -> Dict[str, Any]:
+        """Filter stored events, newest or oldest first, one page at a time"""
+        query: Dict[str, Any] = {}
+        if event:
+            query['event'] = event
+        if bank_id:
+            query['$or'] = [
+                {'args.bankId': bank_id}, {'args.fromBankId': bank_id},
+                {'args.toBankId': bank_id}, {'args.uniqueId': bank_id}
+            ]
+        if transfer_id:
+            query['args.transferId'] = transfer_id
+        if from_block is not None or to_block is not None:
+            query['blockNumber'] = {}
+            if from_block is not None:
+                query['blockNumber']['$gte'] = from_block
+            if to_block is not None:
+                query['blockNumber']['$lte'] = to_block
+        if since is not None or until is not None:
+            query['timestamp'] = {}
+            if since is not None:
+                query['timestamp']['$gte'] = since
+            if until is not None:
+                query['timestamp']['$lte'] = until
+
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        direction = DESCENDING if order == 'desc' else ASCENDING
+        cursor = (
+            self.events.find(query, {'_id': 0})
+            .sort([('blockNumber', direction), ('logIndex', direction)])
+            .skip(skip)
+            .limit(limit + 1)
+        )
+        docs = await cursor.to_list(limit + 1)
+        return {
+            'events': [from_document(doc) for doc in docs[:limit]],
+            'skip': skip,
+            'limit': limit,
+            'hasMore': len(docs) > limit
+        }
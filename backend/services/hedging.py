@@ -0,0 +1,276 @@
+from typing import Any, Deque, Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import ContextVar, copy_context
+from web3.providers.base import BaseProvider
+import requests
+import os
+import random
+import threading
+import time
+import logging
+
+from services.circuit_breaker import CircuitBreaker
+from services.deadline import DeadlineExceeded, check_deadline, remaining
+
+logger = logging.getLogger(__name__)
+
+HEDGING_ENABLED = os.environ.get('RPC_HEDGING', '1') == '1'
+# Floor and fallback for the hedge delay until enough latencies are sampled
+MIN_HEDGE_DELAY = float(os.environ.get('RPC_MIN_HEDGE_DELAY', '0.05'))
+DEFAULT_HEDGE_DELAY = float(os.environ.get('RPC_DEFAULT_HEDGE_DELAY', '1.0'))
+MAX_ATTEMPTS = int(os.environ.get('RPC_MAX_ATTEMPTS', '3'))
+RETRIES_PER_REQUEST = int(os.environ.get('RPC_RETRIES_PER_REQUEST', '5'))
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 2.0
+LATENCY_WINDOW = 512
+MIN_SAMPLES = 20
+
+# Read-only methods that are safe to duplicate and retry
+IDEMPOTENT_METHODS = {
+    'eth_call', 'eth_blockNumber', 'eth_chainId', 'net_version', 'eth_getLogs',
+    'eth_getBlockByNumber', 'eth_getBlockByHash', 'eth_getTransactionReceipt',
+    'eth_getTransactionByHash', 'eth_getTransactionCount', 'eth_getBalance',
+    'eth_getCode', 'eth_gasPrice', 'eth_feeHistory', 'eth_estimateGas',
+    'eth_maxPriorityFeePerGas',
+}
+# Tags naming a block by an endpoint's own view of the chain
+HEAD_TAGS = {'latest', 'pending', 'safe', 'finalized'}
+# JSON-RPC errors that blame the endpoint rather than the request, e.g.
+# "header not found" from a lagging node or -32005 limit exceeded
+TRANSIENT_RPC_CODES = {-32000, -32002, -32005, -32603}
+
+class RetryBudget:
+    """Retries one API request may spend across all of its upstream calls"""
+
+    def __init__(self, retries: int = RETRIES_PER_REQUEST):
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+retry_budget: ContextVar[Optional[RetryBudget]] = ContextVar('retry_budget', default=None)
+
+class RpcResponseError(Exception):
+    """A JSON-RPC error response, raised so it loses hedge races and can be retried"""
+
+    def __init__(self, response: Dict[str, Any]):
+        super().__init__(response['error'])
+        self.response = response
+
+def failed(response: Any) -> bool:
+    """Whether a response carries an error other than a revert, which is a real answer"""
+    error = response.get('error') if isinstance(response, dict) else None
+    if error is None:
+        return False
+    if isinstance(error, dict) and (error.get('code') == 3 or 'revert' in str(error.get('message', '')).lower()):
+        return False
+    return True
+
+def is_transient(error: Exception) -> bool:
+    """Network failures, 5xx responses and endpoint-side RPC errors are worth another attempt"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    if isinstance(error, RpcResponseError):
+        rpc_error = error.response['error']
+        return isinstance(rpc_error, dict) and rpc_error.get('code') in TRANSIENT_RPC_CODES
+    return False
+
+def reads_head(method, params) -> bool:
+    """Whether a call asks for the endpoint's head, which a lagging fallback would answer with an older one"""
+    if method == 'eth_blockNumber':
+        return True
+    return method == 'eth_getBlockByNumber' and bool(params) and params[0] in HEAD_TAGS
+
+class LatencyTracker:
+    """Sliding window of latencies with cached percentiles"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._sorted: List[float] = []
+        self._dirty = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._dirty += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            # Re-sorting 512 floats is cheap, but skip it while few samples changed
+            if self._dirty >= MIN_SAMPLES or not self._sorted:
+                self._sorted = sorted(self._samples)
+                self._dirty = 0
+            return self._sorted[min(int(q * len(self._sorted)), len(self._sorted) - 1)]
+
+class HedgedProvider(BaseProvider):
+    """Provider that hedges slow idempotent calls and retries transient failures.
+
+    A read goes to the primary endpoint first. If it has not answered by the
+    running p95 latency, a duplicate goes to the next endpoint and the first
+    successful answer wins; a JSON-RPC error other than a revert counts as a
+    failure. Head reads are never hedged, since a lagging fallback would
+    answer them with an older head. Transient failures, including
+    endpoint-side RPC errors, are retried with full-jitter backoff, bounded
+    per call and by the retry budget of the surrounding API request.
+    No call waits past the request deadline, and a circuit breaker refuses
+    calls outright while the upstream keeps failing.
+    """
+
+    def __init__(self, providers: List[BaseProvider], hedging: bool = HEDGING_ENABLED,
+                 max_attempts: int = MAX_ATTEMPTS, name: str = 'rpc'):
+        super().__init__()
+        self.providers = providers
+        self.breaker = CircuitBreaker(name)
+        self.hedging = hedging
+        self.max_attempts = max_attempts
+        self.primary_latency = LatencyTracker()
+        self.observed_latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='rpc-hedge')
+        self._counters = {'calls': 0, 'hedges': 0, 'hedgeWins': 0, 'retries': 0, 'retriesDenied': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return any(provider.is_connected() for provider in self.providers)
+
+    def make_request(self, method, params):
+        check_deadline()
+        self.breaker.allow()
+        if method not in IDEMPOTENT_METHODS:
+            try:
+                response = self.providers[0].make_request(method, params)
+            except Exception as e:
+                self.breaker.record(not is_transient(e))
+                raise
+            self.breaker.record(True)
+            return response
+
+        self._count('calls')
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._hedged_request(method, params)
+                self.breaker.record(True)
+                self.observed_latency.record(time.monotonic() - started)
+                return response
+            except DeadlineExceeded:
+                # Says nothing about the upstream, but must not strand a probe
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                self.breaker.record(not is_transient(e))
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                left = remaining()
+                if (not is_transient(e) or attempt >= self.max_attempts or (left is not None and delay >= left)
+                        or not self._take_retry()):
+                    if isinstance(e, RpcResponseError):
+                        # The caller turns the node's error into an exception as usual
+                        return e.response
+                    raise
+                logger.warning(f"Retrying {method} in {delay:.2f}s after: {e}")
+                time.sleep(delay)
+                self.breaker.allow()
+
+    def _take_retry(self) -> bool:
+        budget = retry_budget.get()
+        if budget is not None and not budget.take():
+            self._count('retriesDenied')
+            return False
+        self._count('retries')
+        return True
+
+    def _submit(self, provider: BaseProvider, method, params):
+        # Each worker thread needs its own copy of the caller's context
+        return self._executor.submit(copy_context().run, self._timed_request, provider, method, params)
+
+    def _timed_request(self, provider: BaseProvider, method, params):
+        started = time.monotonic()
+        response = provider.make_request(method, params)
+        if provider is self.providers[0]:
+            self.primary_latency.record(time.monotonic() - started)
+        if failed(response):
+            raise RpcResponseError(response)
+        return response
+
+    def hedge_delay(self) -> float:
+        p95 = self.primary_latency.percentile(0.95)
+        return DEFAULT_HEDGE_DELAY if p95 is None else max(p95, MIN_HEDGE_DELAY)
+
+    def _wait(self, futures, timeout: Optional[float] = None, return_when=FIRST_COMPLETED):
+        # An abandoned call finishes in its worker; only the caller stops waiting
+        left = remaining()
+        if left is not None and (timeout is None or left < timeout):
+            done, pending = wait(futures, timeout=max(left, 0), return_when=return_when)
+            if not done:
+                raise DeadlineExceeded("Request deadline exceeded waiting for RPC")
+            return done, pending
+        return wait(futures, timeout=timeout, return_when=return_when)
+
+    def _hedged_request(self, method, params):
+        if not self.hedging or reads_head(method, params):
+            if remaining() is None:
+                return self._timed_request(self.providers[0], method, params)
+            primary = self._submit(self.providers[0], method, params)
+            self._wait([primary])
+            return primary.result()
+
+        primary = self._submit(self.providers[0], method, params)
+        done, _ = self._wait([primary], timeout=self.hedge_delay())
+        if done:
+            return primary.result()
+
+        self._count('hedges')
+        secondary_provider = self.providers[1 % len(self.providers)]
+        hedge = self._submit(secondary_provider, method, params)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = self._wait(pending)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedgeWins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            **counters,
+            'endpoints': len(self.providers),
+            'circuit': self.breaker.stats(),
+            'hedgeRate': round(counters['hedges'] / counters['calls'], 4) if counters['calls'] else 0.0,
+            'hedgeDelayMs': ms(self.hedge_delay()),
+            'primaryLatencyMs': {
+                'p50': ms(self.primary_latency.percentile(0.5)),
+                'p95': ms(self.primary_latency.percentile(0.95)),
+                'p99': ms(self.primary_latency.percentile(0.99)),
+            },
+            'observedLatencyMs': {
+                'p50': ms(self.observed_latency.percentile(0.5)),
+                'p95': ms(self.observed_latency.percentile(0.95)),
+                'p99': ms(self.observed_latency.percentile(0.99)),
+            },
+        }
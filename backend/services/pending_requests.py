@@ -0,0 +1,135 @@
+from typing import List, Dict, Any, Optional, Iterable
+from web3.exceptions import ContractLogicError
+import os
+import time
+import threading
+import logging
+
+from services.blockchain_service import blockchain_service, BlockchainService
+from services.reorg import block_chain, BlockHashChain
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = float(os.environ.get('PENDING_REQUESTS_RECONCILE_INTERVAL', '600'))
+
+class PendingRequestTracker:
+    """Event-maintained copy of the contract's bank request array.
+
+    The array only grows, so `BankRequested` events read just the entries
+    past the local length through `pendingRequests(index)`, and
+    `BankApproved` flags the matching entry as approved in place. Reads are
+    a copy of the local array and cost no upstream calls while the head has
+    not moved. A periodic `getPendingRequests()` corrects any drift, and a
+    reorg reaching back past the last applied block forces one.
+    """
+
+    TRACKED_EVENTS = ['BankRequested', 'BankApproved']
+
+    def __init__(self, service: BlockchainService, chain: BlockHashChain,
+                 reconcile_interval: float = RECONCILE_INTERVAL):
+        self.service = service
+        self.chain = chain
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.RLock()
+        self._requests: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, int] = {}
+        self._last_block: Optional[int] = None
+        self._last_reconcile = 0.0
+        self._reorged = False
+        chain.on_reorg(self._on_reorg)
+
+    def _on_reorg(self, fork_block: int):
+        # Applied under our own lock on the next refresh
+        last_block = self._last_block
+        if last_block is not None and fork_block <= last_block:
+            self._reorged = True
+
+    def refresh(self):
+        """Apply contract events since the last refresh, reconciling when due"""
+        with self._lock:
+            head = self.chain.advance()
+
+            if (self._last_block is None or self._reorged
+                    or time.monotonic() - self._last_reconcile >= self.reconcile_interval):
+                self.reconcile(head)
+                return
+
+            if head > self._last_block:
+                events = self.service.get_events(self.TRACKED_EVENTS, self._last_block + 1, head)
+                self.apply_events(events)
+                self._last_block = head
+
+    def apply_events(self, events: Iterable[Dict[str, Any]]):
+        """Update the local array from decoded contract events, in chain order"""
+        with self._lock:
+            scanned = False
+            for event in events:
+                if event['event'] == 'BankRequested':
+                    if not scanned:
+                        # One scan picks up every request appended so far
+                        self._scan()
+                        scanned = True
+                elif event['event'] == 'BankApproved':
+                    self._approve(event['args'])
+
+    def reconcile(self, head: Optional[int] = None):
+        """Replace the local array with a full read of the contract's"""
+        with self._lock:
+            self._reorged = False
+            if head is None:
+                head = self.chain.advance()
+
+            requests = self.service.get_pending_requests()
+            if self._last_block is not None and requests != self._requests:
+                logger.warning(f"Pending request drift at block {head}: {len(requests)} on chain, {len(self._requests)} tracked")
+            self._requests = requests
+            self._by_id = {request['generatedId']: i for i, request in enumerate(requests)}
+
+            self._last_block = head
+            self._last_reconcile = time.monotonic()
+
+    def _scan(self):
+        """Read the entries appended past the local length"""
+        index = len(self._requests)
+        while True:
+            try:
+                request = self.service.get_pending_request_entry(index)
+            except ContractLogicError:
+                # Reading past the end of the array reverts
+                break
+            self._requests.append(request)
+            self._by_id[request['generatedId']] = index
+            index += 1
+
+    def _approve(self, args: Dict[str, Any]):
+        index = self._by_id.get(args['uniqueId'])
+        if index is None:
+            # Fall back to the oldest open request for the bank's name
+            index = next((i for i, request in enumerate(self._requests)
+                          if not request['approved'] and request['bankName'] == args['bankName']), None)
+        if index is None:
+            logger.warning(f"Approval of unknown bank request {args['uniqueId']}, reconciling on next refresh")
+            self._last_reconcile = 0.0
+            return
+        self._requests[index] = {**self._requests[index], 'approved': True}
+
+    def get_pending_requests(self) -> List[Dict[str, Any]]:
+        """Get all bank requests, approved ones flagged"""
+        with self._lock:
+            self.refresh()
+            return list(self._requests)
+
+    def export_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests': list(self._requests), 'lastBlock': self._last_block}
+
+    def restore_state(self, state: Dict[str, Any]):
+        with self._lock:
+            self._requests = state['requests']
+            self._by_id = {request['generatedId']: i for i, request in enumerate(self._requests)}
+            self._last_block = state['lastBlock']
+            # Catch up from events rather than rereading straight away
+            self._last_reconcile = time.monotonic()
+
+# Singleton instance
+pending_requests = PendingRequestTracker(blockchain_service, block_chain)
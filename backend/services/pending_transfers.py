@@ -0,0 +1,277 @@
+from typing import List, Dict, Any, Optional, Iterable
+from web3.exceptions import ContractLogicError
+import os
+import time
+import threading
+import logging
+
+from services.blockchain_service import blockchain_service, BlockchainService
+from services.reorg import block_chain, BlockHashChain
+from services.deadline import PartialResult, fan_out
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = float(os.environ.get('PENDING_RECONCILE_INTERVAL', '300'))
+
+class PendingTransferTracker:
+    """Event-maintained view of pending bank-to-bank transfers.
+
+    `PendingBankTransfer` events read the newly appended rows of the affected
+    banks through `pendingBankTransfers(bankId, index)`, while
+    `BankTransferApproved` and `BankTransferRejected` drop rows by transferId.
+    Approved rows stay in the contract's arrays, but rejected ones are
+    deleted, which shifts the indexes after them, so a rejection rereads
+    both banks' arrays whole. A periodic full read of every bank corrects
+    any drift, so reads are plain lookups into the local state. A reorg
+    reaching back past the last applied block forces a full read.
+
+    A bank that cannot be read keeps its last known rows and is read again
+    on the next refresh; until then it is reported stale, or missing if it
+    was never read, the way fan-out reads report it.
+
+    Rows are read from the chain outside the state lock, which is only held
+    to apply them, and refreshes serialize on their own lock. A per-bank
+    read that finds a refresh running serves the current rows instead of
+    waiting for it.
+    """
+
+    TRACKED_EVENTS = ['PendingBankTransfer', 'BankTransferApproved', 'BankTransferRejected']
+
+    def __init__(self, service: BlockchainService, chain: BlockHashChain,
+                 reconcile_interval: float = RECONCILE_INTERVAL):
+        self.service = service
+        self.chain = chain
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.RLock()
+        # Held for a whole refresh, so only one reads the chain at a time
+        self._refresh_lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._by_bank: Dict[str, Dict[str, None]] = {}
+        self._cursors: Dict[str, int] = {}
+        # Banks whose last read failed, with the error when known
+        self._failed: Dict[str, Optional[Exception]] = {}
+        self._last_block: Optional[int] = None
+        self._last_reconcile = 0.0
+        self._reorged = False
+        chain.on_reorg(self._on_reorg)
+
+    def _on_reorg(self, fork_block: int):
+        # Applied under our own lock on the next refresh
+        last_block = self._last_block
+        if last_block is not None and fork_block <= last_block:
+            self._reorged = True
+
+    def refresh(self):
+        """Apply contract events since the last refresh, reconciling when due"""
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh(self):
+        head = self.chain.advance()
+
+        if (self._last_block is None or self._reorged
+                or time.monotonic() - self._last_reconcile >= self.reconcile_interval):
+            self._reconcile(head)
+            return
+
+        if head > self._last_block:
+            events = self.service.get_events(self.TRACKED_EVENTS, self._last_block + 1, head)
+            self._apply_events(events)
+            self._last_block = head
+
+        self._read_banks(list(self._failed), [])
+
+    def apply_events(self, events: Iterable[Dict[str, Any]]):
+        """Update pending state from decoded contract events, in chain order"""
+        with self._refresh_lock:
+            self._apply_events(events)
+
+    def _apply_events(self, events: Iterable[Dict[str, Any]]):
+        with self._lock:
+            # Rows are read after the whole batch, as they stand at its end
+            appended, shifted = {}, {}
+            banks_of: Dict[str, tuple] = {}
+            for event in events:
+                args = event['args']
+                if event['event'] == 'PendingBankTransfer':
+                    banks_of[args['transferId']] = (args['fromBankId'], args['toBankId'])
+                    appended.update(dict.fromkeys(banks_of[args['transferId']]))
+                elif event['event'] in ('BankTransferApproved', 'BankTransferRejected'):
+                    transfer = self._pending.get(args['transferId'])
+                    if transfer is not None:
+                        banks_of[args['transferId']] = (transfer['fromBankId'], transfer['toBankId'])
+                    self._remove(args['transferId'])
+                    if event['event'] == 'BankTransferRejected':
+                        if args['transferId'] not in banks_of:
+                            logger.warning(f"Rejection of unknown transfer {args['transferId']}, reconciling on next refresh")
+                            self._last_reconcile = 0.0
+                            continue
+                        shifted.update(dict.fromkeys(banks_of[args['transferId']]))
+
+        self._read_banks(list(shifted), [bank_id for bank_id in appended if bank_id not in shifted])
+
+    def reconcile(self, head: Optional[int] = None):
+        """Reread every bank's pending rows and replace the local state, keeping
+        the last known rows of banks that could not be read"""
+        with self._refresh_lock:
+            self._reconcile(head)
+
+    def _reconcile(self, head: Optional[int]):
+        self._reorged = False
+        if head is None:
+            head = self.chain.advance()
+
+        with self._lock:
+            first_read = self._last_block is None
+            before = set(self._pending)
+            known = {bank_id: self._bank_rows(bank_id) for bank_id in self._cursors}
+        rows_by_bank, missing, stale = fan_out(self.service.get_bank_ids(), self.service.get_pending_transfers, known)
+
+        pending, by_bank, cursors = {}, {}, {}
+        for bank_id, rows in rows_by_bank.items():
+            # Known rows hold only the open ones, so a stale bank keeps its cursor
+            cursors[bank_id] = self._cursors[bank_id] if bank_id in stale else len(rows)
+            for transfer in rows:
+                if not transfer['approved']:
+                    pending[transfer['transferId']] = transfer
+                    by_bank.setdefault(bank_id, {})[transfer['transferId']] = None
+
+        with self._lock:
+            self._pending, self._by_bank, self._cursors = pending, by_bank, cursors
+            self._failed = dict.fromkeys(missing + stale)
+            self._last_block = head
+            self._last_reconcile = time.monotonic()
+
+        after = set(pending)
+        if not first_read and before != after:
+            logger.warning(
+                f"Pending transfer drift at block {head}: "
+                f"{len(after - before)} missing, {len(before - after)} stale"
+            )
+
+    def _read_banks(self, whole: Iterable[str], appended: Iterable[str]):
+        """Read the whole arrays of `whole` banks and the rows past the cursors of
+        `appended` ones, then apply them, keeping failed banks due for a retry"""
+        fetched = [(bank_id, True) + self._fetch_rows(bank_id, True) for bank_id in whole]
+        fetched += [(bank_id, False) + self._fetch_rows(bank_id, False) for bank_id in appended]
+
+        with self._lock:
+            for bank_id, is_whole, rows, error in fetched:
+                if not is_whole:
+                    self._append_rows(bank_id, rows)
+                elif error is None:
+                    self._replace_rows(bank_id, rows)
+                if error is None:
+                    self._failed.pop(bank_id, None)
+                else:
+                    logger.warning(f"Failed to read pending transfers for {bank_id}: {error}")
+                    self._failed[bank_id] = error
+
+    def _fetch_rows(self, bank_id: str, whole: bool):
+        """Read a bank's whole pending array, or its rows past the cursor, with
+        the error that stopped the read, if any"""
+        if whole:
+            try:
+                return self.service.get_pending_transfers(bank_id), None
+            except Exception as e:
+                return [], e
+
+        rows = []
+        index = self._cursors.get(bank_id, 0)
+        while True:
+            try:
+                rows.append(self.service.get_pending_transfer_entry(bank_id, index + len(rows)))
+            except ContractLogicError:
+                # Reading past the end of the array reverts
+                return rows, None
+            except Exception as e:
+                # Keep what was read before a failure rather than refetch it
+                return rows, e
+
+    def _bank_rows(self, bank_id: str) -> List[Dict[str, Any]]:
+        return [self._pending[transfer_id] for transfer_id in self._by_bank.get(bank_id, {})]
+
+    def _replace_rows(self, bank_id: str, rows: List[Dict[str, Any]]):
+        """Replace a bank's rows with a read of its whole array"""
+        current = {transfer['transferId']: transfer for transfer in rows if not transfer['approved']}
+        for transfer_id in list(self._by_bank.get(bank_id, {})):
+            if transfer_id not in current:
+                self._remove(transfer_id)
+        for transfer_id, transfer in current.items():
+            self._pending[transfer_id] = transfer
+            self._by_bank.setdefault(bank_id, {})[transfer_id] = None
+        self._cursors[bank_id] = len(rows)
+
+    def _append_rows(self, bank_id: str, rows: List[Dict[str, Any]]):
+        """Add rows read past a bank's cursor"""
+        for transfer in rows:
+            if not transfer['approved']:
+                transfer_id = transfer['transferId']
+                self._pending[transfer_id] = transfer
+                self._by_bank.setdefault(bank_id, {})[transfer_id] = None
+        self._cursors[bank_id] = self._cursors.get(bank_id, 0) + len(rows)
+
+    def _remove(self, transfer_id: str):
+        transfer = self._pending.pop(transfer_id, None)
+        if transfer is None:
+            return
+
+        for bank_id in (transfer['fromBankId'], transfer['toBankId']):
+            bank_transfers = self._by_bank.get(bank_id)
+            if bank_transfers is not None:
+                bank_transfers.pop(transfer_id, None)
+
+    def _completeness(self):
+        """Failed banks, split into never read and read before"""
+        missing = [bank_id for bank_id in self._failed if bank_id not in self._cursors]
+        stale = [bank_id for bank_id in self._failed if bank_id in self._cursors]
+        return missing, stale
+
+    def _refresh_unless_running(self):
+        if self._last_block is None:
+            # Nothing to serve yet, so wait for the first read
+            self.refresh()
+        elif self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            finally:
+                self._refresh_lock.release()
+
+    def get_pending_transfers(self, bank_id: str) -> PartialResult:
+        """Get pending transfers for a specific bank, stale if it could not be read"""
+        self._refresh_unless_running()
+        with self._lock:
+            if bank_id not in self._failed:
+                return PartialResult(self._bank_rows(bank_id))
+            if bank_id not in self._cursors:
+                # Nothing to serve in place of the failed read
+                raise self._failed[bank_id] or RuntimeError(f"Pending transfers for {bank_id} could not be read")
+            return PartialResult(self._bank_rows(bank_id), stale=[bank_id])
+
+    def get_all_pending_transfers(self) -> PartialResult:
+        """Get all pending transfers across all banks"""
+        self.refresh()
+        with self._lock:
+            missing, stale = self._completeness()
+            return PartialResult(self._pending.values(), missing, stale)
+
+    def export_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pending': dict(self._pending),
+                'byBank': {bank_id: list(ids) for bank_id, ids in self._by_bank.items()},
+                'cursors': dict(self._cursors),
+                'lastBlock': self._last_block
+            }
+
+    def restore_state(self, state: Dict[str, Any]):
+        with self._lock:
+            self._pending = state['pending']
+            self._by_bank = {bank_id: dict.fromkeys(ids) for bank_id, ids in state['byBank'].items()}
+            self._cursors = state['cursors']
+            self._last_block = state['lastBlock']
+            # Catch up from events rather than rescanning straight away
+            self._last_reconcile = time.monotonic()
+
+# Singleton instance
+pending_transfers = PendingTransferTracker(blockchain_service, block_chain)
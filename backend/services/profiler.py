@@ -0,0 +1,186 @@
+from typing import Any, Dict, List, Optional
+from collections import Counter, OrderedDict
+from pathlib import Path
+import os
+import sys
+import time
+import uuid
+import threading
+import tracemalloc
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.005'))
+MAX_SECONDS = 60.0
+MAX_KEPT = 20
+TOP_ALLOCATIONS = 25
+
+# Leaf frames of threads parked with nothing to do
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+class Profile:
+    """Collapsed stacks and optional allocation summary from one profiling run"""
+
+    def __init__(self, profile_id: str, interval: float):
+        self.id = profile_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.allocations: Optional[List[Dict[str, Any]]] = None
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, one `a;b;c count` line per stack"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Sampled profile in speedscope's file format"""
+        frames: List[Dict[str, str]] = []
+        frame_index: Dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            indexes = []
+            for name in stack.split(';'):
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    frames.append({'name': name})
+                indexes.append(frame_index[name])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': f'profile {self.id}',
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.duration,
+                'samples': samples,
+                'weights': weights
+            }],
+            'name': f'profile {self.id}',
+            'exporter': 'bank-manager-api'
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'startedAt': self.started_at,
+            'duration': round(self.duration, 3),
+            'samples': self.samples,
+            'interval': self.interval,
+            'allocations': self.allocations
+        }
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over every thread of this worker.
+
+    While active, a daemon thread reads `sys._current_frames()` every
+    `interval` seconds and counts each thread's stack, so the event loop,
+    RPC waits in worker threads and serialization all show up as they
+    happen. Nothing is installed when inactive, so there is no cost outside
+    a profiling run. Only one run is active at a time.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._profile: Optional[Profile] = None
+        self._memory = False
+        self._started_tracemalloc = False
+        self._results: 'OrderedDict[str, Profile]' = OrderedDict()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = Path(code.co_filename)
+            label = f'{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})'
+            self._labels[code] = label
+        return label
+
+    def _sample(self, profile: Profile, include_idle: bool):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if not include_idle and (Path(code.co_filename).name, code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f'thread-{ident}'))
+            profile.stacks[';'.join(reversed(stack))] += 1
+        profile.samples += 1
+
+    def _run(self, profile: Profile, include_idle: bool):
+        while not self._stop.wait(self.interval):
+            self._sample(profile, include_idle)
+
+    def start(self, memory: bool = False, include_idle: bool = False) -> Profile:
+        """Begin sampling in the background"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        profile = Profile(str(uuid.uuid4()), self.interval)
+        self._profile = profile
+        self._memory = memory
+        self._started_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(profile, include_idle), name='profiler', daemon=True)
+        self._thread.start()
+        return profile
+
+    def stop(self) -> Profile:
+        """Stop sampling and keep the finished profile for later retrieval"""
+        profile = self._profile
+        try:
+            self._stop.set()
+            self._thread.join()
+            profile.duration = time.time() - profile.started_at
+            if self._memory and tracemalloc.is_tracing():
+                stats = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+                profile.allocations = [
+                    {'location': str(stat.traceback[0]), 'size': stat.size, 'count': stat.count}
+                    for stat in stats
+                ]
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            self._thread = None
+            self._profile = None
+            self._lock.release()
+
+        self._results[profile.id] = profile
+        while len(self._results) > MAX_KEPT:
+            self._results.popitem(last=False)
+        return profile
+
+    def run(self, seconds: float, memory: bool = False, include_idle: bool = False) -> Profile:
+        """Profile the whole worker for `seconds`, blocking the calling thread"""
+        self.start(memory, include_idle)
+        time.sleep(min(max(seconds, self.interval), MAX_SECONDS))
+        return self.stop()
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._results.get(profile_id)
+
+# Singleton instance
+profiler = SamplingProfiler()
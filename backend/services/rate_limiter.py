@@ -0,0 +1,201 @@
+from typing import Any, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from web3 import Web3
+import requests
+import os
+import heapq
+import itertools
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lowest value served first
+INTERACTIVE = 0
+BACKGROUND = 1
+BACKFILL = 2
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background', BACKFILL: 'backfill'}
+
+RATE_LIMIT = float(os.environ.get('RPC_RATE_LIMIT', '10'))
+BURST = float(os.environ.get('RPC_BURST', '20'))
+DAILY_CREDITS = int(os.environ.get('RPC_DAILY_CREDITS', '3000000'))
+# Share of the daily budget that only interactive reads may spend
+BACKGROUND_RESERVE = float(os.environ.get('RPC_BACKGROUND_RESERVE', '0.1'))
+MAX_THROTTLE_RETRIES = 3
+
+# Approximate Infura credit cost per JSON-RPC method
+CREDIT_COSTS = {
+    'eth_chainId': 5,
+    'net_version': 5,
+    'eth_blockNumber': 80,
+    'eth_call': 80,
+    'eth_getBlockByNumber': 80,
+    'eth_getTransactionReceipt': 80,
+    'eth_getTransactionCount': 80,
+    'eth_gasPrice': 80,
+    'eth_feeHistory': 80,
+    'eth_getLogs': 255,
+    'eth_estimateGas': 300,
+    'eth_sendRawTransaction': 720,
+}
+DEFAULT_CREDIT_COST = 80
+
+rpc_priority: ContextVar[int] = ContextVar('rpc_priority', default=INTERACTIVE)
+
+@contextmanager
+def priority(level: int):
+    """Run upstream calls made in this context at the given priority"""
+    token = rpc_priority.set(level)
+    try:
+        yield
+    finally:
+        rpc_priority.reset(token)
+
+class RpcBudgetExhausted(Exception):
+    """Raised when low-priority work would eat into the interactive reserve"""
+
+class RpcRateLimiter:
+    """Token bucket shared by every upstream call, served in priority order.
+
+    Waiting callers queue by (priority, arrival), so interactive reads jump
+    ahead of background refreshes and backfills. A `Retry-After` from the
+    provider pauses the whole bucket. Credits are counted per UTC day and
+    background work stops before it reaches the interactive reserve.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT, burst: float = BURST,
+                 daily_credits: int = DAILY_CREDITS, background_reserve: float = BACKGROUND_RESERVE):
+        self.rate = rate
+        self.burst = burst
+        self.daily_credits = daily_credits
+        self.background_reserve = background_reserve
+        self._cond = threading.Condition()
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._day = datetime.utcnow().date()
+        self._credits_used = 0
+        self._calls: Dict[int, int] = {level: 0 for level in PRIORITY_NAMES}
+        self._wait_seconds: Dict[int, float] = {level: 0.0 for level in PRIORITY_NAMES}
+        self._throttled = 0
+        self._rejected = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _reset_daily(self):
+        today = datetime.utcnow().date()
+        if today != self._day:
+            self._day = today
+            self._credits_used = 0
+
+    def remaining_credits(self) -> int:
+        with self._cond:
+            self._reset_daily()
+            return self.daily_credits - self._credits_used
+
+    def acquire(self, cost: int, level: int = INTERACTIVE):
+        """Block until a token is available for a call costing `cost` credits"""
+        started = time.monotonic()
+        with self._cond:
+            self._reset_daily()
+            remaining = self.daily_credits - self._credits_used
+            if level != INTERACTIVE and remaining - cost < self.daily_credits * self.background_reserve:
+                self._rejected += 1
+                raise RpcBudgetExhausted(f"{remaining} RPC credits left, reserved for interactive reads")
+
+            ticket = (level, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self._paused_until:
+                        timeout = self._paused_until - now
+                    elif self._waiters[0] != ticket:
+                        # Woken when the head of the queue takes its token
+                        timeout = None
+                    elif self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    else:
+                        timeout = (1 - self._tokens) / self.rate
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+            self._credits_used += cost
+            self._calls[level] += 1
+            self._wait_seconds[level] += time.monotonic() - started
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds`, e.g. after a 429"""
+        with self._cond:
+            self._throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._reset_daily()
+            self._refill(time.monotonic())
+            return {
+                'ratePerSecond': self.rate,
+                'tokensAvailable': round(self._tokens, 2),
+                'queued': len(self._waiters),
+                'pausedForSeconds': round(max(self._paused_until - time.monotonic(), 0.0), 2),
+                'dailyCredits': self.daily_credits,
+                'creditsUsed': self._credits_used,
+                'creditsRemaining': self.daily_credits - self._credits_used,
+                'throttledResponses': self._throttled,
+                'rejectedCalls': self._rejected,
+                'calls': {PRIORITY_NAMES[level]: count for level, count in self._calls.items()},
+                'waitSeconds': {PRIORITY_NAMES[level]: round(s, 3) for level, s in self._wait_seconds.items()},
+            }
+
+def retry_after_seconds(response: Optional[requests.Response], default: float = 1.0) -> float:
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+class RateLimitedHTTPProvider(Web3.HTTPProvider):
+    """HTTP provider that passes every request through an RpcRateLimiter"""
+
+    def __init__(self, endpoint_uri: str, limiter: RpcRateLimiter, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.limiter = limiter
+
+    def make_request(self, method, params):
+        cost = CREDIT_COSTS.get(method, DEFAULT_CREDIT_COST)
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            self.limiter.acquire(cost, rpc_priority.get())
+            try:
+                return super().make_request(method, params)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 429 or attempt == MAX_THROTTLE_RETRIES:
+                    raise
+                delay = retry_after_seconds(e.response)
+                logger.warning(f"RPC provider throttled {method}, pausing for {delay:.1f}s")
+                self.limiter.pause(delay)
+
+# Singleton instance
+rpc_limiter = RpcRateLimiter()
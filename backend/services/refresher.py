@@ -0,0 +1,243 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import math
+import time
+import random
+import asyncio
+import logging
+
+from services.rate_limiter import priority, INTERACTIVE, BACKGROUND
+from services.deadline import PartialResult, request_deadline, deadline, FANOUT_DEADLINE
+from services.block_pin import block_pin
+
+logger = logging.getLogger(__name__)
+
+# Fraction of the refresh period used as +/- jitter
+JITTER = float(os.environ.get('REFRESH_JITTER', '0.2'))
+# Datasets nobody asked for recently refresh this many times less often
+IDLE_BACKOFF = float(os.environ.get('REFRESH_IDLE_BACKOFF', '4'))
+# Half-life, in seconds, of the request popularity counter
+POPULARITY_HALF_LIFE = 60.0
+
+class Dataset:
+    """A refreshable dataset and its last good snapshot"""
+
+    def __init__(self, name: str, loader: Callable[[], Any], interval: float, max_stale: float, min_interval: float):
+        self.name = name
+        self.loader = loader
+        self.interval = interval
+        self.max_stale = max_stale
+        self.min_interval = min_interval
+        self.value: Any = None
+        self.fetched_at: Optional[float] = None
+        # Keys a partial load could not fetch, or served from older reads
+        self.missing: List[str] = []
+        self.stale: List[str] = []
+        self.block: Optional[int] = None
+        self.next_refresh = 0.0
+        # Set when the data changed while a load was already running
+        self.reload = False
+        self.inflight: Optional[asyncio.Task] = None
+        self._popularity = 0.0
+        self._popularity_at = time.monotonic()
+
+    def age(self) -> Optional[float]:
+        if self.fetched_at is None:
+            return None
+        # Wall-clock so ages stay comparable across workers sharing snapshots
+        return max(time.time() - self.fetched_at, 0.0)
+
+    def record_hit(self):
+        now = time.monotonic()
+        self._popularity = self._decayed_popularity(now) + 1.0
+        self._popularity_at = now
+
+    def _decayed_popularity(self, now: float) -> float:
+        elapsed = now - self._popularity_at
+        return self._popularity * 0.5 ** (elapsed / POPULARITY_HALF_LIFE)
+
+    def period(self) -> float:
+        """Refresh period scaled by recent request popularity, with jitter"""
+        # Roughly requests per minute over the last few half-lives
+        rate = self._decayed_popularity(time.monotonic()) * 60.0 / (POPULARITY_HALF_LIFE / math.log(2))
+        if rate < 0.1:
+            period = self.interval * IDLE_BACKOFF
+        else:
+            period = max(self.interval / (1.0 + math.log1p(rate)), self.min_interval)
+        return period * random.uniform(1.0 - JITTER, 1.0 + JITTER)
+
+class SnapshotRefresher:
+    """Stale-while-revalidate cache for the hot read endpoints.
+
+    Handlers get the last good snapshot immediately along with its age. A
+    snapshot older than its interval triggers a refresh in the background,
+    and one older than `max_stale` makes the caller wait for fresh data. A
+    scheduler task refreshes every dataset ahead of time, at a jittered
+    cadence that speeds up for popular datasets and backs off for idle ones.
+    Intervals can be overridden per dataset with REFRESH_<NAME>_INTERVAL and
+    REFRESH_<NAME>_MAX_STALE.
+
+    With a shared store attached, only the elected leader runs the loaders
+    and publishes snapshots; other workers read the leader's snapshots and
+    only load directly when the shared copy is missing or past its limit.
+    """
+
+    def __init__(self):
+        self.datasets: Dict[str, Dataset] = {}
+        self.store = None
+        self.leader = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def share(self, store, leader):
+        """Share snapshots across workers through `store`, loading only on `leader`"""
+        self.store = store
+        self.leader = leader
+
+    def register(self, name: str, loader: Callable[[], Any], interval: float = 15.0,
+                 max_stale: float = 300.0, min_interval: float = 2.0):
+        """Register a dataset served from snapshots"""
+        prefix = f"REFRESH_{name.upper()}"
+        interval = float(os.environ.get(f"{prefix}_INTERVAL", interval))
+        max_stale = float(os.environ.get(f"{prefix}_MAX_STALE", max_stale))
+        self.datasets[name] = Dataset(name, loader, interval, max_stale, min_interval)
+
+    def export_state(self) -> Dict[str, Any]:
+        return {
+            name: {'value': dataset.value, 'fetchedAt': dataset.fetched_at}
+            for name, dataset in self.datasets.items() if dataset.fetched_at is not None
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """Restore snapshots with their original fetch times, so ages stay honest"""
+        for name, snapshot in state.items():
+            dataset = self.datasets.get(name)
+            if dataset is not None and dataset.fetched_at is None:
+                dataset.value = snapshot['value']
+                dataset.fetched_at = snapshot['fetchedAt']
+
+    async def get(self, name: str) -> Tuple[Any, float]:
+        """Return a dataset's snapshot and its age in seconds"""
+        dataset = self.datasets[name]
+        dataset.record_hit()
+        age = dataset.age()
+
+        if age is None:
+            await self._refresh(dataset)
+        elif age > dataset.max_stale:
+            try:
+                await self._refresh(dataset)
+            except Exception as e:
+                logger.warning(f"Serving {name} snapshot {age:.1f}s past its staleness limit: {e}")
+        elif age > dataset.interval:
+            self._schedule_refresh(dataset, BACKGROUND)
+
+        return dataset.value, dataset.age()
+
+    def invalidate(self, name: str):
+        """Refresh a dataset as soon as possible, e.g. after an event that changed it"""
+        dataset = self.datasets.get(name)
+        if dataset is None:
+            return
+        if dataset.inflight is not None:
+            # The running load may have read the state before the change
+            dataset.reload = True
+        dataset.next_refresh = 0.0
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def completeness(self, name: str) -> Tuple[List[str], List[str]]:
+        """Keys missing from, and stale in, a dataset's last load"""
+        dataset = self.datasets[name]
+        return dataset.missing, dataset.stale
+
+    def _schedule_refresh(self, dataset: Dataset, level: int):
+        if dataset.inflight is None:
+            dataset.inflight = asyncio.create_task(self._run_loader(dataset, level))
+            dataset.inflight.add_done_callback(self._log_failure)
+
+    async def _refresh(self, dataset: Dataset):
+        # Someone is waiting on this one, so it goes out as an interactive read
+        self._schedule_refresh(dataset, INTERACTIVE)
+        # Shield so a cancelled request does not cancel a refresh others share
+        await asyncio.shield(dataset.inflight)
+
+    async def _run_loader(self, dataset: Dataset, level: int):
+        try:
+            if self.store is not None and not self.leader.is_leader:
+                shared = await self.store.get(dataset.name)
+                if shared is not None and time.time() - shared[1] <= dataset.max_stale:
+                    dataset.value, dataset.fetched_at, partial = shared
+                    dataset.missing = partial.get('missing', [])
+                    dataset.stale = partial.get('stale', [])
+                    dataset.block = partial.get('block')
+                    return
+
+            value = await asyncio.to_thread(self._load, dataset, level)
+            if isinstance(value, PartialResult):
+                dataset.missing, dataset.stale, dataset.block = value.missing, value.stale, value.block
+                value = list(value)
+            else:
+                dataset.missing, dataset.stale, dataset.block = [], [], None
+            dataset.value = value
+            dataset.fetched_at = time.time()
+            if self.store is not None:
+                await self.store.set(dataset.name, value, dataset.fetched_at, {
+                    'missing': dataset.missing, 'stale': dataset.stale, 'block': dataset.block
+                })
+        finally:
+            dataset.inflight = None
+            dataset.next_refresh = 0.0 if dataset.reload else time.monotonic() + dataset.period()
+            dataset.reload = False
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _load(self, dataset: Dataset, level: int):
+        # Only a caller waiting on this load lends it their deadline and block;
+        # background loads get the fan-out budget, so one stuck read cannot
+        # hold the dataset and whatever is unread is reported missing
+        if level != INTERACTIVE:
+            request_deadline.set(None)
+            block_pin.set(None)
+        with priority(level), deadline(FANOUT_DEADLINE):
+            return dataset.loader()
+
+    def _log_failure(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background refresh failed: {task.exception()}")
+
+    async def _scheduler(self):
+        while True:
+            now = time.monotonic()
+            for dataset in self.datasets.values():
+                if dataset.next_refresh <= now:
+                    self._schedule_refresh(dataset, BACKGROUND)
+                    # Pushed forward again once the refresh finishes
+                    dataset.next_refresh = float('inf')
+
+            next_due = min((d.next_refresh for d in self.datasets.values()), default=float('inf'))
+            timeout = None if next_due == float('inf') else max(next_due - time.monotonic(), 0.0)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the background scheduler on the running event loop"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._scheduler())
+
+    async def stop(self):
+        """Stop the scheduler and any refresh in flight"""
+        tasks = [d.inflight for d in self.datasets.values() if d.inflight is not None]
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+# Singleton instance
+refresher = SnapshotRefresher()
@@ -0,0 +1,156 @@
+from typing import Any, Callable, Dict, List, Optional
+import os
+import time
+import threading
+import logging
+
+from services.blockchain_service import blockchain_service, BlockchainService
+
+logger = logging.getLogger(__name__)
+
+# Blocks this far below the head are treated as immutable
+CONFIRMATION_DEPTH = int(os.environ.get('CONFIRMATION_DEPTH', '12'))
+# Use the `finalized` tag instead of the confirmation depth
+USE_FINALIZED_TAG = os.environ.get('USE_FINALIZED_TAG', '0') == '1'
+FINALIZED_REFRESH_SECONDS = 30.0
+
+class BlockHashChain:
+    """Recent block hashes, used to detect reorgs and the immutable boundary.
+
+    Each new head is linked to the stored hash of its parent. On a mismatch
+    the chain is walked back until it links again, and every listener is
+    told the first block number that is no longer canonical. Everything at
+    or below `safe_block` is final and may be cached indefinitely; anything
+    above it is provisional.
+
+    Listeners are called outside the lock and should only record the fork
+    point, applying the rollback on their next sync under their own lock.
+    """
+
+    def __init__(self, service: BlockchainService, depth: int = CONFIRMATION_DEPTH,
+                 use_finalized: bool = USE_FINALIZED_TAG):
+        self.service = service
+        self.depth = depth
+        self.use_finalized = use_finalized
+        # Keep enough history to link any reorg shallower than the safe boundary
+        self.history = max(depth * 4, 64)
+        self.head: Optional[int] = None
+        self.finalized: Optional[int] = None
+        self._hashes: Dict[int, str] = {}
+        self._checked_at = 0.0
+        self._finalized_at = 0.0
+        self._followed_until = 0.0
+        self._listeners: List[Callable[[int], Any]] = []
+        self._lock = threading.Lock()
+
+    def on_reorg(self, listener: Callable[[int], Any]):
+        """Call `listener(fork_block)` whenever blocks from `fork_block` up are replaced"""
+        self._listeners.append(listener)
+
+    @property
+    def safe_block(self) -> int:
+        """Highest block number treated as immutable"""
+        if self.head is None:
+            return -1
+        if self.use_finalized and self.finalized is not None:
+            return self.finalized
+        return self.head - self.depth
+
+    def is_final(self, block_number: int) -> bool:
+        return block_number <= self.safe_block
+
+    def block_hash(self, block_number: int) -> Optional[str]:
+        return self._hashes.get(block_number)
+
+    def follow(self, seconds: float):
+        """Trust the current head for `seconds`, while a block watcher keeps it current"""
+        self._followed_until = time.monotonic() + seconds
+
+    def advance(self, max_age: float = 1.0) -> int:
+        """Link the latest head, at most once per `max_age` seconds, and return its number
+
+        While followed, the head is only re-read when `max_age` is zero.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.head is not None and max_age > 0 and (
+                    now - self._checked_at < max_age or now < self._followed_until):
+                return self.head
+
+            fork = self.observe(self.service.get_block_header('latest'))
+            self._checked_at = time.monotonic()
+
+            if self.use_finalized and time.monotonic() - self._finalized_at >= FINALIZED_REFRESH_SECONDS:
+                try:
+                    self.finalized = self.service.get_block_header('finalized')['number']
+                    self._finalized_at = time.monotonic()
+                except Exception as e:
+                    logger.warning(f"Finalized tag unavailable, using confirmation depth: {e}")
+                    self.use_finalized = False
+            head = self.head
+
+        if fork is not None:
+            logger.warning("Chain reorg detected")
+            self.notify_reorg(fork)
+        return head
+
+    def observe(self, header: Dict[str, Any]) -> Optional[int]:
+        """Record a new head header, returning the fork block if it caused a reorg"""
+        number = header['number']
+        fork = None
+        latest_known = max(self._hashes) if self._hashes else None
+
+        if latest_known is not None and number < latest_known:
+            if self._hashes.get(number) == header['hash']:
+                # A lagging endpoint's older head, still on the chain we know
+                return None
+            # The head went backwards, so everything above it is gone
+            fork = number + 1
+        if self._hashes.get(number) not in (None, header['hash']):
+            fork = number
+
+        new_hashes = {number: header['hash']}
+        current = header
+        while current['number'] - 1 >= max(number - self.history, 0):
+            parent_number = current['number'] - 1
+            known = self._hashes.get(parent_number)
+            if known == current['parentHash']:
+                break
+            if known is None and latest_known is not None and parent_number > latest_known:
+                # Fill a gap between polls so the new head links to what we know
+                current = self.service.get_block_header(parent_number)
+            elif known is None:
+                break
+            else:
+                fork = parent_number
+                current = self.service.get_block_header(parent_number)
+            new_hashes[current['number']] = current['hash']
+
+        for stale in [n for n in self._hashes if n > number or n < number - self.history]:
+            del self._hashes[stale]
+        self._hashes.update(new_hashes)
+        self.head = number
+        return fork
+
+    def export_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'head': self.head, 'safeBlock': self.safe_block, 'hashes': dict(self._hashes)}
+
+    def restore_state(self, state: Dict[str, Any]):
+        """Restore recent hashes so the first new head links to them"""
+        with self._lock:
+            self._hashes = state['hashes']
+            self.head = state['head']
+            self._checked_at = 0.0
+
+    def notify_reorg(self, fork_block: int):
+        """Tell listeners blocks from `fork_block` up can no longer be trusted"""
+        logger.warning(f"Blocks from {fork_block} invalidated")
+        for listener in self._listeners:
+            try:
+                listener(fork_block)
+            except Exception as e:
+                logger.error(f"Reorg listener failed: {e}")
+
+# Singleton instance
+block_chain = BlockHashChain(blockchain_service)
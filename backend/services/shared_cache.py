@@ -0,0 +1,99 @@
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+import os
+import json
+import socket
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = float(os.environ.get('LEADER_LEASE_SECONDS', '15'))
+
+def worker_id() -> str:
+    """Identify this worker process across hosts"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class MongoSharedCache:
+    """Snapshot store shared by every worker through MongoDB.
+
+    Values are stored as JSON text because uint256 amounts routinely
+    overflow BSON's 64-bit integers.
+    """
+
+    def __init__(self, db, collection: str = 'shared_cache'):
+        self.collection = db[collection]
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float, Dict[str, Any]]]:
+        """Return a cached value, the epoch time it was fetched at and the
+        keys its load reported missing or stale"""
+        doc = await self.collection.find_one({'_id': key})
+        if doc is None:
+            return None
+        return json.loads(doc['value']), doc['fetched_at'], doc.get('partial', {})
+
+    async def set(self, key: str, value: Any, fetched_at: float, partial: Optional[Dict[str, Any]] = None):
+        await self.collection.update_one(
+            {'_id': key},
+            {'$set': {'value': json.dumps(value), 'fetched_at': fetched_at, 'partial': partial or {}}},
+            upsert=True
+        )
+
+class LeaderElection:
+    """Lease-based leader election over a MongoDB document.
+
+    The holder renews its lease every third of the lease period; any worker
+    may take over once a lease has expired, so exactly one live worker runs
+    the upstream refreshes and indexers while the others read their output.
+    """
+
+    def __init__(self, db, name: str, lease_seconds: float = LEASE_SECONDS, collection: str = 'leases'):
+        self.collection = db[collection]
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.holder = worker_id()
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def try_acquire(self) -> bool:
+        """Acquire or renew the lease, returning whether we hold it"""
+        now = datetime.utcnow()
+        try:
+            await self.collection.find_one_and_update(
+                {'_id': self.name, '$or': [{'holder': self.holder}, {'expires_at': {'$lt': now}}]},
+                {'$set': {'holder': self.holder, 'expires_at': now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            acquired = True
+        except DuplicateKeyError:
+            # Someone else holds an unexpired lease
+            acquired = False
+
+        if acquired != self.is_leader:
+            logger.info(f"Worker {self.holder} {'acquired' if acquired else 'lost'} leadership of {self.name}")
+        self.is_leader = acquired
+        return acquired
+
+    async def _run(self):
+        while True:
+            try:
+                await self.try_acquire()
+            except Exception as e:
+                logger.warning(f"Leader election for {self.name} failed: {e}")
+                self.is_leader = False
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop renewing and hand the lease over immediately"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            self.is_leader = False
+            await self.collection.delete_one({'_id': self.name, 'holder': self.holder})
@@ -0,0 +1,146 @@
+from typing import Any, Callable, Dict, Optional
+from pathlib import Path
+import os
+import asyncio
+import mmap
+import struct
+import marshal
+import zlib
+import logging
+
+from services.reorg import BlockHashChain
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = Path(os.environ.get('STATE_SNAPSHOT_PATH', Path(__file__).parent.parent / 'state.snapshot'))
+SNAPSHOT_INTERVAL = float(os.environ.get('STATE_SNAPSHOT_INTERVAL', '300'))
+
+MAGIC = b'BKSNAP01'
+FORMAT_VERSION = 1
+# magic, format version, marshal version, section count, head block, safe block, head hash, contract
+HEADER = struct.Struct('<8sIIIqq32s20s')
+# name, offset, length, crc32
+SECTION = struct.Struct('<16sQQI')
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is unreadable or belongs to another contract"""
+
+class StateSnapshot:
+    """Warm-restart snapshot of the in-memory caches and indexes.
+
+    The file is a fixed header with the block checkpoint, a section table and
+    one marshal-encoded payload per component, so a loader can memory-map it
+    and decode only the sections it needs. On load the checkpoint hash is
+    checked against the chain; if the block was reorged away while we were
+    down, everything above the saved safe block is rolled back, leaving only
+    the delta to fetch.
+    """
+
+    def __init__(self, chain: BlockHashChain, contract_address: str,
+                 components: Dict[str, Any], path: Path = SNAPSHOT_PATH):
+        self.chain = chain
+        self.contract = bytes.fromhex(contract_address[2:])
+        self.components = components
+        self.path = Path(path)
+
+    def save(self):
+        """Write every component's state atomically"""
+        chain_state = self.chain.export_state()
+        head = chain_state['head']
+        if head is None:
+            return
+        head_hash = chain_state['hashes'].get(head, '')
+
+        payloads = {'chain': marshal.dumps(chain_state)}
+        for name, component in self.components.items():
+            payloads[name] = marshal.dumps(component.export_state())
+
+        table_size = SECTION.size * len(payloads)
+        offset = HEADER.size + table_size
+        table = []
+        for name, payload in payloads.items():
+            table.append(SECTION.pack(name.encode(), offset, len(payload), zlib.crc32(payload)))
+            offset += len(payload)
+
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, marshal.version, len(payloads), head,
+            chain_state['safeBlock'], bytes.fromhex(head_hash.removeprefix('0x')), self.contract
+        )
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.writelines(table)
+            f.writelines(payloads.values())
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved state snapshot at block {head} ({offset} bytes)")
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, marshal_version, count, head, safe_block, head_hash, contract = HEADER.unpack_from(mm)
+            if magic != MAGIC or version != FORMAT_VERSION or marshal_version != marshal.version:
+                raise SnapshotError("Snapshot written by an incompatible version")
+            if contract != self.contract:
+                raise SnapshotError("Snapshot belongs to a different contract")
+
+            view = memoryview(mm)
+            try:
+                sections = {}
+                for i in range(count):
+                    name, offset, length, crc = SECTION.unpack_from(mm, HEADER.size + i * SECTION.size)
+                    name = name.rstrip(b'\0').decode()
+                    if name != 'chain' and name not in self.components:
+                        continue
+                    payload = view[offset:offset + length]
+                    try:
+                        if zlib.crc32(payload) != crc:
+                            raise SnapshotError(f"Corrupt snapshot section {name}")
+                        sections[name] = marshal.loads(payload)
+                    finally:
+                        # The map cannot close while a slice of it is still exported
+                        payload.release()
+            finally:
+                view.release()
+
+            return {'head': head, 'safeBlock': safe_block, 'headHash': head_hash.hex(), 'sections': sections}
+
+    def load(self) -> bool:
+        """Restore component state if a valid snapshot exists"""
+        if not self.path.exists():
+            return False
+        try:
+            snapshot = self._read()
+        except (OSError, ValueError, EOFError, struct.error, SnapshotError) as e:
+            logger.warning(f"Ignoring state snapshot: {e}")
+            return False
+
+        sections = snapshot['sections']
+        self.chain.restore_state(sections.pop('chain'))
+        for name, state in sections.items():
+            component = self.components.get(name)
+            if component is not None:
+                component.restore_state(state)
+
+        # Anything above the saved safe block may have been reorged while we were down
+        try:
+            current = self.chain.service.get_block_header(snapshot['head'])
+            still_canonical = current['hash'].removeprefix('0x') == snapshot['headHash']
+        except Exception as e:
+            logger.warning(f"Could not validate snapshot checkpoint: {e}")
+            still_canonical = False
+        if not still_canonical:
+            self.chain.notify_reorg(snapshot['safeBlock'] + 1)
+
+        logger.info(f"Restored state snapshot from block {snapshot['head']}")
+        return True
+
+    async def run_periodically(self, interval: float = SNAPSHOT_INTERVAL,
+                               enabled: Callable[[], bool] = lambda: True):
+        """Save every `interval` seconds while `enabled()` holds"""
+        while True:
+            await asyncio.sleep(interval)
+            if not enabled():
+                continue
+            try:
+                await asyncio.to_thread(self.save)
+            except Exception as e:
+                logger.warning(f"Failed to save state snapshot: {e}")
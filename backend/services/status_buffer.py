@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import ASCENDING, DESCENDING
+from pymongo.write_concern import WriteConcern
+from pymongo.errors import BulkWriteError, OperationFailure
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = int(os.environ.get('STATUS_FLUSH_SIZE', '500'))
+FLUSH_INTERVAL = float(os.environ.get('STATUS_FLUSH_INTERVAL', '1'))
+# 'buffered' returns before the write, 'acknowledged' waits for the batch
+# insert, 'journaled' also waits for it to reach the journal
+DURABILITY = os.environ.get('STATUS_DURABILITY', 'acknowledged')
+RETENTION = int(os.environ.get('STATUS_RETENTION', str(30 * 86400)))
+# Buffered documents kept across failed flushes before the oldest are dropped
+MAX_PENDING = 50000
+DUPLICATE_KEY = 11000
+
+DURABILITY_MODES = ('buffered', 'acknowledged', 'journaled')
+
+class StatusWriteBuffer:
+    """Write-behind buffer for status-check documents.
+
+    Documents are queued in memory and written with one unordered
+    `insert_many`. In 'buffered' mode callers return immediately, and a
+    batch goes out when `flush_size` are waiting or every `flush_interval`
+    seconds; documents that failed are retried on the next flush. In the
+    other modes callers wait for their write and see its error, and a write
+    starts as soon as one is waiting. Callers arriving while it is in
+    flight share the next one, so a busy worker still writes in batches
+    without an idle one holding callers for the interval.
+
+    Indexes are created by the background task, retried until MongoDB is
+    reachable, so the server starts without it.
+    """
+
+    def __init__(self, collection, flush_size: int = FLUSH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, durability: str = DURABILITY):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode {durability}")
+        if durability == 'journaled':
+            collection = collection.with_options(write_concern=WriteConcern(w=1, j=True))
+        self.collection = collection
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self._pending: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_scheduled = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        # The TTL index on timestamp also serves newest-first reads
+        await self.collection.create_index('timestamp', expireAfterSeconds=RETENTION)
+        await self.collection.create_index([('client_name', ASCENDING), ('timestamp', DESCENDING)])
+
+    async def add(self, docs: List[Dict[str, Any]]):
+        """Queue documents, waiting for their write unless buffered"""
+        if not docs:
+            return
+        future = None
+        if self.durability != 'buffered':
+            future = asyncio.get_running_loop().create_future()
+        self._pending.extend((doc, future) for doc in docs)
+
+        if future is not None or len(self._pending) >= self.flush_size:
+            self._schedule_flush()
+        if future is not None:
+            await future
+
+    def _schedule_flush(self):
+        # Documents added once a write has taken its batch wait for the next one
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Write everything queued so far, returning how many were stored"""
+        async with self._flush_lock:
+            self._flush_scheduled = False
+            batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            error = None
+            failed = set()
+            try:
+                await self.collection.insert_many([doc for doc, _ in batch], ordered=False)
+            except BulkWriteError as e:
+                # Unordered, so all but the listed documents were written; a
+                # duplicate key is a document an earlier attempt already stored
+                error = e
+                failed = {
+                    write_error['index'] for write_error in e.details.get('writeErrors', [])
+                    if write_error.get('code') != DUPLICATE_KEY
+                }
+            except Exception as e:
+                error = e
+                failed = set(range(len(batch)))
+            if failed:
+                logger.warning(f"Failed to write {len(failed)} of {len(batch)} status checks: {error}")
+
+            retry = []
+            for i in sorted(failed):
+                doc, future = batch[i]
+                if future is None:
+                    retry.append((doc, future))
+                elif not future.done():
+                    # Waiting callers get the error instead of a retry
+                    future.set_exception(error)
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+            self._pending[:0] = retry
+            if len(self._pending) > MAX_PENDING:
+                dropped = len(self._pending) - MAX_PENDING
+                del self._pending[:dropped]
+                logger.error(f"Dropped {dropped} buffered status checks")
+            return len(batch) - len(failed)
+
+    async def _ensure_indexes(self) -> bool:
+        """Create the indexes, returning whether to stop trying"""
+        try:
+            await self.ensure_indexes()
+            return True
+        except OperationFailure as e:
+            # e.g. a non-TTL timestamp index already exists; retrying will not help
+            logger.error(f"Status check indexes not created: {e}")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to create status check indexes, retrying: {e}")
+            return False
+
+    async def _flush_periodically(self):
+        indexed = False
+        while True:
+            if not indexed:
+                indexed = await self._ensure_indexes()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Status flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """Stop the timer and write whatever is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
@@ -0,0 +1,255 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid
+import os
+import asyncio
+import logging
+
+from services.blockchain_service import BlockchainService
+from services.reorg import BlockHashChain
+from services.rate_limiter import rpc_priority, BACKGROUND
+from services.block_watcher import EventBus, NEW_HEAD, next_messages
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.environ.get('SUPPLY_POLL_INTERVAL', '15'))
+# Every bank is sampled at least once per this many blocks
+SAMPLE_BLOCK_INTERVAL = int(os.environ.get('SUPPLY_SAMPLE_BLOCK_INTERVAL', '100'))
+RAW_RETENTION = int(os.environ.get('SUPPLY_RAW_RETENTION', str(7 * 86400)))
+MINUTE_RETENTION = int(os.environ.get('SUPPLY_MINUTE_RETENTION', str(90 * 86400)))
+MAX_POINTS = 1000
+# Digits in the largest uint256
+AMOUNT_DIGITS = 78
+
+SUPPLY_FIELDS = ['mintedSupply', 'availableSupply', 'normalCurrencyBalance', 'foreignCurrencyBalance']
+SAMPLED_EVENTS = ['CoinsMinted', 'PendingBankTransfer', 'BankTransferApproved']
+
+# name, bucket size in seconds, retention in seconds (None keeps forever)
+ROLLUPS = [
+    ('1m', 60, MINUTE_RETENTION),
+    ('1h', 3600, None),
+    ('1d', 86400, None),
+]
+
+def to_amount(value: int) -> str:
+    # uint256 values overflow BSON integers and Decimal128's 34 digits; zero-padded
+    # to a fixed width, decimal strings compare in numeric order for $min and $max
+    return str(value).zfill(AMOUNT_DIGITS)
+
+def from_amount(value) -> int:
+    return int(str(value))
+
+def bucket_start(timestamp: datetime, size: int) -> datetime:
+    seconds = int(timestamp.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % size, tz=timezone.utc)
+
+def to_millis(timestamp: datetime) -> int:
+    return int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+class SupplySampler:
+    """Time series of each bank's supply and balances.
+
+    Every bank is sampled every `SAMPLE_BLOCK_INTERVAL` blocks, and the banks
+    touched by `CoinsMinted` and transfer events are sampled as soon as those
+    are seen. Raw samples go to a MongoDB time-series collection, and each
+    sample is folded on write into minute, hour and day rollups holding the
+    last, min and max of every field, so a range query reads at most
+    `MAX_POINTS` pre-aggregated documents at the coarsest fitting resolution.
+    A window holding more points than that returns its newest ones.
+    """
+
+    def __init__(self, db, service: BlockchainService, chain: BlockHashChain):
+        self.db = db
+        self.samples = db.bank_supply
+        self.rollups = {name: db[f'bank_supply_{name}'] for name, _, _ in ROLLUPS}
+        self.state = db.supply_sampler_state
+        self.service = service
+        self.chain = chain
+
+    async def ensure_collections(self):
+        try:
+            await self.db.create_collection(
+                'bank_supply',
+                timeseries={'timeField': 'timestamp', 'metaField': 'bankId', 'granularity': 'minutes'},
+                expireAfterSeconds=RAW_RETENTION
+            )
+        except CollectionInvalid:
+            pass
+        await self.samples.create_index([('bankId', ASCENDING), ('timestamp', ASCENDING)])
+        for name, _, retention in ROLLUPS:
+            rollup = self.rollups[name]
+            await rollup.create_index([('bankId', ASCENDING), ('timestamp', ASCENDING)], unique=True)
+            if retention is not None:
+                await rollup.create_index('expiresAt', expireAfterSeconds=0)
+
+    async def _checkpoint(self) -> Dict[str, Any]:
+        return await self.state.find_one({'_id': 'supply'}) or {}
+
+    async def _set_checkpoint(self, last_block: int, last_full_sample: int):
+        await self.state.update_one(
+            {'_id': 'supply'},
+            {'$set': {'lastBlock': last_block, 'lastFullSample': last_full_sample}},
+            upsert=True
+        )
+
+    async def _affected_banks(self, events: Iterable[Dict[str, Any]]) -> Set[str]:
+        bank_ids = set()
+        approved = []
+        for event in events:
+            args = event['args']
+            if event['event'] == 'CoinsMinted':
+                bank_ids.add(args['bankId'])
+            elif event['event'] == 'PendingBankTransfer':
+                bank_ids.update((args['fromBankId'], args['toBankId']))
+            else:
+                approved.append(args['transferId'])
+        if approved:
+            # Approvals only carry the transfer id; the indexed request event names the banks
+            cursor = self.db.contract_events.find(
+                {'event': 'PendingBankTransfer', 'args.transferId': {'$in': approved}},
+                {'args.fromBankId': 1, 'args.toBankId': 1}
+            )
+            async for doc in cursor:
+                bank_ids.update((doc['args']['fromBankId'], doc['args']['toBankId']))
+        return bank_ids
+
+    async def sample(self) -> int:
+        """Sample banks changed since the last run, or all of them when due"""
+        head = await asyncio.to_thread(self.chain.advance)
+        checkpoint = await self._checkpoint()
+        last_block = checkpoint.get('lastBlock')
+        last_full_sample = checkpoint.get('lastFullSample')
+        if last_block is not None and head <= last_block:
+            return 0
+
+        if last_full_sample is None or head - last_full_sample >= SAMPLE_BLOCK_INTERVAL:
+            bank_ids = await asyncio.to_thread(self.service.get_bank_ids)
+            last_full_sample = head
+        else:
+            events = await asyncio.to_thread(self.service.get_events, SAMPLED_EVENTS, last_block + 1, head)
+            bank_ids = await self._affected_banks(events)
+
+        if bank_ids:
+            header = await asyncio.to_thread(self.service.get_block_header, head)
+            timestamp = datetime.fromtimestamp(header['timestamp'], tz=timezone.utc)
+            banks = await asyncio.to_thread(self._read_banks, sorted(bank_ids))
+            await self.record(banks, head, timestamp)
+        await self._set_checkpoint(head, last_full_sample)
+        return len(bank_ids)
+
+    def _read_banks(self, bank_ids: List[str]) -> List[Dict[str, Any]]:
+        banks = []
+        for bank_id in bank_ids:
+            try:
+                banks.append(self.service.get_bank_details(bank_id))
+            except Exception as e:
+                logger.warning(f"Failed to sample bank {bank_id}: {e}")
+        return banks
+
+    async def record(self, banks: List[Dict[str, Any]], block_number: int, timestamp: datetime):
+        """Store one sample per bank and fold it into every rollup"""
+        if not banks:
+            return
+        await self.samples.insert_many([
+            {
+                'bankId': bank['uniqueId'],
+                'timestamp': timestamp,
+                'blockNumber': block_number,
+                **{field: to_amount(bank[field]) for field in SUPPLY_FIELDS}
+            }
+            for bank in banks
+        ])
+
+        for name, size, retention in ROLLUPS:
+            start = bucket_start(timestamp, size)
+            updates = []
+            for bank in banks:
+                values = {field: to_amount(bank[field]) for field in SUPPLY_FIELDS}
+                update = {
+                    '$set': {f'last.{field}': value for field, value in values.items()},
+                    '$min': {f'min.{field}': value for field, value in values.items()},
+                    '$max': {f'max.{field}': value for field, value in values.items()},
+                    '$inc': {'count': 1}
+                }
+                update['$set']['lastBlock'] = block_number
+                if retention is not None:
+                    update['$set']['expiresAt'] = datetime.fromtimestamp(
+                        start.timestamp() + size + retention, tz=timezone.utc)
+                updates.append(UpdateOne({'bankId': bank['uniqueId'], 'timestamp': start}, update, upsert=True))
+            await self.rollups[name].bulk_write(updates, ordered=False)
+
+    async def run(self, enabled: Callable[[], bool] = lambda: True, interval: float = POLL_INTERVAL,
+                  bus: Optional[EventBus] = None):
+        """Keep sampling while `enabled()` holds"""
+        rpc_priority.set(BACKGROUND)
+        await self.ensure_collections()
+        # Woken by each new head, with `interval` as the fallback when none arrive
+        queue = bus.subscribe(NEW_HEAD) if bus is not None else None
+        try:
+            while True:
+                if enabled():
+                    try:
+                        await self.sample()
+                    except Exception as e:
+                        logger.warning(f"Supply sampling failed: {e}")
+                await next_messages(queue, interval)
+        finally:
+            if queue is not None:
+                bus.unsubscribe(queue)
+
+    @staticmethod
+    def pick_resolution(since: datetime, until: datetime, now: datetime) -> str:
+        """Finest resolution that covers the window within MAX_POINTS and retention"""
+        span = (until - since).total_seconds()
+        age = (now - since).total_seconds()
+        if age <= RAW_RETENTION and span <= MAX_POINTS * POLL_INTERVAL:
+            return 'raw'
+        for name, size, retention in ROLLUPS:
+            if span / size <= MAX_POINTS and (retention is None or age <= retention):
+                return name
+        return ROLLUPS[-1][0]
+
+    async def query(self, bank_id: str, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, resolution: Optional[str] = None) -> Dict[str, Any]:
+        """Supply and balances of a bank over a time window"""
+        now = datetime.now(timezone.utc)
+        until = until or now
+        since = since or datetime.fromtimestamp(until.timestamp() - 86400, tz=timezone.utc)
+        query = {'bankId': bank_id, 'timestamp': {'$gte': since, '$lte': until}}
+        if resolution is None:
+            resolution = self.pick_resolution(since, until, now)
+            if resolution == 'raw' and await self.samples.count_documents(query) > MAX_POINTS:
+                # Banks busy enough to be sampled on most heads outrun POLL_INTERVAL
+                resolution = ROLLUPS[0][0]
+        elif resolution != 'raw' and resolution not in self.rollups:
+            raise ValueError(f"Unknown resolution {resolution}")
+
+        points = []
+        if resolution == 'raw':
+            # Newest first, so a window over MAX_POINTS drops its oldest points
+            cursor = self.samples.find(query, {'_id': 0, 'bankId': 0}).sort('timestamp', DESCENDING).limit(MAX_POINTS)
+            async for doc in cursor:
+                points.append({
+                    'timestamp': to_millis(doc['timestamp']),
+                    'blockNumber': doc['blockNumber'],
+                    **{field: from_amount(doc[field]) for field in SUPPLY_FIELDS}
+                })
+        else:
+            # Include the bucket the window starts in
+            size = next(size for name, size, _ in ROLLUPS if name == resolution)
+            query['timestamp']['$gte'] = bucket_start(since, size)
+            cursor = (
+                self.rollups[resolution].find(query, {'_id': 0, 'bankId': 0, 'expiresAt': 0})
+                .sort('timestamp', DESCENDING).limit(MAX_POINTS)
+            )
+            async for doc in cursor:
+                point = {'timestamp': to_millis(doc['timestamp']), 'blockNumber': doc['lastBlock'], 'count': doc['count']}
+                for field in SUPPLY_FIELDS:
+                    point[field] = from_amount(doc['last'][field])
+                    point[f'{field}Min'] = from_amount(doc['min'][field])
+                    point[f'{field}Max'] = from_amount(doc['max'][field])
+                points.append(point)
+        points.reverse()
+
+        return {'bankId': bank_id, 'resolution': resolution, 'points': points}
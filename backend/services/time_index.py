@@ -0,0 +1,51 @@
+from typing import Generic, List, Optional, TypeVar
+from bisect import bisect_left, bisect_right
+
+K = TypeVar('K')
+
+class SortedTimeIndex(Generic[K]):
+    """Keys kept sorted by timestamp for binary-search range queries.
+
+    Timestamps and keys live in parallel lists. New entries almost always
+    arrive in time order and are appended; late ones are inserted in place.
+    A range or latest-N query costs O(log n + k).
+    """
+
+    def __init__(self):
+        self._times: List[int] = []
+        self._keys: List[K] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, timestamp: int, key: K):
+        if not self._times or timestamp >= self._times[-1]:
+            self._times.append(timestamp)
+            self._keys.append(key)
+        else:
+            i = bisect_right(self._times, timestamp)
+            self._times.insert(i, timestamp)
+            self._keys.insert(i, key)
+
+    def remove(self, timestamp: int, key: K):
+        i = bisect_left(self._times, timestamp)
+        while i < len(self._times) and self._times[i] == timestamp:
+            if self._keys[i] == key:
+                del self._times[i]
+                del self._keys[i]
+                return
+            i += 1
+
+    def range(self, since: Optional[int] = None, until: Optional[int] = None,
+              limit: Optional[int] = None, descending: bool = False) -> List[K]:
+        """Keys with since <= timestamp <= until, oldest or newest first"""
+        lo = 0 if since is None else bisect_left(self._times, since)
+        hi = len(self._times) if until is None else bisect_right(self._times, until)
+        if hi <= lo:
+            return []
+
+        if descending:
+            start = lo if limit is None else max(lo, hi - limit)
+            return self._keys[start:hi][::-1]
+        end = hi if limit is None else min(hi, lo + limit)
+        return self._keys[lo:end]
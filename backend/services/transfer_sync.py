@@ -0,0 +1,299 @@
+from typing import List, Dict, Any, Optional, Iterable
+from web3.exceptions import ContractLogicError
+import os
+import time
+import threading
+import logging
+
+from services.blockchain_service import blockchain_service, BlockchainService
+from services.reorg import block_chain, BlockHashChain
+from services.time_index import SortedTimeIndex
+from services.deadline import PartialResult
+
+logger = logging.getLogger(__name__)
+
+# How long a bank's history may go unsynced before a per-bank read syncs it
+BANK_SYNC_INTERVAL = float(os.environ.get('BANK_HISTORY_SYNC_INTERVAL', '5'))
+# Entries read one at a time past a cursor before switching to a full read
+TAIL_READ_LIMIT = int(os.environ.get('BANK_HISTORY_TAIL_READ_LIMIT', '8'))
+# How often every bank is read again, to correct any drift from missed events
+RECONCILE_INTERVAL = float(os.environ.get('BANK_HISTORY_RECONCILE_INTERVAL', '300'))
+
+class TransferHistorySync:
+    """Append-only mirror of every bank's on-chain transfer history.
+
+    Bank histories only ever grow, so each bank keeps a length cursor and a
+    sync reads just the entries past it through the indexed
+    `bankTransferHistory(bankId, index)` accessor. A first fill, or a gap
+    longer than TAIL_READ_LIMIT entries, reads the whole array with one
+    `getBankTransferHistory` call instead. Every transfer is stored once in
+    a global index keyed by transferId, no matter how many bank histories
+    it appears in.
+
+    After the first sync only the banks named in contract events since the
+    last one are read: both sides of a `PendingBankTransfer`, and of a
+    `BankTransferApproved` through the request seen earlier. An approval of
+    a transfer requested before that, a reorg, or the reconcile interval
+    running out reads every bank again. Reads happen outside the state
+    lock, which is only held to apply them, and a per-bank read never waits
+    behind a sync that is already running.
+
+    Banks whose last sync failed are reported stale, or missing if they
+    never synced, the way fan-out reads report them.
+
+    Entries are tagged with the head block they were read under. Entries
+    tagged above a reorg's fork point may be phantoms, so a reorg rewinds
+    each bank's cursor to its first such entry and they are read again.
+
+    Each bank also keeps a timestamp-sorted index over its history, updated
+    as entries arrive, for range and latest-N queries.
+    """
+
+    TRACKED_EVENTS = ['BankApproved', 'PendingBankTransfer', 'BankTransferApproved', 'BankTransferRejected']
+
+    def __init__(self, service: BlockchainService, chain: BlockHashChain,
+                 reconcile_interval: float = RECONCILE_INTERVAL):
+        self.service = service
+        self.chain = chain
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.RLock()
+        # Held for a whole sync, so only one reads the chain at a time
+        self._sync_lock = threading.Lock()
+        self._bank_ids: List[str] = []
+        self._cursors: Dict[str, int] = {}
+        self._bank_history: Dict[str, List[str]] = {}
+        self._entry_blocks: Dict[str, List[int]] = {}
+        self._transfers: Dict[str, Dict[str, Any]] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._time_index: Dict[str, SortedTimeIndex[str]] = {}
+        self._synced_at: Dict[str, float] = {}
+        self._failed: Dict[str, Exception] = {}
+        # Both sides, and the block, of open transfers requested since the first sync
+        self._transfer_banks: Dict[str, tuple] = {}
+        self._last_block: Optional[int] = None
+        self._last_reconcile = 0.0
+        self._events_synced_at = 0.0
+        self._rollback_to: Optional[int] = None
+        chain.on_reorg(self._on_reorg)
+
+    def _on_reorg(self, fork_block: int):
+        # Applied under our own lock on the next sync
+        if self._rollback_to is None or fork_block < self._rollback_to:
+            self._rollback_to = fork_block
+
+    def _apply_rollback(self) -> Optional[int]:
+        fork_block, self._rollback_to = self._rollback_to, None
+        if fork_block is None:
+            return None
+
+        for bank_id, blocks in self._entry_blocks.items():
+            keep = next((i for i, block in enumerate(blocks) if block >= fork_block), len(blocks))
+            for transfer_id in self._bank_history[bank_id][keep:]:
+                self._time_index[bank_id].remove(self._transfers[transfer_id]['timestamp'], transfer_id)
+                self._refcounts[transfer_id] -= 1
+                if self._refcounts[transfer_id] == 0:
+                    del self._refcounts[transfer_id]
+                    del self._transfers[transfer_id]
+            del self._bank_history[bank_id][keep:]
+            del blocks[keep:]
+            self._cursors[bank_id] = keep
+        for transfer_id, (_, _, block) in list(self._transfer_banks.items()):
+            if block >= fork_block:
+                del self._transfer_banks[transfer_id]
+        return fork_block
+
+    def sync(self, bank_ids: Optional[Iterable[str]] = None) -> int:
+        """Fetch entries appended since the last sync and return how many were new
+
+        Without `bank_ids`, reads the banks that contract events show changed.
+        """
+        with self._sync_lock:
+            return self._sync(bank_ids)
+
+    def _sync(self, bank_ids: Optional[Iterable[str]]) -> int:
+        head = self.chain.advance()
+        with self._lock:
+            fork_block = self._apply_rollback()
+        targets = self._changed_banks(head, fork_block) if bank_ids is None else list(bank_ids)
+
+        fetched = {bank_id: self._fetch_bank(bank_id, self._cursors.get(bank_id, 0)) for bank_id in targets}
+        if any(entries for entries, _ in fetched.values()):
+            # Entries were read at or below the head as of now
+            head = self.chain.advance(max_age=0)
+
+        with self._lock:
+            new_entries = 0
+            for bank_id, (entries, error) in fetched.items():
+                self._append_entries(bank_id, entries, head)
+                new_entries += len(entries)
+                if error is None:
+                    self._synced_at[bank_id] = time.monotonic()
+                    self._failed.pop(bank_id, None)
+                else:
+                    logger.warning(f"Failed to sync transfer history for {bank_id}: {error}")
+                    self._failed[bank_id] = error
+            return new_entries
+
+    def _changed_banks(self, head: int, fork_block: Optional[int]) -> List[str]:
+        """Banks whose history may have grown since the last sync, reading every
+        bank when a full read is due"""
+        full_read = (self._last_block is None or fork_block is not None
+                     or time.monotonic() - self._last_reconcile >= self.reconcile_interval)
+        changed = dict.fromkeys(self._failed)
+
+        from_block = None if self._last_block is None else self._last_block + 1
+        if from_block is not None and fork_block is not None:
+            from_block = min(from_block, fork_block)
+        if from_block is not None and head >= from_block:
+            # Scanned even when every bank is read, to keep track of open transfers
+            events = self.service.get_events(self.TRACKED_EVENTS, from_block, head)
+            for event in events:
+                args = event['args']
+                if event['event'] == 'BankApproved':
+                    self._sync_bank_ids()
+                elif event['event'] == 'PendingBankTransfer':
+                    self._transfer_banks[args['transferId']] = (args['fromBankId'], args['toBankId'], event['blockNumber'])
+                    changed.update(dict.fromkeys((args['fromBankId'], args['toBankId'])))
+                elif event['event'] == 'BankTransferApproved':
+                    transfer = self._transfer_banks.pop(args['transferId'], None)
+                    if transfer is None:
+                        logger.info(f"Approval of unknown transfer {args['transferId']}, reading every bank")
+                        full_read = True
+                        continue
+                    changed.update(dict.fromkeys(transfer[:2]))
+                else:
+                    self._transfer_banks.pop(args['transferId'], None)
+        self._events_synced_at = time.monotonic()
+
+        if full_read:
+            self._sync_bank_ids()
+            self._last_reconcile = time.monotonic()
+            changed = dict.fromkeys(self._bank_ids)
+        self._last_block = head
+        return list(changed)
+
+    def _sync_bank_ids(self):
+        """Append bank IDs registered since the last sync"""
+        new_ids = self.service.get_bank_ids(start=len(self._bank_ids))
+        with self._lock:
+            for bank_id in new_ids:
+                self._bank_ids.append(bank_id)
+                self._cursors.setdefault(bank_id, 0)
+                self._bank_history.setdefault(bank_id, [])
+
+    def _read_entries(self, bank_id: str, cursor: int):
+        """Yield a bank's history entries from `cursor` on"""
+        if cursor > 0:
+            for index in range(cursor, cursor + TAIL_READ_LIMIT):
+                try:
+                    transfer = self.service.get_transfer_history_entry(bank_id, index)
+                except ContractLogicError:
+                    # Reading past the end of the array reverts
+                    return
+                yield transfer
+            cursor += TAIL_READ_LIMIT
+        # One call for the rest, however long, rather than one per entry
+        yield from self.service.get_transfer_history(bank_id)[cursor:]
+
+    def _fetch_bank(self, bank_id: str, cursor: int):
+        """Read a bank's history entries past its cursor, with the error that
+        stopped the read, if any"""
+        entries = []
+        try:
+            for transfer in self._read_entries(bank_id, cursor):
+                # Keep what was read before a failure rather than refetch it
+                entries.append(transfer)
+        except Exception as e:
+            return entries, e
+        return entries, None
+
+    def _append_entries(self, bank_id: str, entries: List[Dict[str, Any]], block: int):
+        for transfer in entries:
+            transfer_id = transfer['transferId']
+            self._transfers[transfer_id] = transfer
+            self._refcounts[transfer_id] = self._refcounts.get(transfer_id, 0) + 1
+            self._bank_history.setdefault(bank_id, []).append(transfer_id)
+            self._time_index.setdefault(bank_id, SortedTimeIndex()).add(transfer['timestamp'], transfer_id)
+            self._entry_blocks.setdefault(bank_id, []).append(block)
+        self._cursors[bank_id] = self._cursors.get(bank_id, 0) + len(entries)
+
+    def _sync_if_stale(self, bank_id: str):
+        if bank_id not in self._synced_at and bank_id not in self._failed:
+            # Nothing to serve yet, so wait for this bank's first read
+            self.sync([bank_id])
+        elif (time.monotonic() - self._events_synced_at >= BANK_SYNC_INTERVAL
+                and self._sync_lock.acquire(blocking=False)):
+            # A sync already running will bring the bank up to date
+            try:
+                self._sync(None)
+            finally:
+                self._sync_lock.release()
+
+    def _completeness(self, bank_ids: Iterable[str]):
+        """Banks whose last sync failed, split into never synced and synced before"""
+        missing, stale = [], []
+        for bank_id in bank_ids:
+            if bank_id in self._failed:
+                synced = bank_id in self._synced_at or self._cursors.get(bank_id, 0) > 0
+                (stale if synced else missing).append(bank_id)
+        return missing, stale
+
+    def _bank_result(self, bank_id: str, transfers: List[Dict[str, Any]]) -> PartialResult:
+        missing, stale = self._completeness([bank_id])
+        if missing:
+            # Nothing to serve in place of the failed read
+            raise self._failed[bank_id]
+        return PartialResult(transfers, stale=stale)
+
+    def get_transfer_history(self, bank_id: str) -> PartialResult:
+        """Get a bank's transfer history in contract order, stale if its sync failed"""
+        self._sync_if_stale(bank_id)
+        with self._lock:
+            transfers = [self._transfers[transfer_id] for transfer_id in self._bank_history.get(bank_id, [])]
+            return self._bank_result(bank_id, transfers)
+
+    def query_transfer_history(self, bank_id: str, since: Optional[int] = None, until: Optional[int] = None,
+                               limit: Optional[int] = None, order: str = 'asc') -> PartialResult:
+        """Get a bank's transfers with since <= timestamp <= until (in ms), ordered by time"""
+        self._sync_if_stale(bank_id)
+        with self._lock:
+            index = self._time_index.get(bank_id)
+            transfer_ids = index.range(since, until, limit, descending=order == 'desc') if index is not None else []
+            return self._bank_result(bank_id, [self._transfers[transfer_id] for transfer_id in transfer_ids])
+
+    def get_all_transfer_history(self) -> PartialResult:
+        """Get every approved transfer across all banks, each listed once"""
+        self.sync()
+        with self._lock:
+            missing, stale = self._completeness(self._bank_ids)
+            return PartialResult(
+                (transfer for transfer in self._transfers.values() if transfer['approved']), missing, stale
+            )
+
+    def export_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'bankIds': list(self._bank_ids),
+                'cursors': dict(self._cursors),
+                'bankHistory': {bank_id: list(ids) for bank_id, ids in self._bank_history.items()},
+                'entryBlocks': {bank_id: list(blocks) for bank_id, blocks in self._entry_blocks.items()},
+                'transfers': dict(self._transfers)
+            }
+
+    def restore_state(self, state: Dict[str, Any]):
+        with self._lock:
+            self._bank_ids = state['bankIds']
+            self._cursors = state['cursors']
+            self._bank_history = state['bankHistory']
+            self._entry_blocks = state['entryBlocks']
+            self._transfers = state['transfers']
+            self._refcounts = {}
+            self._time_index = {}
+            for bank_id, transfer_ids in self._bank_history.items():
+                index = self._time_index[bank_id] = SortedTimeIndex()
+                for transfer_id in transfer_ids:
+                    self._refcounts[transfer_id] = self._refcounts.get(transfer_id, 0) + 1
+                    index.add(self._transfers[transfer_id]['timestamp'], transfer_id)
+
+# Singleton instance
+transfer_sync = TransferHistorySync(blockchain_service, block_chain)
@@ -0,0 +1,209 @@
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime
+from eth_account import Account
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+import os
+import time
+import uuid
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADMIN_PRIVATE_KEY = os.environ.get('ADMIN_PRIVATE_KEY')
+# Headroom added on top of the largest gas estimate seen for a function
+GAS_MARGIN = float(os.environ.get('TX_GAS_MARGIN', '1.2'))
+GAS_ESTIMATE_TTL = 600.0
+FEE_TTL = 12.0
+RECEIPT_POLL_INTERVAL = float(os.environ.get('TX_RECEIPT_POLL_INTERVAL', '3'))
+MAX_TRACKED = 10000
+
+ADMIN_FUNCTIONS = {'approveBankToBankTransfer', 'rejectBankToBankTransfer', 'generateBank', 'mintCoins'}
+
+NONCE_ERRORS = ('nonce too low', 'replacement transaction underpriced', 'nonce too high', 'invalid transaction nonce')
+# The node already holds this very transaction, e.g. from an attempt whose answer was lost
+KNOWN_TX_ERRORS = ('already known', 'known transaction')
+
+class TransactionSubmitter:
+    """Signs and pipelines admin contract calls from a configured key.
+
+    Nonces are assigned locally, so a batch is sent back-to-back without
+    waiting for receipts; the nonce is re-read from the node only when it
+    rejects one. Gas limits are cached per function and fees for a block's
+    worth of time. Receipts are collected by a background task, and every
+    submission can be looked up by id while it is tracked.
+    """
+
+    def __init__(self, w3, contract, private_key: str):
+        self.w3 = w3
+        self.contract = contract
+        self.account = Account.from_key(private_key)
+        self._lock = threading.Lock()
+        self._records_lock = threading.Lock()
+        self._chain_id: Optional[int] = None
+        self._next_nonce: Optional[int] = None
+        self._gas: Dict[str, tuple] = {}
+        self._fees: Optional[tuple] = None
+        self._records: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def address(self) -> str:
+        return self.account.address
+
+    def _sync_nonce(self):
+        self._next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+
+    def _gas_limit(self, function_name: str, call) -> int:
+        cached = self._gas.get(function_name)
+        if cached is not None and time.monotonic() - cached[1] < GAS_ESTIMATE_TTL:
+            return cached[0]
+        estimate = int(call.estimate_gas({'from': self.address}) * GAS_MARGIN)
+        if cached is not None:
+            estimate = max(estimate, cached[0])
+        self._gas[function_name] = (estimate, time.monotonic())
+        return estimate
+
+    def cached_gas(self, function_name: str) -> Optional[int]:
+        """Last gas limit used for a function, if one was estimated"""
+        cached = self._gas.get(function_name)
+        return None if cached is None else cached[0]
+
+    def _fee_fields(self) -> Dict[str, int]:
+        if self._fees is not None and time.monotonic() - self._fees[1] < FEE_TTL:
+            return self._fees[0]
+
+        base_fee = self.w3.eth.get_block('latest').get('baseFeePerGas')
+        if base_fee is None:
+            fees = {'gasPrice': self.w3.eth.gas_price}
+        else:
+            priority_fee = self.w3.eth.max_priority_fee
+            fees = {'maxPriorityFeePerGas': priority_fee, 'maxFeePerGas': 2 * base_fee + priority_fee}
+        self._fees = (fees, time.monotonic())
+        return fees
+
+    def _track(self, record: Dict[str, Any]):
+        with self._records_lock:
+            self._records[record['id']] = record
+            while len(self._records) > MAX_TRACKED:
+                self._records.popitem(last=False)
+
+    def _send(self, function_name: str, args: List[Any]) -> Dict[str, Any]:
+        record = {
+            'id': str(uuid.uuid4()),
+            'function': function_name,
+            'args': args,
+            'nonce': None,
+            'txHash': None,
+            'status': 'failed',
+            'error': None,
+            'blockNumber': None,
+            'gasUsed': None,
+            'submittedAt': datetime.utcnow().isoformat()
+        }
+        try:
+            if function_name not in ADMIN_FUNCTIONS:
+                raise ValueError(f"{function_name} is not an admin function")
+            call = getattr(self.contract.functions, function_name)(*args)
+            gas = self._gas_limit(function_name, call)
+            fees = self._fee_fields()
+
+            for attempt in range(2):
+                tx = call.build_transaction({
+                    'from': self.address,
+                    'chainId': self._chain_id,
+                    'nonce': self._next_nonce,
+                    'gas': gas,
+                    **fees
+                })
+                signed = self.account.sign_transaction(tx)
+                try:
+                    tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+                    break
+                except Exception as e:
+                    if any(reason in str(e).lower() for reason in KNOWN_TX_ERRORS):
+                        # Accepted already; sending it again under a new nonce would repeat the action
+                        tx_hash = signed.hash
+                        break
+                    if attempt == 0 and any(reason in str(e).lower() for reason in NONCE_ERRORS):
+                        logger.warning(f"Nonce {self._next_nonce} rejected, resyncing: {e}")
+                        self._sync_nonce()
+                        continue
+                    raise
+
+            record.update(nonce=self._next_nonce, txHash=Web3.to_hex(tx_hash), status='submitted')
+            # Only advance once the node has accepted it, so failures leave no gap
+            self._next_nonce += 1
+        except Exception as e:
+            logger.error(f"Failed to submit {function_name}: {e}")
+            record['error'] = str(e)
+        self._track(record)
+        return record
+
+    def submit_batch(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sign and send a batch of admin calls without waiting for receipts"""
+        with self._lock:
+            if self._chain_id is None:
+                self._chain_id = self.w3.eth.chain_id
+            if self._next_nonce is None:
+                self._sync_nonce()
+            return [self._send(action['function'], list(action.get('args', []))) for action in actions]
+
+    def get_record(self, record_id: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(record_id)
+
+    def list_records(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._records_lock:
+            return list(self._records.values())[-limit:]
+
+    def poll_receipts(self) -> int:
+        """Collect receipts for submitted transactions, returning how many settled"""
+        settled = 0
+        with self._records_lock:
+            submitted = [r for r in self._records.values() if r['status'] == 'submitted']
+        for record in submitted:
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(record['txHash'])
+            except TransactionNotFound:
+                continue
+            except Exception as e:
+                logger.warning(f"Failed to get receipt for {record['txHash']}: {e}")
+                continue
+
+            record.update(
+                status='confirmed' if receipt['status'] == 1 else 'reverted',
+                blockNumber=receipt['blockNumber'],
+                gasUsed=receipt['gasUsed']
+            )
+            if receipt['status'] != 1:
+                # Could be out of gas; estimate afresh next time
+                self._gas.pop(record['function'], None)
+            settled += 1
+        return settled
+
+    async def _track_receipts(self):
+        while True:
+            await asyncio.sleep(RECEIPT_POLL_INTERVAL)
+            try:
+                await asyncio.to_thread(self.poll_receipts)
+            except Exception as e:
+                logger.warning(f"Receipt tracking failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._track_receipts())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+def create_submitter(service) -> Optional[TransactionSubmitter]:
+    """Build the submitter from ADMIN_PRIVATE_KEY, or None if no key is configured"""
+    if not ADMIN_PRIVATE_KEY:
+        return None
+    return TransactionSubmitter(service.w3, service.contract, ADMIN_PRIVATE_KEY)
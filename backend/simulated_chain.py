@@ -0,0 +1,368 @@
+"""A local stand-in for the bank contract and its node, for soak tests and benchmarks.
+
+SimulatedChain keeps the contract's state in memory, mines a block every
+`block_time` seconds with a random mix of bank requests, approvals, mints
+and transfers, and answers the JSON-RPC calls the backend makes: view calls
+through eth_call, blocks, logs and log filters.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from eth_abi import encode, decode
+from eth_utils import keccak, event_abi_to_log_topic, to_checksum_address
+from eth_utils.abi import function_abi_to_4byte_selector, get_abi_input_types, get_abi_output_types
+import json
+import random
+import threading
+import time
+
+from config.web3_config import CONTRACT_ABI
+
+ZERO_HASH = '0x' + '00' * 32
+REVERT = {'code': 3, 'message': 'execution reverted', 'data': '0x'}
+
+def to_hex(value: int) -> str:
+    return hex(value)
+
+class RpcError(Exception):
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(error['message'])
+        self.error = error
+
+class SimulatedChain:
+    """In-memory bank contract on a chain that mines blocks on a timer"""
+
+    def __init__(self, contract_address: str, chain_id: int, banks: int = 50,
+                 block_time: float = 2.0, reorg_rate: float = 0.0, seed: int = 0):
+        self.contract_address = to_checksum_address(contract_address)
+        self.chain_id = chain_id
+        self.block_time = block_time
+        self.reorg_rate = reorg_rate
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.functions = {
+            function_abi_to_4byte_selector(item): item
+            for item in CONTRACT_ABI if item['type'] == 'function' and item['stateMutability'] == 'view'
+        }
+        self.events = {item['name']: item for item in CONTRACT_ABI if item['type'] == 'event'}
+
+        self.owner = to_checksum_address('0x' + keccak(text='owner').hex()[:40])
+        self.bank_ids: List[str] = []
+        self.banks: Dict[str, list] = {}
+        self.pending_requests: List[list] = []
+        self.pending_transfers: Dict[str, List[list]] = {}
+        self.history: Dict[str, List[list]] = {}
+        self._serial = 0
+
+        self.blocks: List[Dict[str, Any]] = []
+        self.filters: Dict[str, Dict[str, Any]] = {}
+        self._filter_serial = 0
+        self._forks = 0
+        self._mine([])
+        for _ in range(banks):
+            self._add_bank(self._new_request())
+        self._mine([])
+
+    # Contract state
+
+    def _new_request(self) -> list:
+        self._serial += 1
+        name = f"{self.random.choice(['First', 'Royal', 'Union', 'Central', 'Pacific', 'Nordic'])} Bank {self._serial}"
+        currency = self.random.choice([('Dollar', 'USD'), ('Euro', 'EUR'), ('Yen', 'JPY'), ('Pound', 'GBP')])
+        submitter = to_checksum_address('0x' + keccak(text=name).hex()[:40])
+        return [name, currency[0], currency[1], self.random.randint(1, 1000), submitter, False, f"BANK{self._serial:06d}"]
+
+    def _add_bank(self, request: list):
+        request[5] = True
+        bank_id = request[6]
+        self.bank_ids.append(bank_id)
+        self.banks[bank_id] = [
+            bank_id, request[0], request[1], request[2], request[3], request[4],
+            f"{self._serial} Market Street", 0, 0, 0, 0
+        ]
+        self.pending_transfers[bank_id] = []
+        self.history[bank_id] = []
+
+    def _activity(self, timestamp: int) -> List[Tuple[str, list]]:
+        """Apply a random mix of contract calls, returning the events they emit"""
+        emitted = []
+        for _ in range(self.random.randint(0, 4)):
+            action = self.random.random()
+            if action < 0.03:
+                request = self._new_request()
+                self.pending_requests.append(request)
+                emitted.append(('BankRequested', [request[0], request[4]]))
+            elif action < 0.06 and any(not r[5] for r in self.pending_requests):
+                request = next(r for r in self.pending_requests if not r[5])
+                self._add_bank(request)
+                bank = self.banks[request[6]]
+                emitted.append(('BankApproved', [bank[0], bank[1], bank[6]]))
+            elif action < 0.45:
+                bank = self.banks[self.random.choice(self.bank_ids)]
+                amount = self.random.randint(1, 10 ** 6)
+                bank[7] += amount
+                bank[8] += amount
+                bank[9] += amount
+                emitted.append(('CoinsMinted', [bank[0], amount]))
+            elif action < 0.8:
+                from_id, to_id = self.random.sample(self.bank_ids, 2)
+                amount = self.random.randint(1, 10 ** 4)
+                transfer = [f"TX{timestamp}{len(emitted)}{self.random.randint(0, 10 ** 6)}", from_id, to_id,
+                            amount, self.banks[from_id][2], timestamp, False]
+                self.pending_transfers[from_id].append(transfer)
+                self.pending_transfers[to_id].append(list(transfer))
+                emitted.append(('PendingBankTransfer', [transfer[0], from_id, to_id, amount]))
+            else:
+                bank_id = self.random.choice(self.bank_ids)
+                open_rows = [t for t in self.pending_transfers[bank_id] if not t[6]]
+                if not open_rows:
+                    continue
+                transfer = self.random.choice(open_rows)
+                # Approvals need the sender to still hold the amount
+                approve = self.random.random() < 0.9 and self.banks[transfer[1]][9] >= transfer[3]
+                for other in (transfer[1], transfer[2]):
+                    rows = self.pending_transfers[other]
+                    if approve:
+                        for row in rows:
+                            if row[0] == transfer[0]:
+                                row[6] = True
+                        self.history[other].append(transfer[:6] + [True])
+                    else:
+                        rows[:] = [row for row in rows if row[0] != transfer[0]]
+                if approve:
+                    self.banks[transfer[1]][8] -= transfer[3]
+                    self.banks[transfer[1]][9] -= transfer[3]
+                    self.banks[transfer[2]][10] += transfer[3]
+                emitted.append(('BankTransferApproved' if approve else 'BankTransferRejected', [transfer[0]]))
+        return emitted
+
+    def _view(self, name: str, args: tuple):
+        if name == 'owner':
+            return self.owner
+        if name == 'bankIds':
+            if args[0] >= len(self.bank_ids):
+                raise RpcError(REVERT)
+            return self.bank_ids[args[0]]
+        if name == 'banks':
+            bank = self.banks.get(args[0])
+            return tuple(bank) if bank else ('', '', '', '', 0, '0x' + '00' * 20, '', 0, 0, 0, 0)
+        if name == 'bankSerialCounter':
+            return self._serial
+        if name == 'getPendingRequests':
+            # Approved requests stay in the array, flagged
+            return [tuple(r) for r in self.pending_requests]
+        if name == 'pendingRequests':
+            if args[0] >= len(self.pending_requests):
+                raise RpcError(REVERT)
+            return tuple(self.pending_requests[args[0]])
+        if name in ('viewPendingTransactions', 'getBankTransferHistory'):
+            rows = (self.pending_transfers if name == 'viewPendingTransactions' else self.history).get(args[0], [])
+            return [tuple(row) for row in rows]
+        if name in ('pendingBankTransfers', 'bankTransferHistory'):
+            rows = (self.pending_transfers if name == 'pendingBankTransfers' else self.history).get(args[0], [])
+            if args[1] >= len(rows):
+                raise RpcError(REVERT)
+            return tuple(rows[args[1]])
+        raise RpcError(REVERT)
+
+    # Blocks and logs
+
+    def _mine(self, emitted: List[Tuple[str, list]]):
+        number = len(self.blocks)
+        parent = self.blocks[-1]['hash'] if self.blocks else ZERO_HASH
+        block_hash = '0x' + keccak(text=f"{number}:{self._forks}").hex()
+        timestamp = int(time.time())
+        logs = []
+        for index, (event_name, values) in enumerate(emitted):
+            event = self.events[event_name]
+            data_inputs = [(i['type'], v) for i, v in zip(event['inputs'], values) if not i['indexed']]
+            logs.append({
+                'address': self.contract_address,
+                'topics': ['0x' + event_abi_to_log_topic(event).hex()] + [
+                    '0x' + encode([i['type']], [v]).hex()
+                    for i, v in zip(event['inputs'], values) if i['indexed']
+                ],
+                'data': '0x' + encode([t for t, _ in data_inputs], [v for _, v in data_inputs]).hex(),
+                'blockNumber': to_hex(number),
+                'blockHash': block_hash,
+                'transactionHash': '0x' + keccak(text=f"{block_hash}:{index}").hex(),
+                'transactionIndex': to_hex(index),
+                'logIndex': to_hex(index),
+                'removed': False
+            })
+        self.blocks.append({'number': number, 'hash': block_hash, 'parentHash': parent,
+                            'timestamp': timestamp, 'logs': logs})
+
+    def mine(self):
+        """Mine one block of random activity, occasionally replacing the head first"""
+        with self._lock:
+            if len(self.blocks) > 2 and self.random.random() < self.reorg_rate:
+                # Replace the head block; the activity it carried stays applied
+                self._forks += 1
+                dropped = self.blocks.pop()
+                self._mine([])
+                self.blocks[-1]['logs'] = [
+                    {**log, 'blockHash': self.blocks[-1]['hash']} for log in dropped['logs']
+                ]
+            self._mine(self._activity(int(time.time())))
+
+    def _block(self, identifier) -> Optional[Dict[str, Any]]:
+        if identifier in ('latest', 'pending', 'safe', None):
+            return self.blocks[-1]
+        if identifier == 'finalized':
+            return self.blocks[max(len(self.blocks) - 65, 0)]
+        if identifier == 'earliest':
+            return self.blocks[0]
+        if isinstance(identifier, dict):
+            identifier = identifier.get('blockHash') or identifier.get('blockNumber')
+        if isinstance(identifier, str) and len(identifier) == 66:
+            return next((b for b in reversed(self.blocks) if b['hash'] == identifier), None)
+        number = int(identifier, 16) if isinstance(identifier, str) else int(identifier)
+        return self.blocks[number] if number < len(self.blocks) else None
+
+    def _format_block(self, block: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if block is None:
+            return None
+        return {
+            'number': to_hex(block['number']),
+            'hash': block['hash'],
+            'parentHash': block['parentHash'],
+            'timestamp': to_hex(block['timestamp']),
+            'miner': '0x' + '00' * 20,
+            'gasLimit': to_hex(30_000_000),
+            'gasUsed': to_hex(21_000 * len(block['logs'])),
+            'baseFeePerGas': to_hex(10 ** 9),
+            'difficulty': '0x0',
+            'extraData': '0x',
+            'logsBloom': '0x' + '00' * 256,
+            'nonce': '0x' + '00' * 8,
+            'mixHash': ZERO_HASH,
+            'sha3Uncles': ZERO_HASH,
+            'stateRoot': ZERO_HASH,
+            'transactionsRoot': ZERO_HASH,
+            'receiptsRoot': ZERO_HASH,
+            'size': to_hex(1000),
+            'transactions': [],
+            'uncles': []
+        }
+
+    def _logs(self, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if 'blockHash' in criteria:
+            blocks = [b for b in [self._block(criteria['blockHash'])] if b]
+        else:
+            start = self._block(criteria.get('fromBlock', 'latest'))['number']
+            end = self._block(criteria.get('toBlock', 'latest'))['number']
+            blocks = self.blocks[start:end + 1]
+        addresses = criteria.get('address')
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {a.lower() for a in addresses} if addresses else None
+        topics = (criteria.get('topics') or [None])[0]
+        if isinstance(topics, str):
+            topics = [topics]
+        topics = {t.lower() for t in topics} if topics else None
+        return [
+            log for block in blocks for log in block['logs']
+            if (addresses is None or log['address'].lower() in addresses)
+            and (topics is None or log['topics'][0] in topics)
+        ]
+
+    # JSON-RPC
+
+    def _eth_call(self, transaction: Dict[str, Any], block_identifier='latest'):
+        if self._block(block_identifier) is None:
+            raise RpcError({'code': -32000, 'message': 'header not found'})
+        data = bytes.fromhex((transaction.get('data') or transaction.get('input', '0x'))[2:])
+        function = self.functions.get(data[:4])
+        if function is None:
+            raise RpcError(REVERT)
+        args = decode(get_abi_input_types(function), data[4:])
+        result = self._view(function['name'], args)
+        output_types = get_abi_output_types(function)
+        if len(output_types) == 1:
+            result = (result,)
+        return '0x' + encode(output_types, result).hex()
+
+    def dispatch(self, method: str, params: List[Any]):
+        with self._lock:
+            if method == 'eth_chainId':
+                return to_hex(self.chain_id)
+            if method == 'net_version':
+                return str(self.chain_id)
+            if method == 'eth_blockNumber':
+                return to_hex(self.blocks[-1]['number'])
+            if method in ('eth_getBlockByNumber', 'eth_getBlockByHash'):
+                return self._format_block(self._block(params[0]))
+            if method == 'eth_call':
+                return self._eth_call(*params)
+            if method == 'eth_getLogs':
+                return self._logs(params[0])
+            if method == 'eth_gasPrice':
+                return to_hex(10 ** 9)
+            if method == 'eth_newFilter':
+                self._filter_serial += 1
+                filter_id = to_hex(self._filter_serial)
+                self.filters[filter_id] = {'criteria': params[0], 'seen': len(self.blocks)}
+                return filter_id
+            if method in ('eth_getFilterLogs', 'eth_getFilterChanges'):
+                installed = self.filters.get(params[0])
+                if installed is None:
+                    raise RpcError({'code': -32000, 'message': 'filter not found'})
+                criteria = dict(installed['criteria'])
+                if method == 'eth_getFilterChanges':
+                    criteria['fromBlock'] = to_hex(installed['seen'])
+                    installed['seen'] = len(self.blocks)
+                return self._logs(criteria)
+            if method == 'eth_uninstallFilter':
+                return self.filters.pop(params[0], None) is not None
+            if method == 'sim_stats':
+                return {'head': self.blocks[-1]['number'], 'banks': len(self.bank_ids),
+                        'installedFilters': len(self.filters), 'reorgs': self._forks}
+        raise RpcError({'code': -32601, 'message': f"Method {method} not supported"})
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            result = self.dispatch(request['method'], request.get('params') or [])
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+        except RpcError as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': e.error}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': -32603, 'message': str(e)}}
+
+    def serve(self, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+        """Answer JSON-RPC over HTTP and mine blocks, both on daemon threads"""
+        chain = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out as separate writes; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                response = [chain.handle(r) for r in body] if isinstance(body, list) else chain.handle(body)
+                payload = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._mine_forever, daemon=True).start()
+        return server
+
+    def _mine_forever(self):
+        while True:
+            time.sleep(self.block_time)
+            self.mine()
+
+def run(host: str, port: int, **kwargs):
+    """Serve a new simulated chain until the process is killed"""
+    SimulatedChain(**kwargs).serve(host, port)
+    threading.Event().wait()
@@ -0,0 +1,365 @@
+"""Soak test: drive a realistic API traffic mix against a simulated chain for hours.
+
+    python soak.py --duration 3600 --concurrency 16 --report soak-report.json
+
+The server runs in this process, so its memory, sockets and threads can be
+watched, against a simulated chain in a child process. MongoDB is taken from
+MONGO_URL as usual, with its own database. After a warm-up, RSS, traced
+memory, open sockets, threads, installed log filters and per-window p99
+latency are compared with their warm-up values, and the run fails when any
+grows or drifts past its threshold.
+"""
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import Process
+from pathlib import Path
+from dotenv import load_dotenv
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import threading
+import tracemalloc
+
+import typer
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(help="Soak test the Bank Manager backend against a simulated chain")
+
+SOAK_CONTRACT_ADDRESS = '0x9B6Bb00Ec24800C9Ccf4F3A1063df037Eb22C845'
+SOAK_CHAIN_ID = 31337
+
+# weight, path; {bank} and {query} are filled in per request
+TRAFFIC_MIX = [
+    (30, '/api/banks'),
+    (15, '/api/banks/{bank}'),
+    (15, '/api/banks/search?q={query}'),
+    (10, '/api/transfers/pending'),
+    (5, '/api/transfers/history'),
+    (8, '/api/banks/{bank}/transfers/history'),
+    (4, '/api/banks/{bank}/transfers/pending'),
+    (4, '/api/events?limit=50&order=desc'),
+    (3, '/api/events/BankApproved'),
+    (2, '/api/transfers/netting'),
+    (2, '/api/banks/requests/pending'),
+    (2, '/api/health'),
+]
+
+# Latest latencies kept per route for the report
+ROUTE_SAMPLES = 10000
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, read from /proc where available"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Peak rather than current outside Linux, still catches growth
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+def open_sockets() -> Optional[int]:
+    try:
+        fds = os.listdir('/proc/self/fd')
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            if os.readlink(f'/proc/self/fd/{fd}').startswith('socket:'):
+                count += 1
+        except OSError:
+            continue
+    return count
+
+def loop_tasks(loop: asyncio.AbstractEventLoop) -> Future:
+    """Count the tasks of a loop running in another thread, from that thread"""
+    future = Future()
+    loop.call_soon_threadsafe(lambda: future.set_result(len(asyncio.all_tasks(loop))))
+    return future
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+def median(values: List[float]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return percentile(values, 0.5)
+
+class SoakRun:
+    """Traffic, samples and the verdict of one soak run"""
+
+    def __init__(self, base_url: str, rpc_url: str, server_loop: asyncio.AbstractEventLoop,
+                 concurrency: int, sample_interval: float, seed: int):
+        self.base_url = base_url
+        self.server_loop = server_loop
+        self.rpc_url = rpc_url
+        self.concurrency = concurrency
+        self.sample_interval = sample_interval
+        self.random = random.Random(seed)
+        self.samples: List[Dict[str, Any]] = []
+        self.baseline_index: Optional[int] = None
+        self.baseline_snapshot = None
+        self.bank_ids: List[str] = []
+        self.queries: List[str] = []
+        self._latencies: List[float] = []
+        self._statuses: Dict[str, int] = {}
+        # Bounded, so the harness itself does not show up as growth
+        self._routes: Dict[str, Deque[float]] = {}
+
+    def _path(self) -> Tuple[str, str]:
+        weights, paths = zip(*TRAFFIC_MIX)
+        path = self.random.choices(paths, weights)[0]
+        template = path.split('?')[0]
+        if '{bank}' in path:
+            path = path.replace('{bank}', self.random.choice(self.bank_ids or ['BANK000001']))
+        if '{query}' in path:
+            path = path.replace('{query}', self.random.choice(self.queries or ['bank']))
+        return template, path
+
+    async def _client(self, client, stop_at: float, client_id: int):
+        headers = {'X-API-Key': f'soak-{client_id}'}
+        while time.monotonic() < stop_at:
+            template, path = self._path()
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                status = str(response.status_code)
+                if template == '/api/banks' and response.status_code == 200:
+                    banks = response.json()
+                    self.bank_ids = [b['uniqueId'] for b in banks]
+                    self.queries = sorted({b['bankName'].split()[0][:3] for b in banks})
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            self._latencies.append(elapsed)
+            self._routes.setdefault(template, deque(maxlen=ROUTE_SAMPLES)).append(elapsed)
+            self._statuses[status] = self._statuses.get(status, 0) + 1
+
+    async def _chain_stats(self, client) -> Dict[str, Any]:
+        try:
+            response = await client.post(self.rpc_url, json={'jsonrpc': '2.0', 'id': 1, 'method': 'sim_stats', 'params': []})
+            return response.json()['result']
+        except Exception:
+            return {}
+
+    async def _sample(self, client, started: float):
+        latencies, self._latencies = self._latencies, []
+        statuses, self._statuses = self._statuses, {}
+        chain = await self._chain_stats(client)
+        # The API's tasks, on its own loop, rather than the harness's
+        tasks = await asyncio.wrap_future(loop_tasks(self.server_loop))
+        self.samples.append({
+            'elapsed': round(time.monotonic() - started, 1),
+            'rss': rss_bytes(),
+            'traced': tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+            'sockets': open_sockets(),
+            'threads': threading.active_count(),
+            'tasks': tasks,
+            'installedFilters': chain.get('installedFilters'),
+            'head': chain.get('head'),
+            'requests': len(latencies),
+            'statuses': statuses,
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+        })
+
+    async def run(self, duration: float, warmup: float):
+        import httpx
+        started = time.monotonic()
+        stop_at = started + duration
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=30, limits=limits) as client:
+            clients = [asyncio.create_task(self._client(client, stop_at, i)) for i in range(self.concurrency)]
+            with typer.progressbar(length=int(duration), label="Soaking") as progress:
+                while time.monotonic() < stop_at:
+                    await asyncio.sleep(min(self.sample_interval, max(stop_at - time.monotonic(), 0)))
+                    await self._sample(client, started)
+                    if self.baseline_index is None and time.monotonic() - started >= warmup:
+                        self.baseline_index = len(self.samples) - 1
+                        if tracemalloc.is_tracing():
+                            self.baseline_snapshot = tracemalloc.take_snapshot()
+                    progress.update(int(self.samples[-1]['elapsed']) - progress.pos)
+            await asyncio.gather(*clients)
+
+    def top_allocators(self, limit: int = 15) -> List[Dict[str, Any]]:
+        """Source lines whose live allocations grew most since the warm-up"""
+        if self.baseline_snapshot is None:
+            return []
+        stats = tracemalloc.take_snapshot().compare_to(self.baseline_snapshot, 'lineno')
+        return [
+            {'location': str(stat.traceback), 'sizeDiff': stat.size_diff, 'countDiff': stat.count_diff, 'size': stat.size}
+            for stat in stats[:limit]
+        ]
+
+    def verdict(self, thresholds: Dict[str, float]) -> List[str]:
+        """Threshold violations between the warm-up and the end of the run"""
+        if self.baseline_index is None or len(self.samples) - self.baseline_index < 4:
+            return ["Run too short to compare against the warm-up; raise --duration or lower --warmup"]
+        measured = self.samples[self.baseline_index:]
+        quarter = max(len(measured) // 4, 1)
+        head, tail = measured[:quarter], measured[-quarter:]
+
+        failures = []
+
+        def growth(field: str) -> Optional[float]:
+            first, last = median([s[field] for s in head]), median([s[field] for s in tail])
+            return None if first is None or last is None else last - first
+
+        mb = 1024 * 1024
+        for field, limit, unit, scale in (
+            ('rss', thresholds['max_rss_growth_mb'], 'MB', mb),
+            ('traced', thresholds['max_traced_growth_mb'], 'MB', mb),
+            ('sockets', thresholds['max_socket_growth'], '', 1),
+            ('threads', thresholds['max_thread_growth'], '', 1),
+            ('tasks', thresholds['max_task_growth'], '', 1),
+            ('installedFilters', thresholds['max_filter_growth'], '', 1),
+        ):
+            grew = growth(field)
+            if grew is not None and grew / scale > limit:
+                failures.append(f"{field} grew by {grew / scale:.1f}{unit}, limit {limit}{unit}")
+
+        first_p99, last_p99 = median([s['p99'] for s in head]), median([s['p99'] for s in tail])
+        if first_p99 and last_p99 and last_p99 / first_p99 > thresholds['max_p99_drift']:
+            failures.append(f"p99 drifted from {first_p99 * 1000:.0f}ms to {last_p99 * 1000:.0f}ms, "
+                            f"limit x{thresholds['max_p99_drift']}")
+
+        total = sum(s['requests'] for s in measured)
+        errors = sum(n for s in measured for status, n in s['statuses'].items()
+                     if not status.isdigit() or int(status) >= 500)
+        if total and errors / total > thresholds['max_error_rate']:
+            failures.append(f"{errors} of {total} requests failed, limit {thresholds['max_error_rate']:.1%}")
+        return failures
+
+    def route_latencies(self) -> Dict[str, Dict[str, float]]:
+        return {
+            route: {'requests': len(values), 'p50': percentile(values, 0.5), 'p99': percentile(values, 0.99)}
+            for route, values in sorted(self._routes.items())
+        }
+
+def _serve_api(port: int):
+    import uvicorn
+    import server
+    config = uvicorn.Config(server.app, host='127.0.0.1', port=port, log_level='warning')
+    api = uvicorn.Server(config)
+    # Our own loop, so the harness can inspect it from its thread
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(api.serve(),), daemon=True)
+    thread.start()
+    while not api.started:
+        if not thread.is_alive():
+            raise typer.Exit(1)
+        time.sleep(0.1)
+    return api, thread, loop
+
+@app.command()
+def soak(
+    duration: float = typer.Option(3600, help="Seconds to run, warm-up included"),
+    warmup: float = typer.Option(300, help="Seconds before the baseline is taken"),
+    concurrency: int = typer.Option(16, help="Concurrent API clients"),
+    sample_interval: float = typer.Option(10, help="Seconds between samples"),
+    banks: int = typer.Option(50, help="Banks on the simulated chain at the start"),
+    block_time: float = typer.Option(2.0, help="Seconds between simulated blocks"),
+    reorg_rate: float = typer.Option(0.01, help="Chance that a block replaces the head"),
+    db_name: str = typer.Option('bank_manager_soak', help="MongoDB database for the run"),
+    trace_frames: int = typer.Option(1, help="Frames per tracemalloc traceback, 0 to disable"),
+    max_rss_growth_mb: float = typer.Option(64, help="Allowed RSS growth after warm-up"),
+    max_traced_growth_mb: float = typer.Option(32, help="Allowed traced memory growth after warm-up"),
+    max_socket_growth: float = typer.Option(8, help="Allowed growth in open sockets"),
+    max_thread_growth: float = typer.Option(4, help="Allowed growth in threads"),
+    max_task_growth: float = typer.Option(8, help="Allowed growth in asyncio tasks"),
+    max_filter_growth: float = typer.Option(0, help="Allowed growth in log filters left installed on the node"),
+    max_p99_drift: float = typer.Option(2.0, help="Allowed ratio of final to initial p99"),
+    max_error_rate: float = typer.Option(0.01, help="Allowed share of 5xx and failed requests"),
+    report: Path = typer.Option(Path('soak-report.json'), help="Where to write the JSON report"),
+    seed: int = typer.Option(0, help="Seed for the simulated chain and the traffic mix"),
+):
+    """Run the API against a simulated chain and fail on leaks or latency drift"""
+    from simulated_chain import run as run_chain
+
+    rpc_port, api_port = free_port(), free_port()
+    chain = Process(target=run_chain, args=('127.0.0.1', rpc_port), kwargs={
+        'contract_address': SOAK_CONTRACT_ADDRESS, 'chain_id': SOAK_CHAIN_ID, 'banks': banks,
+        'block_time': block_time, 'reorg_rate': reorg_rate, 'seed': seed
+    }, daemon=True)
+    chain.start()
+
+    rpc_url = f'http://127.0.0.1:{rpc_port}'
+    # A previous run's snapshot describes another chain
+    snapshot = report.with_suffix('.snapshot')
+    snapshot.unlink(missing_ok=True)
+    os.environ.update({
+        'DEPLOYMENTS': json.dumps([{'name': 'default', 'rpcUrl': rpc_url,
+                                    'contractAddress': SOAK_CONTRACT_ADDRESS, 'chainId': SOAK_CHAIN_ID}]),
+        'DB_NAME': db_name,
+        'STATE_SNAPSHOT_PATH': str(snapshot),
+        'HEAD_POLL_INTERVAL': str(block_time / 2),
+    })
+    # Neither quota applies to a local chain unless explicitly set for the run
+    os.environ.setdefault('RPC_RATE_LIMIT', '100000')
+    os.environ.setdefault('RPC_BURST', '100000')
+    os.environ.setdefault('RPC_DAILY_CREDITS', str(10 ** 12))
+    os.environ.setdefault('ADMISSION_CLIENT_RATE', '100000')
+    os.environ.setdefault('ADMISSION_CLIENT_BURST', '100000')
+    # Each client's key is its own admission bucket, as for real API clients
+    os.environ.setdefault('API_KEYS', ','.join(f'soak-{i}' for i in range(concurrency)))
+    import config.web3_config as web3_config
+    web3_config.DEPLOYMENTS[:] = web3_config.load_deployments()
+
+    if trace_frames > 0:
+        tracemalloc.start(trace_frames)
+    api, thread, server_loop = _serve_api(api_port)
+    run = SoakRun(f'http://127.0.0.1:{api_port}', rpc_url, server_loop, concurrency, sample_interval, seed)
+    try:
+        asyncio.run(run.run(duration, warmup))
+    finally:
+        api.should_exit = True
+        thread.join(timeout=30)
+        chain.kill()
+
+    failures = run.verdict({
+        'max_rss_growth_mb': max_rss_growth_mb, 'max_traced_growth_mb': max_traced_growth_mb,
+        'max_socket_growth': max_socket_growth, 'max_thread_growth': max_thread_growth,
+        'max_task_growth': max_task_growth, 'max_filter_growth': max_filter_growth,
+        'max_p99_drift': max_p99_drift, 'max_error_rate': max_error_rate,
+    })
+    report.write_text(json.dumps({
+        'duration': duration,
+        'warmup': warmup,
+        'concurrency': concurrency,
+        'failures': failures,
+        'routes': run.route_latencies(),
+        'topAllocators': run.top_allocators(),
+        'samples': run.samples,
+    }, indent=2, default=str))
+
+    requests = sum(s['requests'] for s in run.samples)
+    typer.echo(f"{requests} requests over {duration:.0f}s, report in {report}")
+    for failure in failures:
+        typer.echo(f"FAIL: {failure}")
+    if failures:
+        raise typer.Exit(1)
+    typer.echo("PASS")
+
+if __name__ == '__main__':
+    app()
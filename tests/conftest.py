@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+# The backend runs from its own directory and imports its modules top-level
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import pytest
+
+from simulated_chain import SimulatedChain
+from services.blockchain_service import BlockchainService
+from services.rate_limiter import RpcRateLimiter
+from services.reorg import BlockHashChain
+
+CONTRACT_ADDRESS = '0x9B6Bb00Ec24800C9Ccf4F3A1063df037Eb22C845'
+CHAIN_ID = 31337
+
+@pytest.fixture
+def chain():
+    # An hour between blocks, so only the test mines
+    chain = SimulatedChain(CONTRACT_ADDRESS, CHAIN_ID, banks=5, block_time=3600, seed=3)
+    server = chain.serve()
+    chain.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield chain
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def service(chain):
+    limiter = RpcRateLimiter(rate=1e6, burst=1e6, daily_credits=10 ** 12)
+    return BlockchainService('test', chain.url, CONTRACT_ADDRESS, CHAIN_ID, limiter=limiter)
+
+@pytest.fixture
+def block_chain(service):
+    return BlockHashChain(service)
+
+@pytest.fixture
+def mine(chain, block_chain):
+    def mine(blocks):
+        for _ in range(blocks):
+            chain.mine()
+        # Let the next read see the new head instead of the cached one
+        block_chain._checked_at = 0
+    return mine
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+from eth_abi import encode
+from eth_abi.grammar import parse, TupleType
+from eth_utils.abi import get_abi_input_types, get_abi_output_types
+from web3 import Web3
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError, Web3RPCError
+from web3.providers.base import BaseProvider
+
+from config.web3_config import CONTRACT_ABI, get_contract
+from services.abi_codec import CONTRACT_CODECS, raise_for_error
+
+CONTRACT_ADDRESS = '0x9B6Bb00Ec24800C9Ccf4F3A1063df037Eb22C845'
+VIEW_FUNCTIONS = {
+    item['name']: item for item in CONTRACT_ABI
+    if item['type'] == 'function' and item.get('stateMutability') in ('view', 'pure')
+}
+
+class ReplayProvider(BaseProvider):
+    """Answers every eth_call with a canned result and records its calldata"""
+
+    def __init__(self):
+        super().__init__()
+        self.result = '0x'
+        self.calldata = []
+
+    def make_request(self, method, params):
+        if method == 'eth_chainId':
+            return {'jsonrpc': '2.0', 'id': 0, 'result': hex(31337)}
+        self.calldata.append(params[0]['data'])
+        return {'jsonrpc': '2.0', 'id': 0, 'result': self.result}
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+def sample(abi_type, rng: random.Random):
+    """A random value of an ABI type, edge cases included"""
+    if abi_type.is_array:
+        item = abi_type.item_type
+        return [sample(item, rng) for _ in range(rng.choice([0, 1, 3]))]
+    if isinstance(abi_type, TupleType):
+        return tuple(sample(component, rng) for component in abi_type.components)
+    if abi_type.base == 'uint':
+        return rng.choice([0, 1, 2 ** abi_type.sub - 1, rng.getrandbits(abi_type.sub), rng.randint(0, 10 ** 6)])
+    if abi_type.base == 'string':
+        return ''.join(rng.choice('abcXYZ 09_-é€') for _ in range(rng.choice([0, 5, 40])))
+    if abi_type.base == 'bool':
+        return rng.random() < 0.5
+    if abi_type.base == 'address':
+        # Lowercase, so both decoders have to checksum it
+        return '0x' + bytes(rng.getrandbits(8) for _ in range(20)).hex()
+    raise ValueError(f"No sampler for {abi_type}")
+
+def plain(value):
+    """Lists and tuples alike as nested tuples, for comparing results"""
+    if isinstance(value, (list, tuple)):
+        return tuple(plain(v) for v in value)
+    return value
+
+@pytest.fixture
+def provider():
+    return ReplayProvider()
+
+@pytest.fixture
+def contract(provider):
+    return get_contract(Web3(provider), CONTRACT_ADDRESS)
+
+@pytest.mark.parametrize('name', sorted(VIEW_FUNCTIONS))
+def test_codec_matches_web3(name, provider, contract):
+    rng = random.Random(name)
+    abi = VIEW_FUNCTIONS[name]
+    input_types, output_types = get_abi_input_types(abi), get_abi_output_types(abi)
+    codec = CONTRACT_CODECS[name]
+
+    for _ in range(25):
+        args = [sample(parse(t), rng) for t in input_types]
+        provider.result = '0x' + encode(output_types, [sample(parse(t), rng) for t in output_types]).hex()
+
+        expected = getattr(contract.functions, name)(*args).call(block_identifier='latest')
+
+        assert codec.encode(*args) == provider.calldata[-1]
+        assert plain(codec.decode(provider.result)) == plain(expected)
+
+def test_empty_result_is_a_missing_contract():
+    with pytest.raises(BadFunctionCallOutput):
+        CONTRACT_CODECS['owner'].decode('0x')
+
+@pytest.mark.parametrize('error', [
+    {'code': 3, 'message': 'execution reverted: no such bank', 'data': '0x'},
+    {'code': -32000, 'message': 'VM Exception while processing transaction: revert'},
+])
+def test_reverts_raise_contract_logic_error(error):
+    with pytest.raises(ContractLogicError):
+        raise_for_error({'jsonrpc': '2.0', 'id': 0, 'error': error})
+
+@pytest.mark.parametrize('error', [{'code': -32005, 'message': 'limit exceeded'}, 'upstream unavailable'])
+def test_other_errors_raise_rpc_errors(error):
+    with pytest.raises(Web3RPCError) as raised:
+        raise_for_error({'jsonrpc': '2.0', 'id': 0, 'error': error})
+    assert not isinstance(raised.value, ContractLogicError)
+
+def test_results_without_error_pass():
+    raise_for_error({'jsonrpc': '2.0', 'id': 0, 'result': '0x'})
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from services import admission
+from services.admission import AdmissionController, Rejected, TokenBucket, retry_after_header
+
+def test_bucket_reports_how_long_until_the_cost_is_available():
+    bucket = TokenBucket(rate=10, burst=20)
+
+    assert bucket.take(15) == 0
+    wait = bucket.take(10)
+
+    assert wait == pytest.approx(0.5, abs=0.01)
+    assert bucket.take(500) > 0
+
+def test_clients_have_separate_buckets():
+    controller = AdmissionController(rate=1, burst=10)
+
+    async def run():
+        await controller.admit('a', '/api/banks')
+        await controller.admit('a', '/api/banks')
+        with pytest.raises(Rejected) as rejected:
+            await controller.admit('a', '/api/banks')
+        await controller.admit('b', '/api/banks')
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.retry_after == pytest.approx(5, abs=0.1)
+    assert controller.stats()['routes']['/api/banks']['throttled'] == 1
+
+def test_busy_route_queues_then_sheds_without_charging(monkeypatch):
+    monkeypatch.setattr(admission, 'ROUTE_POLICIES', {'/slow': (1, 1, 1)})
+    monkeypatch.setattr(admission, 'QUEUE_TIMEOUT', 0.1)
+    controller = AdmissionController(rate=0.001, burst=3)
+
+    async def run():
+        gate = await controller.admit('a', '/slow')
+        queued = asyncio.create_task(controller.admit('a', '/slow'))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected, match='Too many'):
+            await controller.admit('a', '/slow')
+        gate.leave()
+        (await queued).leave()
+        # The shed request was refunded, so the client can still afford one more
+        (await controller.admit('a', '/slow')).leave()
+
+    asyncio.run(run())
+    assert controller.stats()['routes']['/slow'] == {
+        'admitted': 3, 'throttled': 0, 'shed': 1, 'active': 0, 'waiting': 0
+    }
+
+def test_queued_request_gives_up_after_the_timeout(monkeypatch):
+    monkeypatch.setattr(admission, 'ROUTE_POLICIES', {'/slow': (1, 1, 4)})
+    monkeypatch.setattr(admission, 'QUEUE_TIMEOUT', 0.05)
+    controller = AdmissionController(rate=100, burst=100)
+
+    async def run():
+        await controller.admit('a', '/slow')
+        with pytest.raises(Rejected, match='Timed out'):
+            await controller.admit('b', '/slow')
+
+    asyncio.run(run())
+
+def test_retry_after_header_rounds_up_to_whole_seconds():
+    assert retry_after_header(0.2) == '1'
+    assert retry_after_header(2.01) == '3'
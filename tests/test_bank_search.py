@@ -0,0 +1,41 @@
+from services.bank_search import BankSearchIndex
+
+def bank(unique_id, name, currency, symbol, supply=0):
+    return {'uniqueId': unique_id, 'bankName': name, 'currencyName': currency, 'currencySymbol': symbol,
+            'mintedSupply': supply}
+
+BANKS = [
+    bank('BANK1', 'Union Bank', 'US Dollar', 'USD'),
+    bank('BANK2', 'Pacific Bank', 'Australian Dollar', 'AUD'),
+    bank('BANK3', 'Nordic Bank', 'US Treasury Coin', 'UST'),
+    bank('BANK4', 'Royal Bank', 'Pound Sterling', 'GBP'),
+]
+
+def ids(results):
+    return [found['uniqueId'] for _, found in results]
+
+def index(banks=BANKS):
+    search_index = BankSearchIndex()
+    search_index.update(banks, version=1.0)
+    return search_index
+
+def test_every_query_word_has_to_match():
+    assert ids(index().rank('us dollar')) == ['BANK1']
+    assert set(ids(index().rank('dollar'))) == {'BANK1', 'BANK2'}
+
+def test_exact_symbol_ranks_first():
+    assert ids(index().rank('usd'))[0] == 'BANK1'
+
+def test_typos_fall_back_to_trigrams_per_word():
+    assert ids(index().rank('untion dollar')) == ['BANK1']
+    assert ids(index().rank('nordic pound')) == []
+
+def test_new_snapshot_swaps_records_and_drops_removed_banks():
+    search_index = index()
+    renamed = [bank('BANK1', 'Union Bank', 'US Dollar', 'USD', supply=500), bank('BANK2', 'Harbour Bank', 'Australian Dollar', 'AUD')]
+
+    results = search_index.search('bank', renamed, missing=['BANK3'], version=2.0)
+
+    assert set(ids(results)) == {'BANK1', 'BANK2', 'BANK3'}
+    assert next(found for _, found in results if found['uniqueId'] == 'BANK1')['mintedSupply'] == 500
+    assert ids(search_index.rank('harbour')) == ['BANK2'] and ids(search_index.rank('pacific')) == []
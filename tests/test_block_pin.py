@@ -0,0 +1,48 @@
+from services.block_pin import BlockPin, pinned_blocks
+
+ORPHANED_HASH = '0x' + 'ab' * 32
+
+class Deployment:
+    def __init__(self, name='main', number=10):
+        self.name = name
+        self.number = number
+        self.latest_reads = 0
+
+    def get_block_header(self, block_identifier):
+        self.latest_reads += 1
+        return {'number': self.number, 'hash': f'{self.number:064x}'}
+
+def test_offered_head_is_used_without_reading_latest():
+    pin, service = BlockPin(), Deployment()
+    pin.offer(service, 9, ORPHANED_HASH[2:])
+
+    assert pin.resolve(service) == (9, ORPHANED_HASH)
+    assert pin.resolve(service) == (9, ORPHANED_HASH) and service.latest_reads == 0
+
+def test_withdrawn_offer_falls_back_to_latest():
+    pin, service = BlockPin(), Deployment()
+    pin.offer(service, 9, ORPHANED_HASH)
+    pin.resolve(service)
+
+    assert pin.withdraw(service)
+    assert pin.resolve(service) == (10, '0x' + f'{10:064x}') and service.latest_reads == 1
+    # Latest was read, not offered, so it is never withdrawn
+    assert not pin.withdraw(service)
+
+def test_confirmed_offer_and_explicit_pin_are_kept():
+    pin, offered, pinned = BlockPin(), Deployment('offered'), Deployment('pinned')
+    pin.offer(offered, 9, ORPHANED_HASH)
+    pin.pin(pinned, 8, ORPHANED_HASH)
+    pin.resolve(offered)
+    pin.confirm(offered)
+
+    assert not pin.withdraw(offered) and not pin.withdraw(pinned)
+    assert pin.numbers() == {'offered': 9, 'pinned': 8}
+
+def test_view_call_at_a_reorged_out_head_retries_at_latest(chain, service):
+    expected = service.get_bank_ids()
+
+    with pinned_blocks() as pin:
+        pin.offer(service, chain.blocks[-1]['number'] + 1, ORPHANED_HASH)
+        assert service.get_bank_ids() == expected
+        assert pin.numbers() == {service.name: chain.blocks[-1]['number']}
@@ -0,0 +1,61 @@
+import asyncio
+
+from services.block_watcher import (BlockWatcher, EventBus, NEW_HEAD, REORG, CONTRACT_EVENT,
+                                    next_messages)
+
+def test_slow_subscriber_loses_its_oldest_messages():
+    bus = EventBus(queue_size=2)
+
+    async def run():
+        heads, events = bus.subscribe(NEW_HEAD), bus.subscribe(NEW_HEAD, CONTRACT_EVENT)
+        for number in range(3):
+            bus.publish(NEW_HEAD, number)
+        bus.publish(REORG, 'unheard')
+        return await next_messages(heads, 0.01), await next_messages(events, 0.01), bus.subscribers()
+
+    heads, events, subscribers = asyncio.run(run())
+    assert heads == events == [(NEW_HEAD, 1), (NEW_HEAD, 2)]
+    assert subscribers == 2 and (bus.published, bus.dropped) == (4, 2)
+
+def test_without_a_queue_next_messages_just_waits():
+    assert asyncio.run(next_messages(None, 0.01)) == []
+
+async def collect(queue, until):
+    """Messages from `queue` until `until` holds for all of them so far"""
+    messages = []
+    while not until(messages):
+        messages.extend(await asyncio.wait_for(next_messages(queue, 0.05), 5))
+    return messages
+
+def head_reached(number, events=0):
+    return lambda messages: (
+        any(topic == NEW_HEAD and message['number'] == number for topic, message in messages)
+        and sum(topic == CONTRACT_EVENT for topic, _ in messages) == events
+    )
+
+def test_polling_publishes_new_heads_with_their_events_and_reorgs(chain, service, block_chain):
+    bus = EventBus()
+    watcher = BlockWatcher(service, block_chain, bus, poll_interval=0.01)
+    start = chain.blocks[-1]['number']
+
+    async def run():
+        queue = bus.subscribe(NEW_HEAD, REORG, CONTRACT_EVENT)
+        watcher.start()
+        # History before the first head is left to the event store
+        first, = await collect(queue, head_reached(start))
+        assert first[1]['hash'] == block_chain.block_hash(start)
+        assert watcher.mode == 'polling' and watcher.is_current()
+
+        for _ in range(3):
+            chain.mine()
+        await collect(queue, head_reached(start + 3, sum(len(block['logs']) for block in chain.blocks[start + 1:])))
+
+        # Replaces block start + 3, so its logs are published again with the new head's
+        chain.reorg_rate = 1.0
+        chain.mine()
+        reorged = await collect(queue, head_reached(start + 4, len(chain.blocks[-2]['logs']) + len(chain.blocks[-1]['logs'])))
+        await watcher.stop()
+        return [message for topic, message in reorged if topic == REORG]
+
+    assert asyncio.run(run()) == [{'forkBlock': start + 3, 'head': start + 4}]
+    assert watcher.mode is None and not watcher.is_current()
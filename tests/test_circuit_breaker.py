@@ -0,0 +1,87 @@
+import pytest
+
+from services import circuit_breaker
+from services.circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    return clock
+
+def tripped(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker('rpc', threshold=0.5, window=30, min_calls=4, cooldown=10)
+    for success in (True, False, True, False):
+        breaker.allow()
+        breaker.record(success)
+    return breaker
+
+def test_opens_once_enough_calls_fail(clock):
+    breaker = CircuitBreaker('rpc', threshold=0.5, window=30, min_calls=4, cooldown=10)
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == CLOSED
+
+    breaker.record(True)
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+def test_old_failures_leave_the_window(clock):
+    breaker = CircuitBreaker('rpc', threshold=0.5, window=30, min_calls=4, cooldown=10)
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 31
+
+    for _ in range(3):
+        breaker.record(True)
+    breaker.record(False)
+
+    assert breaker.state == CLOSED
+    assert breaker.stats() == {'state': CLOSED, 'calls': 4, 'failures': 1}
+
+def test_one_probe_after_the_cooldown_closes_it(clock):
+    breaker = tripped(clock)
+    clock.now += 10
+
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record(True)
+
+    assert breaker.state == CLOSED
+    breaker.allow()
+
+def test_failed_probe_reopens_it_for_another_cooldown(clock):
+    breaker = tripped(clock)
+    clock.now += 10
+    breaker.allow()
+
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    clock.now += 9
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    clock.now += 1
+    breaker.allow()
+
+def test_abandoned_probe_lets_another_through(clock):
+    breaker = tripped(clock)
+    clock.now += 10
+    breaker.allow()
+
+    breaker.abandon()
+
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
@@ -0,0 +1,47 @@
+import asyncio
+import socket
+
+import pytest
+
+from services.deployments import DeploymentSet
+from services.refresher import SnapshotRefresher
+
+CONTRACT_ADDRESS = '0x9B6Bb00Ec24800C9Ccf4F3A1063df037Eb22C845'
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def deployment_set(primary, *urls):
+    configs = [{'name': primary.name}] + [
+        {'name': f'mirror{i}', 'rpc_url': url, 'contract_address': CONTRACT_ADDRESS, 'chain_id': 31337}
+        for i, url in enumerate(urls, 1)
+    ]
+    deployments = DeploymentSet(primary, configs, SnapshotRefresher())
+    deployments.register('banks', lambda service: service.get_all_banks)
+    return deployments
+
+def test_gather_merges_deployments_and_reports_one_that_is_down(chain, service):
+    deployments = deployment_set(service, chain.url, closed_port_url())
+
+    merged = asyncio.run(deployments.gather('banks'))
+
+    assert list(merged['failures']) == ['mirror2']
+    by_deployment = {}
+    for record in merged['records']:
+        by_deployment.setdefault(record['deployment'], []).append(record['uniqueId'])
+    assert set(by_deployment) == {'test', 'mirror1'}
+    assert sorted(by_deployment['test']) == sorted(by_deployment['mirror1']) and len(by_deployment['test']) == 5
+    assert set(merged['blocks']) == {'test', 'mirror1'}
+    assert 'banks@mirror2' in deployments.refresher.datasets
+
+def test_gather_fails_when_every_deployment_is_down(service):
+    def down():
+        raise ConnectionError('down')
+
+    service.get_all_banks = down
+    deployments = deployment_set(service, closed_port_url())
+
+    with pytest.raises(RuntimeError, match='All deployments failed'):
+        asyncio.run(deployments.gather('banks'))
@@ -0,0 +1,59 @@
+import pytest
+
+from services import event_cache as event_cache_module
+from services.event_cache import EventCache
+
+class FakeChain:
+    def __init__(self, head, depth=12):
+        self.head = head
+        self.depth = depth
+
+    def on_reorg(self, listener):
+        self.listener = listener
+
+    def advance(self):
+        return self.head
+
+    @property
+    def safe_block(self):
+        return self.head - self.depth
+
+class FakeService:
+    """Serves one event every 1000 blocks and records the ranges asked for"""
+
+    def __init__(self, fail_from=None):
+        self.ranges = []
+        self.fail_from = fail_from
+
+    def get_events(self, event_names, from_block, to_block):
+        if self.fail_from is not None and from_block >= self.fail_from:
+            raise RuntimeError('upstream down')
+        self.ranges.append((from_block, to_block))
+        return [{'event': event_names[0], 'blockNumber': block}
+                for block in range(from_block, to_block + 1) if block % 1000 == 0]
+
+@pytest.fixture(autouse=True)
+def chunk_size(monkeypatch):
+    monkeypatch.setattr(event_cache_module, 'CHUNK_SIZE', 4000)
+
+def test_cold_cache_reads_final_events_in_windows():
+    service = FakeService()
+    cache = EventCache(service, FakeChain(10012))
+
+    events = cache.get_events('BankApproved')
+
+    assert service.ranges == [(0, 3999), (4000, 7999), (8000, 10000), (10001, 10012)]
+    assert [event['blockNumber'] for event in events] == list(range(0, 10001, 1000))
+
+def test_failed_window_keeps_the_windows_already_read():
+    service = FakeService(fail_from=8000)
+    cache = EventCache(service, FakeChain(10012))
+
+    with pytest.raises(RuntimeError):
+        cache.get_events('BankApproved')
+    service.fail_from = None
+    service.ranges.clear()
+    events = cache.get_events('BankApproved', from_block=2500)
+
+    assert service.ranges[0] == (8000, 10000)
+    assert [event['blockNumber'] for event in events] == list(range(3000, 10001, 1000))
@@ -0,0 +1,75 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+from services.event_store import EventStore
+
+def transfer_event(block, from_bank, to_bank, amount=2 ** 100):
+    return {
+        'event': 'PendingBankTransfer', 'blockNumber': block, 'logIndex': 0, 'transactionHash': f'0x{block:064x}',
+        'args': {'transferId': f'TX{block}', 'fromBankId': from_bank, 'toBankId': to_bank, 'amount': amount}
+    }
+
+class FakeChain:
+    def __init__(self, head):
+        self.head = head
+        self.safe_block = head - 12
+
+    def on_reorg(self, listener):
+        self.listener = listener
+
+    def advance(self):
+        return self.head
+
+    def block_hash(self, number):
+        return f'h{number}'
+
+class FakeService:
+    """One transfer per block, alternating between two bank pairs"""
+
+    def get_events(self, event_names, from_block, to_block):
+        return [transfer_event(block, *(('A', 'B') if block % 2 else ('C', 'A'))) for block in range(from_block, to_block + 1)]
+
+    def get_block_header(self, number):
+        return {'number': number, 'timestamp': 1_700_000_000 + number}
+
+def synced_store(head=10):
+    chain = FakeChain(head)
+    store = EventStore(AsyncMongoMockClient()['test'], FakeService(), chain)
+    asyncio.run(store.sync())
+    return store, chain
+
+def test_query_filters_by_bank_in_any_role_and_pages():
+    store, _ = synced_store()
+
+    async def run():
+        first = await store.query(bank_id='B', limit=2, order='desc')
+        second = await store.query(bank_id='B', limit=2, skip=4, order='desc')
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [e['blockNumber'] for e in first['events']] == [9, 7] and first['hasMore']
+    assert [e['blockNumber'] for e in second['events']] == [1] and not second['hasMore']
+    assert first['events'][0]['args']['amount'] == 2 ** 100
+
+def test_reorg_deletes_events_from_the_fork_and_refetches_them():
+    store, chain = synced_store()
+    chain.listener(6)
+
+    async def run():
+        await store.events.update_many({'blockNumber': {'$gte': 6}}, {'$set': {'args.toBankId': 'ORPHAN'}})
+        await store.sync()
+        return await store.query(bank_id='ORPHAN'), await store.state.find_one({'_id': 'events'})
+
+    orphaned, state = asyncio.run(run())
+    assert orphaned['events'] == []
+    assert (state['lastBlock'], state['forkBlock'], state['reorgs']) == (10, 6, 1)
+
+def test_events_endpoint_rejects_a_negative_skip_and_unknown_order():
+    import server
+
+    client = TestClient(server.app)
+
+    assert client.get('/api/events', params={'skip': -1}).status_code == 422
+    assert client.get('/api/events', params={'order': 'sideways'}).status_code == 422
@@ -0,0 +1,55 @@
+import random
+
+from services.netting import net_positions, settle, compute_netting
+
+def transfer(from_bank, to_bank, amount, currency='Dollar'):
+    return {'fromBankId': from_bank, 'toBankId': to_bank, 'amount': amount, 'currencyName': currency}
+
+def apply(positions, settlements):
+    remaining = dict(positions)
+    for payment in settlements:
+        remaining[payment['fromBankId']] += payment['amount']
+        remaining[payment['toBankId']] -= payment['amount']
+    return remaining
+
+def test_cycle_nets_to_nothing():
+    transfers = [transfer('A', 'B', 50), transfer('B', 'C', 50), transfer('C', 'A', 50)]
+
+    assert net_positions(transfers) == {}
+    assert settle({}) == []
+
+def test_equal_debtor_and_creditor_pay_each_other_directly():
+    settlements = settle({'A': -30, 'B': 30, 'C': -70, 'D': 70})
+
+    assert sorted((p['fromBankId'], p['toBankId'], p['amount']) for p in settlements) == [
+        ('A', 'B', 30), ('C', 'D', 70)
+    ]
+
+def test_settlement_clears_every_position_with_minimal_volume():
+    rng = random.Random(7)
+    banks = [f'BANK{i:02d}' for i in range(12)]
+    transfers = [transfer(*rng.sample(banks, 2), rng.randint(1, 1000)) for _ in range(200)]
+    positions = net_positions(transfers)
+
+    settlements = settle(positions)
+
+    assert all(amount == 0 for amount in apply(positions, settlements).values())
+    assert all(payment['amount'] > 0 for payment in settlements)
+    assert len(settlements) <= len(positions) - 1
+    assert sum(p['amount'] for p in settlements) == sum(a for a in positions.values() if a > 0)
+
+def test_netting_is_per_currency():
+    transfers = [transfer('A', 'B', 10, 'Dollar'), transfer('B', 'A', 10, 'Euro')]
+
+    result = compute_netting(transfers, gas_per_approval=1000)
+
+    settlements = [(p['fromBankId'], p['toBankId'], p['amount']) for c in result['currencies'] for p in c['settlements']]
+    assert sorted(settlements) == [('A', 'B', 10), ('B', 'A', 10)]
+
+def test_cycle_saves_every_approval():
+    transfers = [transfer('A', 'B', 50), transfer('B', 'C', 50), transfer('C', 'A', 50)]
+
+    result = compute_netting(transfers, gas_per_approval=1000)
+
+    assert result['approvalsAfter'] == 0
+    assert result['gasSaved'] == 3000
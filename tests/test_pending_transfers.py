@@ -0,0 +1,70 @@
+import threading
+import time
+
+from services.pending_transfers import PendingTransferTracker
+
+def open_transfers(chain, bank_id):
+    return {row[0] for row in chain.pending_transfers[bank_id] if not row[6]}
+
+def test_pending_transfers_follow_the_chain(chain, service, block_chain, mine):
+    tracker = PendingTransferTracker(service, block_chain, reconcile_interval=10 ** 9)
+    mine(50)
+
+    for _ in range(30):
+        mine(3)
+
+        every = tracker.get_all_pending_transfers()
+
+        assert {t['transferId'] for t in every} == set().union(*(open_transfers(chain, b) for b in chain.bank_ids))
+        for bank_id in chain.bank_ids:
+            assert {t['transferId'] for t in tracker.get_pending_transfers(bank_id)} == open_transfers(chain, bank_id)
+
+def test_failed_reconcile_keeps_the_last_rows(chain, service, block_chain, mine, monkeypatch):
+    tracker = PendingTransferTracker(service, block_chain, reconcile_interval=10 ** 9)
+    mine(50)
+    tracker.get_all_pending_transfers()
+    failing = chain.bank_ids[1]
+    before = {t['transferId'] for t in tracker.get_pending_transfers(failing)}
+    read_pending = service.get_pending_transfers
+
+    def get_pending_transfers(bank_id):
+        if bank_id == failing:
+            raise RuntimeError('upstream down')
+        return read_pending(bank_id)
+
+    monkeypatch.setattr(service, 'get_pending_transfers', get_pending_transfers)
+    tracker.reconcile()
+
+    assert tracker.get_all_pending_transfers().stale == [failing]
+    assert {t['transferId'] for t in tracker.get_pending_transfers(failing)} == before
+
+    monkeypatch.setattr(service, 'get_pending_transfers', read_pending)
+    mine(2)
+
+    assert tracker.get_all_pending_transfers().stale == []
+
+def test_bank_reads_do_not_wait_for_a_running_refresh(chain, service, block_chain, mine, monkeypatch):
+    tracker = PendingTransferTracker(service, block_chain, reconcile_interval=10 ** 9)
+    mine(50)
+    tracker.get_all_pending_transfers()
+    bank_id = chain.bank_ids[0]
+    before = {t['transferId'] for t in tracker.get_pending_transfers(bank_id)}
+    reading, release = threading.Event(), threading.Event()
+    read_bank_ids = service.get_bank_ids
+
+    def get_bank_ids(start=0):
+        reading.set()
+        release.wait(5)
+        return read_bank_ids(start)
+
+    monkeypatch.setattr(service, 'get_bank_ids', get_bank_ids)
+    running = threading.Thread(target=tracker.reconcile)
+    running.start()
+    reading.wait(5)
+
+    started = time.monotonic()
+    assert {t['transferId'] for t in tracker.get_pending_transfers(bank_id)} == before
+    assert time.monotonic() - started < 1
+
+    release.set()
+    running.join()
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from services import profiler as profiler_module
+from services.profiler import ProfilerBusy, SamplingProfiler
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_profile_samples_busy_threads_by_name():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name='spinner')
+    worker.start()
+    try:
+        profile = SamplingProfiler(interval=0.002).run(0.1)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profile.samples > 0 and profile.duration >= 0.1
+    spinner = [stack for stack in profile.stacks if stack.startswith('spinner;')]
+    assert spinner and all('spin (tests/test_profiler.py' in stack for stack in spinner)
+    assert not any(stack.startswith('profiler;') for stack in profile.stacks)
+
+def test_idle_threads_are_skipped_unless_requested():
+    stop = threading.Event()
+    worker = threading.Thread(target=stop.wait, name='parked')
+    worker.start()
+    try:
+        profiler = SamplingProfiler(interval=0.002)
+        quiet = profiler.run(0.05)
+        everything = profiler.run(0.05, include_idle=True)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert not any(stack.startswith('parked;') for stack in quiet.stacks)
+    assert any(stack.startswith('parked;') for stack in everything.stacks)
+
+def test_only_one_profile_runs_at_a_time():
+    profiler = SamplingProfiler(interval=0.002)
+    first = profiler.start()
+    with pytest.raises(ProfilerBusy):
+        profiler.start()
+    assert profiler.stop() is first
+    second = profiler.start()
+    profiler.stop()
+    assert profiler.get(first.id) is first and profiler.get(second.id) is second
+
+def test_memory_profile_reports_allocations_and_stops_tracing():
+    import tracemalloc
+
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start(memory=True)
+    kept = [bytearray(1000) for _ in range(100)]
+    profile = profiler.stop()
+
+    assert profile.allocations and {'location', 'size', 'count'} <= set(profile.allocations[0])
+    assert not tracemalloc.is_tracing()
+    del kept
+
+def test_exports_agree_on_the_sample_counts():
+    profile = profiler_module.Profile('p', interval=0.01)
+    profile.stacks.update({'main;a;b': 3, 'main;a': 1})
+    profile.duration = 0.04
+
+    assert profile.collapsed() == 'main;a;b 3\nmain;a 1'
+    exported = profile.speedscope()
+    names = [frame['name'] for frame in exported['shared']['frames']]
+    assert names == ['main', 'a', 'b']
+    assert exported['profiles'][0]['samples'] == [[0, 1, 2], [0, 1]]
+    assert exported['profiles'][0]['weights'] == [0.03, 0.01]
+
+def test_old_profiles_are_evicted(monkeypatch):
+    monkeypatch.setattr(profiler_module, 'MAX_KEPT', 2)
+    profiler = SamplingProfiler(interval=0.002)
+    ids = []
+    for _ in range(3):
+        profiler.start()
+        ids.append(profiler.stop().id)
+
+    assert profiler.get(ids[0]) is None and profiler.get(ids[2]) is not None
@@ -0,0 +1,80 @@
+import time
+import threading
+
+import pytest
+import requests
+
+from services.rate_limiter import (
+    RpcRateLimiter, RpcBudgetExhausted, retry_after_seconds, INTERACTIVE, BACKGROUND, BACKFILL
+)
+
+def test_burst_is_free_and_then_calls_are_paced():
+    limiter = RpcRateLimiter(rate=50, burst=3, daily_credits=10 ** 6)
+
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire(80)
+    burst = time.monotonic() - started
+    for _ in range(5):
+        limiter.acquire(80)
+    paced = time.monotonic() - started - burst
+
+    assert burst < 0.05
+    assert paced >= 5 / 50 * 0.9
+    assert limiter.stats()['creditsUsed'] == 8 * 80
+
+def test_background_calls_stop_at_the_interactive_reserve():
+    limiter = RpcRateLimiter(rate=1000, burst=1000, daily_credits=1000, background_reserve=0.2)
+
+    for _ in range(10):
+        limiter.acquire(80, BACKGROUND)
+    with pytest.raises(RpcBudgetExhausted):
+        limiter.acquire(80, BACKFILL)
+    limiter.acquire(80, INTERACTIVE)
+
+    assert limiter.remaining_credits() == 1000 - 11 * 80
+    assert limiter.stats()['rejectedCalls'] == 1
+
+def test_interactive_waiters_are_served_before_background_ones():
+    limiter = RpcRateLimiter(rate=1000, burst=1, daily_credits=10 ** 6)
+    limiter.acquire(1)
+    limiter.pause(0.2)
+    served = []
+
+    def call(level, name):
+        limiter.acquire(1, level)
+        served.append(name)
+
+    threads = [threading.Thread(target=call, args=(BACKFILL, 'backfill')),
+               threading.Thread(target=call, args=(BACKGROUND, 'background')),
+               threading.Thread(target=call, args=(INTERACTIVE, 'interactive'))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert served == ['interactive', 'background', 'backfill']
+
+def test_pause_holds_every_caller():
+    limiter = RpcRateLimiter(rate=1000, burst=10, daily_credits=10 ** 6)
+
+    limiter.pause(0.1)
+    started = time.monotonic()
+    limiter.acquire(1)
+
+    assert time.monotonic() - started >= 0.09
+    assert limiter.stats()['throttledResponses'] == 1
+
+def retry_after(value):
+    response = requests.Response()
+    if value is not None:
+        response.headers['Retry-After'] = value
+    return response
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert retry_after_seconds(retry_after('7')) == 7
+    assert retry_after_seconds(retry_after('Wed, 21 Oct 2015 07:28:00 GMT')) == 0
+    assert retry_after_seconds(retry_after('soon'), default=3) == 3
+    assert retry_after_seconds(retry_after(None), default=2) == 2
+    assert retry_after_seconds(None, default=2) == 2
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+from services.refresher import SnapshotRefresher
+
+def test_stale_snapshot_is_served_while_a_reload_runs():
+    refresher = SnapshotRefresher()
+    versions = iter(['first', 'second'])
+    loading, release = threading.Event(), threading.Event()
+
+    def load():
+        value = next(versions)
+        if value == 'second':
+            loading.set()
+            release.wait(5)
+        return value
+
+    refresher.register('banks', load, interval=10, max_stale=60)
+
+    async def run():
+        assert (await refresher.get('banks'))[0] == 'first'
+        refresher.datasets['banks'].fetched_at = time.time() - 30
+
+        value, age = await refresher.get('banks')
+        assert (value, round(age)) == ('first', 30)
+        await asyncio.to_thread(loading.wait, 5)
+        # Still in flight, so callers keep getting the old snapshot at once
+        assert (await refresher.get('banks'))[0] == 'first'
+
+        release.set()
+        await refresher.datasets['banks'].inflight
+        value, age = await refresher.get('banks')
+        assert value == 'second' and age < 1
+
+    asyncio.run(run())
+
+def test_snapshot_past_its_limit_waits_for_fresh_data():
+    refresher = SnapshotRefresher()
+    versions = iter(['first', 'second'])
+    refresher.register('banks', lambda: next(versions), interval=10, max_stale=60)
+
+    async def run():
+        await refresher.get('banks')
+        refresher.datasets['banks'].fetched_at = time.time() - 90
+        return await refresher.get('banks')
+
+    value, age = asyncio.run(run())
+    assert value == 'second' and age < 1
+
+def test_reload_failure_keeps_the_last_good_snapshot():
+    refresher = SnapshotRefresher()
+    calls = []
+
+    def load():
+        calls.append(None)
+        if len(calls) > 1:
+            raise RuntimeError('upstream down')
+        return 'first'
+
+    refresher.register('banks', load, interval=10, max_stale=60)
+
+    async def run():
+        await refresher.get('banks')
+        refresher.datasets['banks'].fetched_at = time.time() - 90
+        return await refresher.get('banks')
+
+    value, age = asyncio.run(run())
+    assert value == 'first' and age > 60
@@ -0,0 +1,77 @@
+import pytest
+
+from services.reorg import BlockHashChain
+
+def header(number, fork='', parent_fork=None):
+    parent_fork = fork if parent_fork is None else parent_fork
+    return {'number': number, 'hash': f'h{number}{fork}', 'parentHash': f'h{number - 1}{parent_fork}'}
+
+class FakeService:
+    """Serves headers of one canonical chain, switchable to a fork"""
+
+    def __init__(self, head):
+        self.blocks = {n: header(n) for n in range(head + 1)}
+        self.head = head
+        self.requested = []
+
+    def get_block_header(self, block_identifier):
+        self.requested.append(block_identifier)
+        return self.blocks[self.head if block_identifier == 'latest' else block_identifier]
+
+    def fork(self, from_block, head, tag='x'):
+        for n in range(from_block, head + 1):
+            self.blocks[n] = header(n, tag, tag if n > from_block else '')
+        self.head = head
+
+@pytest.fixture
+def service():
+    return FakeService(10)
+
+@pytest.fixture
+def chain(service):
+    chain = BlockHashChain(service, depth=3)
+    for n in range(11):
+        assert chain.observe(service.blocks[n]) is None
+    return chain
+
+def test_linked_heads_are_not_reorgs(chain):
+    assert chain.observe(header(11)) is None
+    assert chain.head == 11
+    assert chain.safe_block == 8
+
+def test_replaced_head_forks_at_its_number(chain):
+    assert chain.observe(header(10, 'x', '')) == 10
+    assert chain.block_hash(10) == 'h10x'
+
+def test_deeper_fork_walks_back_to_the_common_ancestor(service, chain):
+    service.fork(8, 11)
+
+    assert chain.observe(service.blocks[11]) == 8
+    assert [chain.block_hash(n) for n in (7, 8, 9, 10, 11)] == ['h7', 'h8x', 'h9x', 'h10x', 'h11x']
+
+def test_lagging_head_that_still_links_is_ignored(service, chain):
+    assert chain.observe(header(7)) is None
+    assert chain.head == 10
+    assert service.requested == []
+
+def test_unknown_lower_head_drops_the_blocks_above_it(chain):
+    assert chain.observe(header(8, 'y', '')) == 8
+    assert chain.head == 8
+    assert chain.block_hash(9) is None
+
+def test_gap_between_polls_is_filled_from_the_node(service, chain):
+    service.head = 14
+    for n in range(11, 15):
+        service.blocks[n] = header(n)
+
+    assert chain.observe(service.blocks[14]) is None
+    assert sorted(service.requested) == [11, 12, 13]
+    assert chain.block_hash(12) == 'h12'
+
+def test_advance_notifies_listeners_of_the_fork(service, chain):
+    forks = []
+    chain.on_reorg(forks.append)
+    service.fork(9, 10)
+
+    assert chain.advance(max_age=0) == 10
+    assert forks == [9]
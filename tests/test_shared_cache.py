@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from services.shared_cache import LeaderElection, MongoSharedCache
+
+def elections(db, *holders):
+    result = []
+    for holder in holders:
+        election = LeaderElection(db, 'indexer', lease_seconds=15)
+        election.holder = holder
+        result.append(election)
+    return result
+
+def test_only_one_worker_leads_at_a_time():
+    db = AsyncMongoMockClient()['test']
+    a, b = elections(db, 'a', 'b')
+
+    async def run():
+        return [await a.try_acquire(), await b.try_acquire(), await a.try_acquire(), await b.try_acquire()]
+
+    assert asyncio.run(run()) == [True, False, True, False]
+    assert (a.is_leader, b.is_leader) == (True, False)
+
+def test_lease_fails_over_once_expired():
+    db = AsyncMongoMockClient()['test']
+    a, b = elections(db, 'a', 'b')
+
+    async def run():
+        await a.try_acquire()
+        await db.leases.update_one({'_id': 'indexer'}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+        took_over = await b.try_acquire()
+        return took_over, await a.try_acquire()
+
+    assert asyncio.run(run()) == (True, False)
+    assert (a.is_leader, b.is_leader) == (False, True)
+
+def test_stopping_hands_the_lease_over():
+    db = AsyncMongoMockClient()['test']
+    a, b = elections(db, 'a', 'b')
+
+    async def run():
+        await a.try_acquire()
+        await a.stop()
+        return await b.try_acquire()
+
+    assert asyncio.run(run()) is True
+
+def test_shared_values_keep_big_integers():
+    cache = MongoSharedCache(AsyncMongoMockClient()['test'])
+
+    async def run():
+        await cache.set('banks', [{'supply': 2 ** 200}], 1000.0, {'missing': ['BANK1']})
+        return await cache.get('banks')
+
+    assert asyncio.run(run()) == ([{'supply': 2 ** 200}], 1000.0, {'missing': ['BANK1']})
@@ -0,0 +1,76 @@
+import pytest
+
+from services.reorg import BlockHashChain
+from services.snapshot import StateSnapshot
+
+CONTRACT = '0x9B6Bb00Ec24800C9Ccf4F3A1063df037Eb22C845'
+OTHER_CONTRACT = '0x' + '11' * 20
+
+def header(number, fork=0):
+    return {'number': number, 'hash': f'0x{fork:032x}{number:032x}', 'parentHash': f'0x{0:032x}{number - 1:032x}'}
+
+class FakeService:
+    def __init__(self, head):
+        self.blocks = {n: header(n) for n in range(head + 1)}
+
+    def get_block_header(self, block_identifier):
+        return self.blocks[max(self.blocks) if block_identifier == 'latest' else block_identifier]
+
+class Component:
+    def __init__(self, state=None):
+        self.state = state
+
+    def export_state(self):
+        return self.state
+
+    def restore_state(self, state):
+        self.state = state
+
+@pytest.fixture
+def service():
+    return FakeService(20)
+
+@pytest.fixture
+def saved(service, tmp_path):
+    chain = BlockHashChain(service, depth=5)
+    chain.advance()
+    StateSnapshot(chain, CONTRACT, {'transfers': Component({'cursor': 7})}, tmp_path / 'state.snapshot').save()
+    return tmp_path / 'state.snapshot'
+
+def restore(service, path, contract=CONTRACT):
+    chain = BlockHashChain(service, depth=5)
+    forks = []
+    chain.on_reorg(forks.append)
+    component = Component()
+    loaded = StateSnapshot(chain, contract, {'transfers': component}, path).load()
+    return loaded, component.state, chain, forks
+
+def test_snapshot_restores_every_component(service, saved):
+    loaded, state, chain, forks = restore(service, saved)
+
+    assert loaded and state == {'cursor': 7}
+    assert chain.head == 20 and chain.block_hash(20) == header(20)['hash']
+    assert forks == []
+
+def test_corrupt_snapshot_is_ignored(service, saved):
+    data = bytearray(saved.read_bytes())
+    data[-1] ^= 0xff
+    saved.write_bytes(bytes(data))
+
+    assert restore(service, saved)[:2] == (False, None)
+
+def test_truncated_snapshot_is_ignored(service, saved):
+    saved.write_bytes(saved.read_bytes()[:40])
+
+    assert restore(service, saved)[:2] == (False, None)
+
+def test_snapshot_of_another_contract_is_ignored(service, saved):
+    assert restore(service, saved, OTHER_CONTRACT)[:2] == (False, None)
+
+def test_reorged_checkpoint_rolls_back_above_the_safe_block(service, saved):
+    service.blocks[20] = header(20, fork=1)
+
+    loaded, state, chain, forks = restore(service, saved)
+
+    assert loaded and state == {'cursor': 7}
+    assert forks == [16]
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+
+from services.status_buffer import StatusWriteBuffer
+
+class FakeCollection:
+    """Records each insert_many batch, failing while `error` is set"""
+
+    def __init__(self, index_errors=()):
+        self.batches = []
+        self.error = None
+        self.index_errors = list(index_errors)
+        self.indexes = []
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        self.batches.append([doc['n'] for doc in docs])
+
+    async def create_index(self, keys, **kwargs):
+        if self.index_errors:
+            raise self.index_errors.pop(0)
+        self.indexes.append(keys)
+
+def docs(*numbers):
+    return [{'n': n} for n in numbers]
+
+def test_buffered_writes_flush_once_the_batch_is_full():
+    collection = FakeCollection()
+    buffer = StatusWriteBuffer(collection, flush_size=3, flush_interval=60, durability='buffered')
+
+    async def run():
+        await buffer.add(docs(1, 2))
+        await asyncio.sleep(0.01)
+        assert collection.batches == []
+        await buffer.add(docs(3))
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert collection.batches == [[1, 2, 3]]
+
+def test_buffered_writes_flush_on_the_interval_and_retry_failures():
+    collection = FakeCollection()
+    buffer = StatusWriteBuffer(collection, flush_size=100, flush_interval=0.02, durability='buffered')
+
+    async def run():
+        buffer.start()
+        collection.error = ServerSelectionTimeoutError('down')
+        await buffer.add(docs(1, 2))
+        await asyncio.sleep(0.05)
+        assert collection.batches == []
+        collection.error = None
+        await asyncio.sleep(0.05)
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert collection.batches == [[1, 2]]
+
+def test_acknowledged_callers_wait_for_their_write_and_share_batches():
+    collection = FakeCollection()
+    buffer = StatusWriteBuffer(collection, flush_size=100, flush_interval=60, durability='acknowledged')
+
+    async def run():
+        await asyncio.gather(buffer.add(docs(1)), buffer.add(docs(2)), buffer.add(docs(3)))
+        # Each caller returned only once its document was written
+        assert sorted(n for batch in collection.batches for n in batch) == [1, 2, 3]
+        collection.error = ServerSelectionTimeoutError('down')
+        with pytest.raises(ServerSelectionTimeoutError):
+            await buffer.add(docs(4))
+
+    asyncio.run(run())
+    assert len(collection.batches) < 3
+
+def test_index_creation_is_retried_without_blocking_writes():
+    collection = FakeCollection(index_errors=[ServerSelectionTimeoutError('down')])
+    buffer = StatusWriteBuffer(collection, flush_size=100, flush_interval=0.02, durability='buffered')
+
+    async def run():
+        buffer.start()
+        await buffer.add(docs(1))
+        await asyncio.sleep(0.1)
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert collection.batches == [[1]]
+    assert len(collection.indexes) == 2
+
+def test_conflicting_index_is_not_retried():
+    collection = FakeCollection(index_errors=[OperationFailure('conflict', code=85)] * 5)
+    buffer = StatusWriteBuffer(collection, flush_size=100, flush_interval=0.02, durability='buffered')
+
+    async def run():
+        buffer.start()
+        await asyncio.sleep(0.1)
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert len(collection.index_errors) == 4
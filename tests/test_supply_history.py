@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from services import supply_history
+from services.supply_history import SupplySampler
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def bank(bank_id, minted, available=0):
+    return {'uniqueId': bank_id, 'mintedSupply': minted, 'availableSupply': available,
+            'normalCurrencyBalance': 0, 'foreignCurrencyBalance': 0}
+
+class FakeChain:
+    def __init__(self, head):
+        self.head = head
+
+    def advance(self):
+        return self.head
+
+class FakeService:
+    def __init__(self, events=()):
+        self.events = list(events)
+        self.sampled = []
+
+    def get_bank_ids(self):
+        return ['BANK1', 'BANK2', 'BANK3']
+
+    def get_events(self, event_names, from_block, to_block):
+        return self.events
+
+    def get_block_header(self, number):
+        return {'number': number, 'timestamp': int(START.timestamp())}
+
+    def get_bank_details(self, bank_id):
+        self.sampled.append(bank_id)
+        return bank(bank_id, 1)
+
+def sampler(service=None, head=100):
+    return SupplySampler(AsyncMongoMockClient()['test'], service or FakeService(), FakeChain(head))
+
+def test_rollups_keep_last_min_and_max_of_uint256_amounts():
+    supply = sampler()
+
+    async def run():
+        for minutes, minted in enumerate([5, 2 ** 255, 7]):
+            await supply.record([bank('BANK1', minted)], 100 + minutes, START + timedelta(minutes=minutes))
+        return await supply.query('BANK1', START, START + timedelta(minutes=5), resolution='1h')
+
+    point, = asyncio.run(run())['points']
+    assert (point['mintedSupply'], point['mintedSupplyMin'], point['mintedSupplyMax']) == (7, 5, 2 ** 255)
+    assert (point['count'], point['blockNumber']) == (3, 102)
+
+def test_crowded_raw_window_keeps_its_newest_points(monkeypatch):
+    monkeypatch.setattr(supply_history, 'MAX_POINTS', 3)
+    supply = sampler()
+
+    async def run():
+        for minutes in range(5):
+            await supply.record([bank('BANK1', minutes)], 100 + minutes, START + timedelta(minutes=minutes))
+        return await supply.query('BANK1', START, START + timedelta(minutes=10), resolution='raw')
+
+    points = asyncio.run(run())['points']
+    assert [p['mintedSupply'] for p in points] == [2, 3, 4]
+
+def test_only_banks_named_in_events_are_sampled_between_full_samples():
+    service = FakeService([
+        {'event': 'CoinsMinted', 'args': {'bankId': 'BANK1', 'amount': 5}},
+        {'event': 'BankTransferApproved', 'args': {'transferId': 'TX1'}},
+    ])
+    supply = sampler(service)
+
+    async def run():
+        await supply.db.contract_events.insert_one(
+            {'event': 'PendingBankTransfer', 'args': {'transferId': 'TX1', 'fromBankId': 'BANK2', 'toBankId': 'BANK1'}})
+        await supply._set_checkpoint(90, 90)
+        return await supply.sample()
+
+    assert asyncio.run(run()) == 2
+    assert sorted(service.sampled) == ['BANK1', 'BANK2']
+
+def test_full_sample_when_the_interval_has_passed():
+    service = FakeService()
+    supply = sampler(service, head=250)
+
+    async def run():
+        await supply._set_checkpoint(240, 100)
+        return await supply.sample()
+
+    assert asyncio.run(run()) == 3
@@ -0,0 +1,36 @@
+from services.time_index import SortedTimeIndex
+
+def build(entries):
+    index = SortedTimeIndex()
+    for timestamp, key in entries:
+        index.add(timestamp, key)
+    return index
+
+def test_late_entries_are_inserted_in_time_order():
+    index = build([(10, 'a'), (30, 'c'), (20, 'b'), (5, 'z')])
+
+    assert index.range() == ['z', 'a', 'b', 'c']
+
+def test_range_bounds_are_inclusive():
+    index = build([(10, 'a'), (20, 'b'), (30, 'c'), (40, 'd')])
+
+    assert index.range(20, 30) == ['b', 'c']
+    assert index.range(since=31) == ['d']
+    assert index.range(until=9) == []
+    assert index.range(30, 20) == []
+
+def test_limit_takes_the_oldest_or_newest():
+    index = build([(t, f'k{t}') for t in range(10)])
+
+    assert index.range(2, 8, limit=3) == ['k2', 'k3', 'k4']
+    assert index.range(2, 8, limit=3, descending=True) == ['k8', 'k7', 'k6']
+
+def test_remove_only_drops_the_matching_key():
+    index = build([(10, 'a'), (10, 'b'), (10, 'c')])
+
+    index.remove(10, 'b')
+    index.remove(10, 'missing')
+    index.remove(99, 'a')
+
+    assert index.range() == ['a', 'c']
+    assert len(index) == 2
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from services.transfer_sync import TransferHistorySync
+
+def test_history_sync_matches_the_chain(chain, service, block_chain, mine):
+    sync = TransferHistorySync(service, block_chain)
+    mine(100)
+
+    for blocks in (0, 3, 150):
+        mine(blocks)
+        sync.sync()
+
+        for bank_id in chain.bank_ids:
+            history = sync.get_transfer_history(bank_id)
+            assert [t['transferId'] for t in history] == [row[0] for row in chain.history[bank_id]]
+            assert not history.missing and not history.stale
+
+def test_history_of_a_failing_bank_is_stale(chain, service, block_chain, mine, monkeypatch):
+    sync = TransferHistorySync(service, block_chain)
+    mine(50)
+    sync.sync()
+    failing = chain.bank_ids[0]
+    read_entry = service.get_transfer_history_entry
+
+    def get_transfer_history_entry(bank_id, index):
+        if bank_id == failing:
+            raise RuntimeError('upstream down')
+        return read_entry(bank_id, index)
+
+    monkeypatch.setattr(service, 'get_transfer_history_entry', get_transfer_history_entry)
+    mine(50)
+
+    result = sync.get_all_transfer_history()
+
+    assert result.stale == [failing]
+    assert sync.get_transfer_history(failing).stale == [failing]
+
+def test_steady_state_reads_only_banks_named_in_events(chain, service, block_chain, mine, monkeypatch):
+    sync = TransferHistorySync(service, block_chain)
+    mine(50)
+    sync.sync()
+    read = []
+    for name in ('get_transfer_history_entry', 'get_transfer_history'):
+        original = getattr(service, name)
+        monkeypatch.setattr(service, name, lambda bank_id, *args, original=original: read.append(bank_id) or original(bank_id, *args))
+
+    assert sync.sync() == 0
+    assert read == []
+
+    sizes = {bank_id: (len(chain.history[bank_id]), len(chain.pending_transfers[bank_id])) for bank_id in chain.bank_ids}
+    mine(1)
+    changed = {bank_id for bank_id, size in sizes.items()
+               if size != (len(chain.history[bank_id]), len(chain.pending_transfers[bank_id]))}
+    sync.sync()
+
+    assert set(read) <= changed
+    for bank_id in chain.bank_ids:
+        assert [t['transferId'] for t in sync.get_transfer_history(bank_id)] == [row[0] for row in chain.history[bank_id]]
+
+def test_bank_reads_do_not_wait_for_a_running_sync(chain, service, block_chain, mine, monkeypatch):
+    sync = TransferHistorySync(service, block_chain)
+    mine(50)
+    sync.sync()
+    bank_id = chain.bank_ids[0]
+    before = [t['transferId'] for t in sync.get_transfer_history(bank_id)]
+    reading, release = threading.Event(), threading.Event()
+    read_bank_ids = service.get_bank_ids
+
+    def get_bank_ids(start=0):
+        reading.set()
+        release.wait(5)
+        return read_bank_ids(start)
+
+    monkeypatch.setattr(service, 'get_bank_ids', get_bank_ids)
+    monkeypatch.setattr(sync, 'reconcile_interval', 0)
+    running = threading.Thread(target=sync.sync)
+    running.start()
+    reading.wait(5)
+
+    started = time.monotonic()
+    assert [t['transferId'] for t in sync.get_transfer_history(bank_id)] == before
+    assert time.monotonic() - started < 1
+
+    release.set()
+    running.join()
@@ -0,0 +1,67 @@
+import pytest
+from eth_account import Account
+from web3 import Web3, EthereumTesterProvider
+
+from config.web3_config import get_contract
+from services.tx_submitter import TransactionSubmitter
+
+# Init code deploying a contract whose runtime code is a lone STOP, so every
+# admin call succeeds without the real contract's bytecode
+ACCEPT_ALL_INIT_CODE = '0x6001600c60003960016000f300'
+
+@pytest.fixture
+def w3():
+    return Web3(EthereumTesterProvider())
+
+@pytest.fixture
+def submitter(w3):
+    funder = w3.eth.accounts[0]
+    tx_hash = w3.eth.send_transaction({'from': funder, 'data': ACCEPT_ALL_INIT_CODE})
+    address = w3.eth.get_transaction_receipt(tx_hash)['contractAddress']
+    admin = Account.create()
+    w3.eth.send_transaction({'from': funder, 'to': admin.address, 'value': Web3.to_wei(10, 'ether')})
+    return TransactionSubmitter(w3, get_contract(w3, address), admin.key.hex())
+
+def test_batch_is_pipelined_on_consecutive_nonces(w3, submitter):
+    records = submitter.submit_batch([{'function': 'mintCoins', 'args': ['BANK1', i]} for i in range(3)])
+
+    assert [r['status'] for r in records] == ['submitted'] * 3
+    assert [r['nonce'] for r in records] == [0, 1, 2]
+    assert submitter.poll_receipts() == 3
+    assert [submitter.get_record(r['id'])['status'] for r in records] == ['confirmed'] * 3
+
+def test_non_admin_function_is_refused(submitter):
+    record, = submitter.submit_batch([{'function': 'generateBankRequest', 'args': []}])
+
+    assert record['status'] == 'failed'
+    assert 'not an admin function' in record['error']
+
+def test_external_send_resyncs_nonce(w3, submitter):
+    submitter.submit_batch([{'function': 'mintCoins', 'args': ['BANK1', 1]}])
+    # Another sender spends the admin's next nonce behind the submitter's back
+    w3.eth.send_raw_transaction(submitter.account.sign_transaction({
+        'to': submitter.address, 'value': 0, 'gas': 21000, 'gasPrice': w3.eth.gas_price,
+        'nonce': 1, 'chainId': w3.eth.chain_id
+    }).raw_transaction)
+
+    record, = submitter.submit_batch([{'function': 'mintCoins', 'args': ['BANK1', 2]}])
+
+    assert record['status'] == 'submitted'
+    assert record['nonce'] == 2
+
+def test_already_known_is_accepted_without_resending(w3, submitter, monkeypatch):
+    send = w3.eth.send_raw_transaction
+    sent = []
+
+    def lost_answer(raw):
+        # The node takes the transaction but the answer never arrives, so it is sent again
+        sent.append(send(raw))
+        raise ValueError({'code': -32000, 'message': 'already known'})
+    monkeypatch.setattr(w3.eth, 'send_raw_transaction', lost_answer)
+
+    first, second = submitter.submit_batch([{'function': 'mintCoins', 'args': ['BANK1', i]} for i in range(2)])
+
+    assert len(sent) == 2
+    assert [first['txHash'], second['txHash']] == [Web3.to_hex(h) for h in sent]
+    assert [first['nonce'], second['nonce']] == [0, 1]
+    assert w3.eth.get_transaction_count(submitter.address) == 2